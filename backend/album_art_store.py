@@ -0,0 +1,88 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Magic-byte prefixes for the formats media sessions hand out
+_IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+def sniff_content_type(data):
+    """Guess an image MIME type from its leading bytes."""
+    for prefix, ct in _IMAGE_SIGNATURES:
+        if data.startswith(prefix):
+            return ct
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+class AlbumArtStore:
+    """Content-addressed album art, stored once per distinct image.
+
+    Images are keyed by the SHA-256 of their bytes, written to
+    data/media_cache/albumart/<hash> and kept in a small in-memory LRU so the
+    HTTP handler rarely touches disk. Because a hash always names the same
+    bytes, responses can be cached by browsers forever.
+    """
+
+    def __init__(self, data_dir=None, memory_items=32):
+        if data_dir is None:
+            data_dir = Path(__file__).parent / "data" / "media_cache"
+        self.art_dir = Path(data_dir) / "albumart"
+        self.art_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_items = memory_items
+        self._memory = OrderedDict()  # hash -> (bytes, content_type)
+        self._lock = threading.Lock()  # put() on the asyncio loop, get() on the HTTP thread
+
+    @staticmethod
+    def url_for(art_hash):
+        return f"/media/albumart/{art_hash}"
+
+    def put(self, data):
+        """Store raw image bytes. Returns the content hash."""
+        art_hash = hashlib.sha256(data).hexdigest()
+        entry = (bytes(data), sniff_content_type(data))
+        self._remember(art_hash, entry)
+
+        path = self.art_dir / art_hash
+        if not path.exists():
+            tmp = path.with_name(f"{art_hash}.{os.getpid()}.tmp")
+            tmp.write_bytes(entry[0])
+            os.replace(tmp, path)
+        return art_hash
+
+    def get(self, art_hash):
+        """Return (bytes, content_type) for a hash, or None if unknown."""
+        if not _HASH_RE.match(art_hash or ""):
+            return None
+        with self._lock:
+            entry = self._memory.get(art_hash)
+            if entry is not None:
+                self._memory.move_to_end(art_hash)
+                return entry
+
+        path = self.art_dir / art_hash
+        if not path.is_file():
+            return None
+        data = path.read_bytes()
+        entry = (data, sniff_content_type(data))
+        self._remember(art_hash, entry)
+        return entry
+
+    def _remember(self, art_hash, entry):
+        with self._lock:
+            self._memory[art_hash] = entry
+            self._memory.move_to_end(art_hash)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
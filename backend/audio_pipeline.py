@@ -0,0 +1,286 @@
+"""One named audio channel: capture, analysis, and the clients listening to it.
+
+The server runs one AudioPipeline per configured source ("main" is the
+--source one, more come from --channel NAME=SPEC). Each pipeline has its own
+frame producer — the capture thread, the DSP child process or a replay —
+its own analyzer, beat tracker, spectrogram history, subscription groups
+and broadcast loop. They all share the server's single now-playing state,
+database and enrichment stack: media state and deltas reach every client
+whichever channel it listens to.
+"""
+
+import asyncio
+
+from capture import CaptureThread
+from frame_protocol import BinaryFrameEncoder, encode_json_frame
+from frame_recorder import replay_frames
+
+DEFAULT_CHANNEL = "main"
+
+
+class AudioPipeline:
+    """Frame production and broadcast for one audio source."""
+
+    def __init__(self, name, analyzer, beat_tracker, now_playing, fft_bins=128,
+                 waveform_points=128, broadcast_fps=0.0, keepalive=1.0,
+                 history=None, recorder=None, on_block=None):
+        self.name = name
+        self.analyzer = analyzer
+        self.beat_tracker = beat_tracker
+        self.now_playing = now_playing
+        self.fft_bins = fft_bins
+        self.waveform_points = waveform_points
+        self.broadcast_fps = broadcast_fps  # cap on frames/s sent to clients; 0 = every block
+        self.keepalive = keepalive
+        self.history = history    # SpectrogramHistory, or None
+        self.recorder = recorder  # FrameRecorder, or None
+        self.on_block = on_block  # called with every captured mono block (fingerprinting)
+
+        self.clients = {}  # websocket -> ClientSession (options stay "legacy" until a hello)
+        self.capture = None  # CaptureThread, once run_capture starts
+        self.dsp = None      # DspProcess, once run_dsp_process starts
+        self.ingest = None   # NetworkSource, when agents stream this channel's audio in
+        self.seq = 0
+        self.beat = False    # a beat occurred since the previous frame
+        self.beats = 0       # frames so far with self.beat set; clients diff it against the last one they got
+        self.idle_frames = 0     # frames produced while no client was connected
+        self.frames_encoded = 0  # one per subscription group per frame, however many clients share it
+        self.wakeup = asyncio.Event()  # set when a new frame or media change is ready to send
+        now_playing.add_listener(self.wakeup.set)
+        self._encoders = {}  # (fft bins, waveform points, encoding) -> BinaryFrameEncoder
+        self._next_frame_at = 0.0  # broadcast_fps deadline, see _frame_due()
+
+    # ---------- Frame producers ----------
+
+    async def run_capture(self, source):
+        """Feed every block the capture thread delivers to its consumers.
+
+        on_block always gets the audio. Analysis is demand-driven: the
+        FFT, bin resolutions and waveform only run when broadcast() encodes
+        the frame for a subscriber, so with no clients connected a block costs
+        a ring write and the fingerprint feed. In STFT mode every hop frame is
+        analysed as it arrives (while anyone is listening), independently of
+        how often frames are broadcast (broadcast_fps). While any client
+        subscribes to "beat", every analysis frame also goes through the beat
+        tracker, once for all clients. With a recorder or the spectrogram
+        history on, every frame is binned and stored, listeners or not.
+        """
+        analyzer = self.analyzer
+        self.capture = capture = CaptureThread(source, asyncio.get_running_loop(),
+                                               lookback=analyzer.lookback)
+        capture.start()
+        try:
+            while True:
+                mono, captured_at = await capture.next_block()
+
+                if self.on_block is not None:
+                    self.on_block(mono)
+                want_beat = any("beat" in s.opts["fields"] for s in self.clients.values())
+                if want_beat or (analyzer.stft is not None
+                                 and (self.clients or self.recorder or self.history)):
+                    spectra = analyzer.feed(capture.read_end, capture.recent)
+                    if want_beat:
+                        self.beat_tracker.process(spectra)
+                if not self._frame_due(captured_at):
+                    continue
+                self.seq += 1
+                analyzer.begin(mono, self.seq, captured_at, capture.read_end)
+                self.beat = self.beat_tracker.take_beat()
+                self.beats += self.beat
+                self._publish()
+        finally:
+            capture.stop()
+            self.close_recorder()
+
+    async def run_dsp_process(self, dsp):
+        """Broadcast frames analysed by a DSP child process (see dsp_process.py).
+
+        The child captures, runs the FFT and tracks beats; this loop only copies
+        each finished frame out of shared memory, feeds on_block and hands the
+        frame to broadcast(). The child is kept told what's wanted, as in
+        run_capture: the FFT while anyone listens (or a recorder or the
+        spectrogram history is on), the beat tracker while anyone subscribes
+        to "beat". A frame that arrives without a spectrum gets one here if
+        it's encoded.
+        """
+        self.dsp = dsp
+        dsp.start(asyncio.get_running_loop())
+        beat = False
+        try:
+            while True:
+                want_beat = any("beat" in s.opts["fields"] for s in self.clients.values())
+                dsp.set_demand(bool(self.clients or self.recorder or self.history), want_beat)
+                await dsp.next_frame()
+                if self.on_block is not None:
+                    self.on_block(dsp.mono)
+                beat = beat or dsp.beat
+                if not self._frame_due(dsp.timestamp):
+                    continue
+                self.seq += 1
+                self.analyzer.begin(dsp.mono, self.seq, dsp.timestamp,
+                                    magnitudes=dsp.magnitudes if dsp.analysed else None)
+                self.beat, beat = beat, False
+                self.beats += self.beat
+                self._publish()
+        finally:
+            dsp.stop()
+            self.close_recorder()
+
+    async def run_replay(self, recording, speed, on_track=None):
+        """Stream a frame recording in place of capture (see frame_recorder.py).
+
+        Frames keep their recorded spacing (divided by speed) and get fresh seq
+        numbers and wall-clock timestamps; on_track is called with each entry
+        of the recording's track index as it comes up.
+        """
+        tracks_at = {}
+        for track in recording.tracks:
+            tracks_at.setdefault(track["frame"], []).append(track)
+
+        async for index, timestamp in replay_frames(recording, speed):
+            if on_track is not None:
+                for track in tracks_at.get(index, ()):
+                    on_track(track)
+            self.seq += 1
+            self.analyzer.begin(index, self.seq, timestamp)
+            self._publish()
+
+    def _frame_due(self, captured_at):
+        """broadcast_fps gate for a block captured at `captured_at`.
+
+        Deadline-based so the average rate holds despite block granularity.
+        """
+        if self.broadcast_fps <= 0:
+            return True
+        if captured_at < self._next_frame_at:
+            return False
+        interval = 1.0 / self.broadcast_fps
+        self._next_frame_at += interval
+        if self._next_frame_at < captured_at:
+            self._next_frame_at = captured_at + interval
+        return True
+
+    def _publish(self):
+        """A new frame is in the analyzer: record/store it, wake the broadcaster."""
+        analyzer = self.analyzer
+        if self.recorder is not None:
+            self.recorder.write(self.seq, analyzer.timestamp, analyzer.peak,
+                                analyzer.bins(self.fft_bins),
+                                analyzer.waveform(self.waveform_points, "minmax"))
+        if self.history is not None:
+            self.history.write(analyzer.bins(self.fft_bins), analyzer.timestamp)
+        if self.clients:
+            self.wakeup.set()
+        else:
+            self.idle_frames += 1
+
+    def close_recorder(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            print(f"Recording closed: {self.recorder.count} frames in {self.recorder.path}")
+
+    # ---------- Broadcast ----------
+
+    def encode(self, opts):
+        """Encode the newest frame for one subscription group."""
+        self.frames_encoded += 1
+        analyzer = self.analyzer
+        fields = opts["fields"]
+        media_json = self.now_playing.media_json() if opts["format"] == "legacy" else None
+        if not self.seq:
+            if opts["format"] == "binary":
+                return None
+            return encode_json_frame(0, 0.0, 0, [], [], media_json)
+
+        fft = analyzer.bands(opts["bins"], opts["bands"]) if "fft" in fields else None
+        waveform = None
+        if "waveform" in fields:
+            waveform = analyzer.waveform(opts["points"], opts["waveformMode"])
+        beat = None
+        if "beat" in fields:
+            beat = (self.beat, self.beats, self.beat_tracker.bpm, self.beat_tracker.confidence)
+        if opts["format"] == "binary":
+            shape = (opts["bins"] if fft is not None else 0,
+                     len(waveform) if waveform is not None else 0,
+                     opts["encoding"])
+            encoder = self._encoders.get(shape)
+            if encoder is None:
+                encoder = BinaryFrameEncoder(*shape)
+                self._encoders[shape] = encoder
+            return encoder.encode(analyzer.seq, analyzer.timestamp, analyzer.peak, fft, waveform, beat)
+        peak = analyzer.peak if "peak" in fields else None
+        return encode_json_frame(analyzer.seq, analyzer.timestamp, peak, fft, waveform, media_json, beat)
+
+    async def broadcast(self):
+        """Queue frames for this channel's clients as soon as they're produced.
+        Wakes on self.wakeup (new frame or media change) instead of polling.
+        While no new audio arrives the last frame is re-sent (same seq) only every
+        keepalive seconds. Clients are grouped by subscription and each group's
+        frame is encoded once; a client gets a frame when its effective
+        fpsDivisor (subscription x backpressure backoff) says it's due. Clients
+        subscribed to media get a now_playing delta only when it changed.
+        Sending happens in each ClientSession's own task (see client_session.py)."""
+        now_playing = self.now_playing
+        last_version = now_playing.version
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.keepalive)
+                keepalive = False
+            except asyncio.TimeoutError:
+                keepalive = True
+            self.wakeup.clear()
+            if not self.clients:
+                continue
+
+            groups = {}
+            behind = {}  # state version -> sessions needing a delta from it
+            version = now_playing.version
+            for session in list(self.clients.values()):
+                opts = session.opts
+                groups.setdefault(opts["group"], (opts, []))[1].append(session)
+                base = opts.get("stateVersion")
+                if base is not None and base != version:
+                    behind.setdefault(base, []).append(session)
+                    opts["stateVersion"] = version
+
+            for base, sessions in behind.items():
+                message = now_playing.delta_message(base)
+                for session in sessions:
+                    session.push_control(message)
+
+            # Legacy clients read media from the frames, so a media change is a reason to send
+            seq = self.seq
+            media_changed = version != last_version
+            for opts, sessions in groups.values():
+                if keepalive or (opts["format"] == "legacy" and media_changed):
+                    targets = sessions
+                else:
+                    targets = [s for s in sessions if s.frame_due(seq)]
+                if not targets:
+                    continue
+                frame = self.encode(opts)
+                if frame is not None:
+                    for session in targets:
+                        session.push_frame(frame, seq)
+            last_version = version
+
+    def stats(self):
+        analyzer, capture = self.analyzer, self.capture
+        return {
+            "channel": self.name,
+            "capture": capture.stats() if capture else None,
+            "frameSeq": self.seq,
+            "clients": len(self.clients),
+            "pipeline": {
+                **analyzer.stats(),
+                "idleFrames": self.idle_frames,
+                "framesEncoded": self.frames_encoded,
+                "blocksWithoutFft": (capture.blocks_consumed - analyzer.spectra
+                                     if capture and analyzer.stft is None else None),
+            },
+            "beat": self.beat_tracker.stats(),
+            "recorder": self.recorder.stats() if self.recorder else None,
+            "history": self.history.stats() if self.history else None,
+            "dspProcess": self.dsp.stats() if self.dsp else None,
+            "ingest": self.ingest.stats() if self.ingest else None,
+        }
@@ -0,0 +1,253 @@
+"""Audio inputs for the capture loop.
+
+Every source yields (block_size, channels) float32 blocks in [-1, 1] from a
+BLOCKING read(), so the rest of the pipeline doesn't care whether audio comes
+from WASAPI loopback, a file on disk or a generator. Pick one with
+create_source() from a spec string:
+
+    loopback                              default speaker via WASAPI (Windows)
+    file:<path.wav|path.npy>              loop a file forever
+    synthetic[:tones=440+880,amp=0.3,noise=0.05,seed=0,clicks=120]
+    ingest[:latency=80,max=250]           PCM streamed in over ws://.../ingest (network_ingest.py)
+"""
+
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+
+class AudioSource:
+    """Base class: open(), then read() blocks until close()."""
+
+    def __init__(self, sample_rate, block_size):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.name = type(self).__name__
+
+    def open(self):
+        pass
+
+    def read(self):
+        """Return the next (block_size, channels) float32 block. BLOCKING."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _PacedSource(AudioSource):
+    """Source that generates audio faster than real time and sleeps to match it."""
+
+    def __init__(self, sample_rate, block_size, realtime=True):
+        super().__init__(sample_rate, block_size)
+        self.realtime = realtime
+        self._next_deadline = None
+
+    def _pace(self):
+        if not self.realtime:
+            return
+        now = time.monotonic()
+        if self._next_deadline is None or now - self._next_deadline > 1.0:
+            # First block, or we fell far behind — resync instead of bursting
+            self._next_deadline = now
+        delay = self._next_deadline - now
+        if delay > 0:
+            time.sleep(delay)
+        self._next_deadline += self.block_size / self.sample_rate
+
+
+class LoopbackSource(AudioSource):
+    """System output captured via WASAPI loopback (soundcard, Windows only)."""
+
+    def __init__(self, sample_rate, block_size):
+        super().__init__(sample_rate, block_size)
+        self._recorder = None
+
+    def open(self):
+        import soundcard as sc  # Windows-only dependency, imported on demand
+
+        speaker = sc.default_speaker()
+        mic = sc.get_microphone(id=str(speaker.id), include_loopback=True)
+        self.name = speaker.name
+        self._recorder = mic.recorder(samplerate=self.sample_rate, blocksize=self.block_size)
+        self._recorder.__enter__()
+
+    def read(self):
+        return self._recorder.record(self.block_size)
+
+    def close(self):
+        if self._recorder is not None:
+            self._recorder.__exit__(None, None, None)
+            self._recorder = None
+
+
+def _load_wav(path):
+    """Read a PCM WAV file as (frames, channels) float32 plus its sample rate."""
+    with wave.open(str(path), "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 4:
+        data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"unsupported WAV sample width: {width} bytes")
+    return data.reshape(-1, channels), rate
+
+
+def _resample(data, src_rate, dst_rate):
+    """Linear-interpolation resample of (frames, channels) audio."""
+    if src_rate == dst_rate:
+        return data
+    n_out = int(round(len(data) * dst_rate / src_rate))
+    src_t = np.arange(len(data)) / src_rate
+    dst_t = np.arange(n_out) / dst_rate
+    return np.stack([np.interp(dst_t, src_t, data[:, c]) for c in range(data.shape[1])],
+                    axis=1).astype(np.float32)
+
+
+class FileSource(_PacedSource):
+    """Loops a .wav file or a .npy array ((frames,) or (frames, channels)) forever.
+
+    .npy files are memory-mapped, so long recordings don't need to fit in RAM;
+    they are assumed to already be at the capture sample rate. Float arrays
+    are taken as [-1, 1] samples; signed integer PCM (int16, int32) is scaled
+    into that range block by block, like WAV samples are.
+    """
+
+    def __init__(self, path, sample_rate, block_size, realtime=True):
+        super().__init__(sample_rate, block_size, realtime)
+        self.path = Path(path)
+        self.name = f"file:{self.path.name}"
+        self._data = None
+        self._pos = 0
+        self._block = None
+        self._scale = None  # applied to each block of integer .npy PCM
+
+    def open(self):
+        self._scale = None
+        if self.path.suffix.lower() == ".npy":
+            data = np.load(self.path, mmap_mode="r")
+            if data.ndim == 1:
+                data = data[:, None]
+            if np.issubdtype(data.dtype, np.signedinteger):
+                self._scale = np.float32(-1 / np.iinfo(data.dtype).min)
+            elif not np.issubdtype(data.dtype, np.floating):
+                raise ValueError(f"{self.path}: unsupported sample type {data.dtype} "
+                                 "(use float samples in [-1, 1] or signed integer PCM)")
+        else:
+            data, rate = _load_wav(self.path)
+            data = _resample(data, rate, self.sample_rate)
+        if len(data) == 0:
+            raise ValueError(f"{self.path} contains no audio")
+        self._data = data
+        self._pos = 0
+        self._block = np.zeros((self.block_size, data.shape[1]), dtype=np.float32)
+
+    def read(self):
+        self._pace()
+        filled = 0
+        while filled < self.block_size:
+            take = min(self.block_size - filled, len(self._data) - self._pos)
+            self._block[filled:filled + take] = self._data[self._pos:self._pos + take]
+            filled += take
+            self._pos = (self._pos + take) % len(self._data)
+        if self._scale is not None:
+            np.multiply(self._block, self._scale, out=self._block)
+        return self._block
+
+
+class SyntheticSource(_PacedSource):
+    """Deterministic test signal: a sum of sine tones plus seeded white noise.
+
+    click_bpm > 0 adds a click track — a short decaying noise burst on every
+    beat, starting at sample 0 — for exercising the beat tracker.
+    """
+
+    def __init__(self, sample_rate, block_size, tones=(440.0,), amplitude=0.3,
+                 noise=0.0, seed=0, channels=2, realtime=True, click_bpm=0.0):
+        super().__init__(sample_rate, block_size, realtime)
+        self.tones = np.asarray(tones, dtype=np.float64)
+        self.amplitude = amplitude
+        self.noise = noise
+        self.channels = channels
+        self.click_bpm = click_bpm
+        self.name = f"synthetic:{'+'.join(f'{t:g}' for t in self.tones) or 'noise'}"
+        if click_bpm:
+            self.name += f"+clicks@{click_bpm:g}"
+        self._rng = np.random.default_rng(seed)
+        self._sample_pos = 0
+        self._t = np.arange(block_size, dtype=np.float64)
+        self._block = np.zeros((block_size, channels), dtype=np.float32)
+
+    def read(self):
+        self._pace()
+        t = (self._t + self._sample_pos) / self.sample_rate
+        self._sample_pos += self.block_size
+        if len(self.tones):
+            signal = np.sin(2 * np.pi * np.outer(t, self.tones)).sum(axis=1)
+            signal *= self.amplitude / len(self.tones)
+        else:
+            signal = np.zeros(self.block_size)
+        if self.noise:
+            signal += self._rng.standard_normal(self.block_size) * self.noise
+        if self.click_bpm:
+            period = self.sample_rate * 60.0 / self.click_bpm
+            phase = np.mod(t * self.sample_rate, period)
+            envelope = np.exp(-phase / (0.004 * self.sample_rate))
+            signal += self._rng.standard_normal(self.block_size) * envelope * 0.8
+        self._block[:] = signal[:, None]
+        return self._block
+
+
+def _parse_options(text):
+    opts = {}
+    for item in filter(None, (text or "").split(",")):
+        key, _, value = item.partition("=")
+        opts[key.strip()] = value.strip()
+    return opts
+
+
+def create_source(spec, sample_rate, block_size):
+    """Build an AudioSource from a CLI spec string (see module docstring)."""
+    kind, _, rest = (spec or "loopback").partition(":")
+    if kind == "loopback":
+        return LoopbackSource(sample_rate, block_size)
+    if kind == "file":
+        if not rest:
+            raise ValueError("file source needs a path: file:<path>")
+        return FileSource(rest, sample_rate, block_size)
+    if kind == "synthetic":
+        opts = _parse_options(rest)
+        tones = [float(t) for t in opts.get("tones", "440").split("+") if t]
+        return SyntheticSource(
+            sample_rate, block_size,
+            tones=tones,
+            amplitude=float(opts.get("amp", 0.3)),
+            noise=float(opts.get("noise", 0.0)),
+            seed=int(opts.get("seed", 0)),
+            click_bpm=float(opts.get("clicks", 0)),
+        )
+    if kind == "ingest":
+        from network_ingest import NetworkSource  # imports this module
+
+        opts = _parse_options(rest)
+        return NetworkSource(
+            sample_rate, block_size,
+            latency_ms=float(opts.get("latency", 80)),
+            max_ms=float(opts.get("max", 250)),
+        )
+    raise ValueError(f"unknown audio source: {spec!r}")
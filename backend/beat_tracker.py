@@ -0,0 +1,176 @@
+"""Server-side onset and beat detection.
+
+Runs once per analysis frame in audio_capture_loop, so every client sees the
+same beats instead of each visualizer guessing from its own FFT copy:
+
+  1. spectral flux — half-wave rectified frame-to-frame increase of the
+     log-compressed magnitude spectrum, vectorized over a whole batch of
+     frames (one block, or every STFT hop in it);
+  2. adaptive threshold — an onset is a flux value above
+     mean + sensitivity * std of the preceding threshold_seconds, and above
+     a fraction of the recent flux peak so steady tones can't trigger it;
+  3. tempo — autocorrelation of the onset envelope over the last
+     history_seconds, weighted towards ~120 BPM and searched between
+     min_bpm and max_bpm;
+  4. beats — onsets at least ~half a beat period apart, plus predicted
+     beats to bridge gaps while the tempo estimate is confident.
+
+The frame rate is sample_rate / hop: ~21.5/s in block mode and ~86/s in STFT
+mode with a 512 hop, which gives a much finer tempo resolution.
+"""
+
+import numpy as np
+
+from capture import SampleRing
+
+
+class BeatTracker:
+    """Onset envelope, tempo and beat events from batches of magnitude spectra."""
+
+    def __init__(self, frame_rate, spectrum_size, max_frames=16, history_seconds=8.0,
+                 min_bpm=60.0, max_bpm=180.0, threshold_seconds=0.5, sensitivity=1.5,
+                 compression=100.0):
+        self.frame_rate = frame_rate
+        self.min_bpm = min_bpm
+        self.max_bpm = max_bpm
+        self.sensitivity = sensitivity
+        self.compression = compression
+        self.max_frames = max_frames
+
+        # Row 0 carries the previous batch's last frame so flux is continuous
+        self._log = np.zeros((max_frames + 1, spectrum_size), dtype=np.float32)
+        self._diff = np.zeros((max_frames, spectrum_size), dtype=np.float32)
+        self._flux = np.zeros(max_frames, dtype=np.float32)
+        self._one = np.zeros(1, dtype=np.float32)
+        self._primed = False
+
+        history = max(int(history_seconds * frame_rate), 8)
+        self._envelope = SampleRing(history, history)
+        self._history = history
+        self._threshold_frames = max(int(threshold_seconds * frame_rate), 4)
+        self._tempo_every = max(int(frame_rate / 2), 1)  # re-estimate twice a second
+        self._peak_decay = 0.5 ** (1.0 / (4.0 * frame_rate))  # flux peak halves in 4 s
+
+        self._min_lag = max(int(np.floor(frame_rate * 60.0 / max_bpm)), 1)
+        self._max_lag = min(int(np.ceil(frame_rate * 60.0 / min_bpm)), history - 2)
+        lags = np.arange(self._max_lag + 1, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            bpm = np.where(lags > 0, frame_rate * 60.0 / lags, 0.0)
+            # Log-Gaussian prior around 120 BPM, one octave wide
+            self._prior = np.exp(-0.5 * np.log2(np.where(bpm > 0, bpm, 1) / 120.0) ** 2)
+        self._prior[:self._min_lag] = 0
+
+        self.frame = 0           # analysis frames processed
+        self.onsets = 0
+        self.beats = 0
+        self.bpm = 0.0
+        self.confidence = 0.0
+        self._flux_peak = 0.0    # decaying max of the flux, for the relative floor
+        self._last_onset = -1e9  # frame indices
+        self._last_beat = -1e9
+        self._beat_pending = False
+
+    @property
+    def period(self):
+        """Beat period in frames, or 0 without a tempo estimate."""
+        return self.frame_rate * 60.0 / self.bpm if self.bpm else 0.0
+
+    def process(self, magnitudes):
+        """Feed a (frames, bins) batch of magnitude spectra in time order."""
+        n = len(magnitudes)
+        if n == 0:
+            return
+        if n > self.max_frames:
+            magnitudes = magnitudes[-self.max_frames:]
+            n = self.max_frames
+
+        log = self._log[1:n + 1]
+        np.multiply(magnitudes, self.compression, out=log)
+        np.log1p(log, out=log)
+        diff = self._diff[:n]
+        np.subtract(log, self._log[:n], out=diff)
+        np.maximum(diff, 0, out=diff)
+        flux = self._flux[:n]
+        np.mean(diff, axis=1, out=flux)
+        self._log[0] = self._log[n]
+        if not self._primed:
+            flux[0] = 0  # no previous frame to compare against
+            self._primed = True
+
+        for value in flux:
+            self._step(float(value))
+
+    def _step(self, flux):
+        frame = self.frame
+        self._flux_peak = max(flux, self._flux_peak * self._peak_decay)
+        recent = min(self._envelope.written, self._threshold_frames)
+        if recent >= 4:
+            window = self._envelope.view(self._envelope.written - recent, recent)
+            threshold = max(float(window.mean()) + self.sensitivity * float(window.std()),
+                            0.2 * self._flux_peak, 1e-4)
+            if flux > threshold and frame - self._last_onset >= 0.1 * self.frame_rate:
+                self._last_onset = frame
+                self.onsets += 1
+                self._on_onset(frame)
+        self._one[0] = flux
+        self._envelope.write(self._one)
+        self.frame += 1
+
+        if self.frame % self._tempo_every == 0 and self._envelope.written >= self._history:
+            self._estimate_tempo()
+
+        # Bridge missing onsets with predicted beats while the tempo is confident
+        period = self.period
+        if period and self.confidence >= 0.3 and frame - self._last_beat >= period * 1.1:
+            self._emit_beat(self._last_beat + period if frame - self._last_beat < 2 * period else frame)
+
+    def _on_onset(self, frame):
+        period = self.period
+        if not period or frame - self._last_beat >= 0.6 * period:
+            self._emit_beat(frame)
+
+    def _emit_beat(self, frame):
+        self._last_beat = frame
+        self.beats += 1
+        self._beat_pending = True
+
+    def _estimate_tempo(self):
+        env = self._envelope.view(self._envelope.written - self._history, self._history)
+        env = env - env.mean()
+        spectrum = np.fft.rfft(env, n=2 * self._history)
+        ac = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2)[:self._max_lag + 2]
+        if ac[0] <= 0:
+            self.confidence = 0.0
+            return
+        weighted = ac[:self._max_lag + 1] * self._prior
+        lag = int(np.argmax(weighted))
+        if lag < self._min_lag:
+            return
+        # Parabolic interpolation for a sub-frame lag
+        a, b, c = float(ac[lag - 1]), float(ac[lag]), float(ac[lag + 1])
+        denom = a - 2 * b + c
+        offset = 0.5 * (a - c) / denom if denom < 0 else 0.0
+        bpm = self.frame_rate * 60.0 / (lag + offset)
+        confidence = min(max(b / float(ac[0]), 0.0), 1.0)
+
+        if self.bpm and abs(bpm - self.bpm) / self.bpm < 0.05:
+            self.bpm = self.bpm * 0.8 + bpm * 0.2
+        else:
+            self.bpm = bpm
+        self.confidence = confidence
+
+    def take_beat(self):
+        """True if a beat happened since the last call (one per broadcast frame)."""
+        pending = self._beat_pending
+        self._beat_pending = False
+        return pending
+
+    def stats(self):
+        return {
+            "frames": self.frame,
+            "frameRate": round(self.frame_rate, 2),
+            "onsets": self.onsets,
+            "beats": self.beats,
+            "bpm": round(self.bpm, 1),
+            "confidence": round(self.confidence, 3),
+        }
@@ -0,0 +1,97 @@
+"""
+Benchmark: server-side beat tracking against a synthetic click track.
+Runs headless — no soundcard or winrt needed.
+
+For each tempo the click track is analysed in block mode (one unwindowed FFT
+per 2048-sample block) and STFT mode (Hann window, 512 hop), then fed to the
+BeatTracker in capture-loop-sized batches. Reports the tempo estimate, beat
+precision/recall against the true click times and the cost per analysis frame.
+
+    python bench_beat.py [--seconds 30] [--tempos 90,120,140]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from audio_sources import SyntheticSource
+from beat_tracker import BeatTracker
+from dsp import StftPlan
+
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 2048
+HOP_SIZE = 512
+TOLERANCE = 0.07  # seconds; a beat this close to a click counts as a hit
+
+
+def click_track(bpm, seconds):
+    source = SyntheticSource(SAMPLE_RATE, BLOCK_SIZE, tones=(220.0,), amplitude=0.2,
+                             noise=0.01, click_bpm=bpm, realtime=False)
+    blocks = [source.read()[:, 0].copy() for _ in range(int(seconds * SAMPLE_RATE / BLOCK_SIZE))]
+    return np.concatenate(blocks)
+
+
+def batches(audio, mode):
+    """Yield (magnitudes, end sample) per captured block, like audio_capture_loop."""
+    if mode == "block":
+        for end in range(BLOCK_SIZE, len(audio) + 1, BLOCK_SIZE):
+            mono = audio[end - BLOCK_SIZE:end]
+            yield np.abs(np.fft.rfft(mono)).astype(np.float32)[None], end
+        return
+    plan = StftPlan(BLOCK_SIZE, HOP_SIZE, "hann", max_frames=8)
+    per_block = BLOCK_SIZE // HOP_SIZE
+    for end in range(BLOCK_SIZE * 2, len(audio) + 1, BLOCK_SIZE):
+        span = plan.span(per_block)
+        yield plan.analyse(audio[end - span:end]), end
+
+
+def run(bpm, mode, audio):
+    hop = BLOCK_SIZE if mode == "block" else HOP_SIZE
+    tracker = BeatTracker(SAMPLE_RATE / hop, BLOCK_SIZE // 2 + 1, max_frames=8)
+    beat_times = []
+    elapsed = 0.0
+    for magnitudes, end in batches(audio, mode):
+        start = time.perf_counter()
+        tracker.process(magnitudes)
+        elapsed += time.perf_counter() - start
+        if tracker.take_beat():
+            # A beat frame is reported when its analysis window closes
+            beat_times.append(end / SAMPLE_RATE)
+
+    clicks = np.arange(0, len(audio) / SAMPLE_RATE, 60.0 / bpm)
+    beats = np.asarray(beat_times)
+    if len(beats):
+        # Windows close up to one block after the click they contain
+        lag = BLOCK_SIZE / SAMPLE_RATE
+        hit = np.min(np.abs(clicks[None, :] - (beats[:, None] - lag / 2)), axis=1) <= lag / 2 + TOLERANCE
+        found = np.min(np.abs(beats[None, :] - lag / 2 - clicks[:, None]), axis=1) <= lag / 2 + TOLERANCE
+        precision, recall = hit.mean(), found.mean()
+    else:
+        precision = recall = 0.0
+    return tracker, precision, recall, elapsed / max(tracker.frame, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--tempos", default="90,120,140")
+    args = parser.parse_args()
+    tempos = [float(t) for t in args.tempos.split(",") if t]
+
+    print("=" * 60)
+    print(f"BEAT TRACKER BENCHMARK  {args.seconds:g}s click tracks  block={BLOCK_SIZE}  hop={HOP_SIZE}")
+    print("=" * 60)
+    print(f"{'tempo':>6} {'mode':>6} {'bpm':>7} {'conf':>6} {'prec':>6} {'recall':>7} {'us/frame':>9}")
+
+    for bpm in tempos:
+        audio = click_track(bpm, args.seconds)
+        for mode in ("block", "stft"):
+            tracker, precision, recall, per_frame = run(bpm, mode, audio)
+            print(f"{bpm:>6g} {mode:>6} {tracker.bpm:>7.1f} {tracker.confidence:>6.2f} "
+                  f"{precision:>6.2f} {recall:>7.2f} {per_frame * 1e6:>9.1f}")
+
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
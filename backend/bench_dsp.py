@@ -0,0 +1,94 @@
+"""
+Benchmark: per-frame log binning + waveform reduction, before vs after DspPlan.
+Runs headless — no soundcard or winrt needed.
+
+    python bench_dsp.py [--iterations N]
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from dsp import BandAgc, DspPlan, EnvelopePlan, downsample, get_filterbank, log_bin
+
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 2048
+WAVEFORM_POINTS = 128
+
+
+def check_equivalent(plan, mono):
+    """The plan must produce the same numbers as the reference functions."""
+    magnitudes = np.abs(np.fft.rfft(mono))
+    expected_bins = log_bin(magnitudes, plan.num_bins)
+    expected_wave = downsample(mono, plan.waveform_points)
+    got_bins = plan.log_bin(plan.spectrum(mono))
+    got_wave = plan.downsample(mono)
+    np.testing.assert_allclose(got_bins, expected_bins, rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(got_wave, expected_wave, rtol=0, atol=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    mono = (rng.standard_normal(BLOCK_SIZE) * 0.3).astype(np.float32)
+    magnitudes = np.abs(np.fft.rfft(mono))
+
+    print("=" * 60)
+    print(f"DSP BENCHMARK  block={BLOCK_SIZE}  waveform={WAVEFORM_POINTS}  n={args.iterations}")
+    print("=" * 60)
+    print(f"{'bins':>6} {'before (us)':>14} {'after (us)':>12} {'speedup':>10}")
+
+    for num_bins in (128, 256, 512):
+        plan = DspPlan(BLOCK_SIZE, num_bins, WAVEFORM_POINTS)
+        check_equivalent(plan, mono)
+
+        def before():
+            log_bin(magnitudes, num_bins)
+            downsample(mono, WAVEFORM_POINTS)
+
+        def after():
+            plan.log_bin(magnitudes)
+            plan.downsample(mono)
+
+        t_before = min(timeit.repeat(before, number=args.iterations, repeat=3)) / args.iterations
+        t_after = min(timeit.repeat(after, number=args.iterations, repeat=3)) / args.iterations
+        print(f"{num_bins:>6} {t_before * 1e6:>14.1f} {t_after * 1e6:>12.1f} {t_before / t_after:>9.1f}x")
+
+    print("-" * 60)
+    print("Band modes (binning + normalization per frame, us)")
+    print(f"{'bands':>6} {'log':>10} {'mel+agc':>10} {'bark+agc':>10}")
+    for num_bins in (64, 128, 256, 512):
+        plan = DspPlan(BLOCK_SIZE, num_bins, WAVEFORM_POINTS)
+        times = [min(timeit.repeat(lambda: plan.normalize(plan.log_bin(magnitudes), 1.0),
+                                   number=args.iterations, repeat=3)) / args.iterations]
+        for scale in ("mel", "bark"):
+            bank = get_filterbank(SAMPLE_RATE, BLOCK_SIZE, num_bins, scale)
+            agc = BandAgc(num_bins)
+            spectrum = magnitudes.astype(np.float32)
+            times.append(min(timeit.repeat(lambda: agc.process(bank.apply(spectrum), 0.0),
+                                           number=args.iterations, repeat=3)) / args.iterations)
+        print(f"{num_bins:>6} " + " ".join(f"{t * 1e6:>10.1f}" for t in times))
+
+    print("-" * 60)
+    print("Waveform reducers (per frame, us; peak = largest |value| kept / true peak)")
+    print(f"{'points':>6} {'indexer':>10} {'minmax':>10} {'rms':>10} {'peak idx':>9} {'peak mm':>8}")
+    # A click between sample positions: the indexer can miss it, min/max can't
+    clicky = mono.copy()
+    clicky[BLOCK_SIZE // 3 + 1] = 2.0
+    for points in (64, 100, 128, 256, 512):
+        plans = [EnvelopePlan(BLOCK_SIZE, points, mode) for mode in ("sample", "minmax", "rms")]
+        times = [min(timeit.repeat(lambda: plan.reduce(mono), number=args.iterations, repeat=3))
+                 / args.iterations for plan in plans]
+        kept = [float(np.max(np.abs(plan.reduce(clicky)))) / float(np.max(np.abs(clicky)))
+                for plan in plans[:2]]
+        print(f"{points:>6} " + " ".join(f"{t * 1e6:>10.1f}" for t in times)
+              + f" {kept[0]:>9.2f} {kept[1]:>8.2f}")
+
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark: local fingerprint index lookups against a large library.
+Runs headless — no Chromaprint, fpcalc or AcoustID key needed.
+
+Builds a FingerprintIndex in a temporary SQLite database with --tracks
+synthetic fingerprints (random sub-fingerprints whose bits drift from item
+to item like Chromaprint's do), then measures:
+
+  match      queries cut from a library track at a different offset: hit
+             rate and latency. Library and query fingerprints each have
+             --ber of their bits flipped, as two captures of a track would
+  miss       queries from audio that isn't in the library: false matches
+             and latency
+  repeat     AudioFingerprinter against a local stand-in for the AcoustID
+             web service: the first play of each track reaches the service
+             and is indexed, the repeat is answered locally
+
+    python bench_fingerprint_index.py [--tracks 100000] [--queries 500] [--ber 0.1]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from db import init_db
+from fingerprint_index import DEFAULT_MAX_BER, FingerprintIndex
+from fingerprinter import AudioFingerprinter
+
+ITEMS = 160       # sub-fingerprints in a 20 s buffer
+SONG_ITEMS = 240  # a library track's audio is longer than what was fingerprinted
+MAX_SHIFT = 40    # queries start up to this many items from the stored window
+DRIFT = 0.15      # fraction of bits that change between consecutive items
+
+
+def synthetic_song(rng, items=SONG_ITEMS):
+    """uint32 sub-fingerprints whose bits persist from item to item."""
+    flips = rng.random((items, 32)) < DRIFT
+    flips[0] = rng.random(32) < 0.5
+    bits = np.logical_xor.accumulate(flips, axis=0)
+    return np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel()
+
+
+def corrupt(rng, fingerprint, ber):
+    """Flip each bit with probability ber."""
+    flips = np.packbits(rng.random((len(fingerprint), 32)) < ber, axis=1, bitorder="little")
+    return fingerprint ^ flips.view("<u4").ravel()
+
+
+class StandInAcoustID:
+    """Local stand-in for the AcoustID lookup API, answering from ground truth."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.tracks = {}  # fingerprint token -> (score, recording id, title, artist)
+
+    def __call__(self, fingerprint, duration):
+        self.calls += 1
+        time.sleep(self.latency)
+        answer = self.tracks.get(fingerprint)
+        return [answer] if answer else []
+
+
+def percentiles(ms):
+    ms = np.asarray(ms)
+    return (f"p50 {np.percentile(ms, 50):6.2f} ms  p95 {np.percentile(ms, 95):6.2f} ms  "
+            f"max {ms.max():6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--ber", type=float, default=0.1, help="bit error rate of each capture")
+    parser.add_argument("--max-ber", type=float, default=DEFAULT_MAX_BER)
+    parser.add_argument("--repeat-tracks", type=int, default=50)
+    parser.add_argument("--service-ms", type=float, default=300.0,
+                        help="latency of the stand-in AcoustID service")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    print("=" * 60)
+    print(f"FINGERPRINT INDEX BENCHMARK  {args.tracks} tracks  query BER {args.ber:g}  "
+          f"max BER {args.max_ber:g}")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.db")
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        init_db(conn)
+        index = FingerprintIndex(conn, max_ber=args.max_ber)
+
+        songs = []
+        starts = rng.integers(0, SONG_ITEMS - ITEMS + 1, args.tracks)
+
+        def library():
+            for i, start in enumerate(starts):
+                song = synthetic_song(rng)
+                if i < args.queries:
+                    songs.append((i, start, song))
+                yield (corrupt(rng, song[start:start + ITEMS], args.ber), 20.0,
+                       f"Artist {i}", f"Title {i}", "", f"rec-{i}")
+
+        index.add_many(library())
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = os.path.getsize(path) / 1e6
+        index = FingerprintIndex(conn, max_ber=args.max_ber)  # as the server opens it
+        stats = index.stats()
+        print(f"load     {stats['fingerprints']} fingerprints ({size:.0f} MB in SQLite) in "
+              f"{stats['loadSeconds']:.2f}s, {stats['entries']} entries ({stats['indexBytes'] / 1e6:.0f} MB)")
+
+        times, hits, wrong = [], 0, 0
+        for i, start, song in songs:
+            offset = int(np.clip(start + rng.integers(-MAX_SHIFT, MAX_SHIFT + 1),
+                                 0, SONG_ITEMS - ITEMS))
+            query = corrupt(rng, song[offset:offset + ITEMS], args.ber)
+            match = index.match(query)
+            times.append(index.last_match_ms)
+            if match is not None:
+                hits += match["recordingId"] == f"rec-{i}"
+                wrong += match["recordingId"] != f"rec-{i}"
+        print(f"match    {hits}/{len(songs)} found, {wrong} wrong   {percentiles(times)}")
+
+        times, false = [], 0
+        for _ in range(args.queries):
+            false += index.match(synthetic_song(rng, ITEMS)) is not None
+            times.append(index.last_match_ms)
+        print(f"miss     {false}/{args.queries} false matches      {percentiles(times)}")
+
+        service = StandInAcoustID(args.service_ms / 1000)
+        fingerprinter = AudioFingerprinter(index=index, lookup=service)
+        plays = []
+        for i in range(args.repeat_tracks):
+            token = f"new-{i}"
+            service.tracks[token] = (0.9, f"new-rec-{i}", f"New title {i}", f"New artist {i}")
+            plays.append((token, synthetic_song(rng)))
+        for label in ("first", "repeat"):
+            calls, found, started = service.calls, 0, time.perf_counter()
+            for token, song in plays:
+                offset = rng.integers(0, MAX_SHIFT + 1)  # identify() runs early in each play
+                raw = corrupt(rng, song[offset:offset + ITEMS], args.ber)
+                result = fingerprinter.identify_local(raw)
+                if result is None:
+                    result = fingerprinter.identify_remote(20.0, token, raw)
+                found += result is not None
+            elapsed = (time.perf_counter() - started) / len(plays) * 1000
+            print(f"{label:<8} {found}/{len(plays)} identified, {service.calls - calls} "
+                  f"service calls, {elapsed:.1f} ms per play")
+        started = time.perf_counter()
+        index.add(synthetic_song(rng, ITEMS), 20.0, "Artist", "Title")
+        print(f"add      one more fingerprint in {(time.perf_counter() - started) * 1000:.1f} ms")
+        conn.close()
+
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
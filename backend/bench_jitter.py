@@ -0,0 +1,165 @@
+"""
+Benchmark: frame-interval jitter with DSP in the event loop vs a child process.
+Runs headless — no soundcard or winrt needed.
+
+Both modes capture a real-time synthetic source and, for every block, do
+what the server does before a broadcast: FFT (STFT with --analysis stft),
+beat tracking, log binning and the waveform. "inline" runs the analysis on
+the event loop next to the capture thread (the default server); "process"
+uses DspProcess (--dsp-process) and only copies finished frames out of
+shared memory.
+
+Meanwhile the server's other work is simulated: a thread doing GIL-bound
+Python bookkeeping, and synchronous SQLite commits on the event loop (what
+history_store.add does on every track change), --commit-ms apart.
+
+Reported per mode:
+  capture jitter  std of the intervals between capture timestamps
+  frame jitter    std of the intervals between frames being ready to send
+  p99 / max lag   capture -> ready-to-send latency
+
+    python bench_jitter.py [--seconds 10] [--analysis block|stft] [--load gil,commits]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from audio_sources import create_source
+from beat_tracker import BeatTracker
+from capture import CaptureThread
+from dsp import FrameAnalyzer, StftPlan
+from dsp_process import DspProcess
+
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 2048
+HOP_SIZE = 512
+SOURCE = "synthetic:tones=220+1760,noise=0.05,clicks=120"
+
+
+def gil_hog(stop):
+    """Pure-Python busy work standing in for enrichment bookkeeping."""
+    while not stop.is_set():
+        total = 0
+        for i in range(20000):
+            total += i * i
+        time.sleep(0.001)
+
+
+async def commit_loop(path, interval):
+    """Synchronous SQLite commits on the event loop, like history_store.add."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute("CREATE TABLE IF NOT EXISTS plays (artist TEXT, title TEXT, at REAL)")
+    try:
+        while True:
+            conn.execute("INSERT INTO plays VALUES (?, ?, ?)", ("artist", "title", time.time()))
+            conn.commit()
+            await asyncio.sleep(interval)
+    finally:
+        conn.close()
+
+
+def make_analyzer(analysis):
+    stft = None
+    frame_rate = SAMPLE_RATE / BLOCK_SIZE
+    if analysis == "stft":
+        stft = StftPlan(BLOCK_SIZE, HOP_SIZE, "hann", max_frames=2 * (BLOCK_SIZE // HOP_SIZE))
+        frame_rate = SAMPLE_RATE / HOP_SIZE
+    analyzer = FrameAnalyzer(BLOCK_SIZE, 128, 128, stft=stft, sample_rate=SAMPLE_RATE)
+    tracker = BeatTracker(frame_rate, BLOCK_SIZE // 2 + 1,
+                          max_frames=stft.max_frames if stft else 16)
+    return analyzer, tracker
+
+
+async def run_inline(analysis, seconds, samples):
+    analyzer, tracker = make_analyzer(analysis)
+    source = create_source(SOURCE, SAMPLE_RATE, BLOCK_SIZE)
+    capture = CaptureThread(source, asyncio.get_running_loop(), lookback=analyzer.lookback)
+    capture.start()
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            mono, captured_at = await capture.next_block()
+            tracker.process(analyzer.feed(capture.read_end, capture.recent))
+            analyzer.begin(mono, 0, captured_at, capture.read_end)
+            analyzer.bins(128)
+            analyzer.waveform(128, "minmax")
+            samples.append((captured_at, time.time()))
+    finally:
+        capture.stop()
+
+
+async def run_process(analysis, seconds, samples):
+    analyzer = FrameAnalyzer(BLOCK_SIZE, 128, 128, sample_rate=SAMPLE_RATE)
+    dsp = DspProcess(SOURCE, SAMPLE_RATE, BLOCK_SIZE, analysis, HOP_SIZE, "hann")
+    dsp.start(asyncio.get_running_loop())
+    try:
+        await dsp.next_frame()  # child startup isn't part of the measurement
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            await dsp.next_frame()
+            analyzer.begin(dsp.mono, 0, dsp.timestamp, magnitudes=dsp.magnitudes)
+            analyzer.bins(128)
+            analyzer.waveform(128, "minmax")
+            samples.append((dsp.timestamp, time.time()))
+    finally:
+        dsp.stop()
+
+
+async def measure(mode, args, db_path):
+    stop = threading.Event()
+    if "gil" in args.load:
+        threading.Thread(target=gil_hog, args=(stop,), daemon=True).start()
+    tasks = []
+    if "commits" in args.load:
+        tasks.append(asyncio.create_task(commit_loop(db_path, args.commit_ms / 1000)))
+    samples = []
+    try:
+        run = run_inline if mode == "inline" else run_process
+        await run(args.analysis, args.seconds, samples)
+    finally:
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return np.asarray(samples[1:])  # the first frame has no interval
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--analysis", choices=("block", "stft"), default="block")
+    parser.add_argument("--load", default="gil,commits",
+                        help="comma list of: gil, commits (or 'none')")
+    parser.add_argument("--commit-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"JITTER BENCHMARK  {args.seconds:g}s  analysis={args.analysis}  load={args.load}")
+    print(f"Expected frame interval: {BLOCK_SIZE / SAMPLE_RATE * 1000:.1f} ms")
+    print("=" * 60)
+    print(f"{'mode':>8} {'frames':>7} {'capture jitter':>15} {'frame jitter':>13} "
+          f"{'p99 lag':>8} {'max lag':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        for mode in ("inline", "process"):
+            samples = asyncio.run(measure(mode, args, db_path))
+            captured, ready = samples[:, 0], samples[:, 1]
+            lag = (ready - captured) * 1000
+            print(f"{mode:>8} {len(samples):>7} "
+                  f"{np.std(np.diff(captured)) * 1000:>12.2f} ms "
+                  f"{np.std(np.diff(ready)) * 1000:>10.2f} ms "
+                  f"{np.percentile(lag, 99):>5.1f} ms {lag.max():>5.1f} ms")
+
+    print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
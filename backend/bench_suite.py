@@ -0,0 +1,358 @@
+"""
+Benchmark suite: per-frame DSP + encoding cost, checked against a stored baseline.
+Runs headless — no soundcard or winrt needed.
+
+Drives the capture-loop functions with synthetic blocks at several block
+sizes and bin counts:
+
+  fft             DspPlan.spectrum (rFFT + magnitudes)
+  log_bin         reference log_bin() and the DspPlan version
+  downsample      reference downsample() and the DspPlan version
+  minmax          EnvelopePlan min/max waveform
+  decimate        Decimator 4x anti-aliased decimation (fingerprint feed)
+  json_dumps      encode_json_frame of ready fft + waveform arrays
+  binary          BinaryFrameEncoder.encode (u8)
+  frame_json      a whole frame as the server makes it: FrameAnalyzer.begin,
+  frame_binary    bins, waveform, peak, encode
+
+and records, per case:
+
+  us              CPU time per call: the median, over --rounds passes in
+                  each of --processes worker interpreters, of the best of
+                  --repeat runs — so neither one lucky moment nor one
+                  unlucky process layout decides the number
+  peak_bytes      transient allocation peak of one call (tracemalloc)
+  retained_bytes  memory still growing per call after 100 calls (leaks)
+  frame_bytes     encoded frame size, for the encoders
+
+Results are compared with bench_baseline.json; any metric above
+baseline * (1 + threshold) (+ an absolute slack for time) is a regression
+and the exit status is 1. A case that looks slower is re-timed in up
+to --confirm more worker processes first and only fails if it stays slow. Thresholds live in the baseline file so they can
+be tuned per metric. Timings are machine-specific: record the baseline on
+the machine that runs the check.
+
+    python bench_suite.py                      # compare with the baseline
+    python bench_suite.py --update-baseline    # record a new baseline
+    python bench_suite.py --only frame --json results.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from dsp import Decimator, DspPlan, EnvelopePlan, FrameAnalyzer, downsample, log_bin
+from frame_protocol import BinaryFrameEncoder, encode_json_frame
+
+SAMPLE_RATE = 44100
+WAVEFORM_POINTS = 128
+BLOCK_SIZES = (1024, 2048, 4096)
+BIN_COUNTS = (64, 128, 256)
+BASELINE_PATH = Path(__file__).with_name("bench_baseline.json")
+DEFAULT_THRESHOLDS = {
+    "us": 0.25,             # +25% CPU time...
+    "us_slack": 1.0,        # ...and at least 1 us more, so tiny cases don't flap
+    "peak_bytes": 0.10,
+    "retained_bytes": 0.0,  # plus retained_slack: anything held per call is a leak
+    "retained_slack": 64,
+    "frame_bytes": 0.0,     # encoded sizes are deterministic
+}
+METRICS = ("us", "peak_bytes", "retained_bytes", "frame_bytes")
+
+
+def make_block(block_size, seed=0):
+    """Noise plus a couple of tones, like real program material."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(block_size) / SAMPLE_RATE
+    mono = 0.2 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 3520 * t)
+    return (mono + rng.standard_normal(block_size) * 0.05).astype(np.float32)
+
+
+def build_cases(block_sizes, bin_counts):
+    """name -> zero-argument callable. Callables return the encoded frame, if any."""
+    cases = {}
+    for block in block_sizes:
+        mono = make_block(block)
+        plan = DspPlan(block, 128, WAVEFORM_POINTS)
+        magnitudes = plan.spectrum(mono).copy()
+        envelope = EnvelopePlan(block, WAVEFORM_POINTS, "minmax")
+
+        cases[f"fft/{block}"] = lambda plan=plan, mono=mono: plan.spectrum(mono)
+        cases[f"downsample.ref/{block}"] = lambda mono=mono: downsample(mono, WAVEFORM_POINTS)
+        cases[f"downsample/{block}"] = lambda plan=plan, mono=mono: plan.downsample(mono)
+        cases[f"minmax/{block}"] = lambda envelope=envelope, mono=mono: envelope.reduce(mono)
+        cases[f"decimate/{block}"] = lambda decimator=Decimator(4), mono=mono: decimator.process(mono)
+
+        for bins in bin_counts:
+            bin_plan = DspPlan(block, bins, WAVEFORM_POINTS)
+            fft = bin_plan.normalize(bin_plan.log_bin(magnitudes), 50.0).copy()
+            waveform = envelope.reduce(mono).copy()
+            encoder = BinaryFrameEncoder(bins, WAVEFORM_POINTS, "u8")
+            analyzer = FrameAnalyzer(block, WAVEFORM_POINTS, bins, sample_rate=SAMPLE_RATE)
+            frame_encoder = BinaryFrameEncoder(bins, WAVEFORM_POINTS, "u8")
+
+            cases[f"log_bin.ref/{block}/{bins}"] = (
+                lambda magnitudes=magnitudes, bins=bins: log_bin(magnitudes, bins))
+            cases[f"log_bin/{block}/{bins}"] = (
+                lambda bin_plan=bin_plan, magnitudes=magnitudes: bin_plan.log_bin(magnitudes))
+            cases[f"json_dumps/{block}/{bins}"] = (
+                lambda fft=fft, waveform=waveform: encode_json_frame(1, 1.0, 0.5, fft, waveform))
+            cases[f"binary/{block}/{bins}"] = (
+                lambda encoder=encoder, fft=fft, waveform=waveform:
+                encoder.encode(1, 1.0, 0.5, fft, waveform, (True, 7, 120.0, 0.8)))
+
+            def frame(analyzer=analyzer, mono=mono, bins=bins, encoder=None):
+                analyzer.begin(mono, 1, 1.0)
+                fft = analyzer.bins(bins)
+                waveform = analyzer.waveform(WAVEFORM_POINTS, "minmax")
+                if encoder is None:
+                    return encode_json_frame(1, 1.0, analyzer.peak, fft, waveform)
+                return encoder.encode(1, 1.0, analyzer.peak, fft, waveform)
+
+            cases[f"frame_json/{block}/{bins}"] = frame
+            cases[f"frame_binary/{block}/{bins}"] = (
+                lambda frame=frame, frame_encoder=frame_encoder: frame(encoder=frame_encoder))
+    return cases
+
+
+def time_case(fn, repeat, min_time):
+    """Best per-call seconds over `repeat` runs of at least `min_time` each."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def measure_memory(fn, calls=100):
+    """(transient peak of one call, bytes retained per call) via tracemalloc.
+
+    Retention is the growth over a second batch of `calls`, so caches that
+    fill up during the first batch don't count — a leak keeps growing.
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        for _ in range(calls - 1):
+            fn()
+        settled, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            fn()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before, max(0, after - settled) // calls
+
+
+def frame_size(result):
+    if isinstance(result, bytes):
+        return len(result)
+    if isinstance(result, str):
+        return len(result.encode("utf-8"))
+    return None
+
+
+def profile(cases):
+    """Allocation and frame-size metrics, which don't need repeated timing."""
+    results = {}
+    for name, fn in cases.items():
+        out = fn()  # warm-up: plan caches, first-call allocations
+        peak, retained = measure_memory(fn)
+        results[name] = {
+            "us": None,
+            "peak_bytes": peak,
+            "retained_bytes": retained,
+            "frame_bytes": frame_size(out),
+        }
+    return results
+
+
+def time_cases(cases, rounds, repeat, min_time):
+    """name -> per-round timings (us), interleaving the cases in every round."""
+    samples = {name: [] for name in cases}
+    for fn in cases.values():
+        fn()
+    for _ in range(rounds):
+        for name, fn in cases.items():
+            samples[name].append(time_case(fn, repeat, min_time) * 1e6)
+    return samples
+
+
+def time_in_workers(names, processes, rounds, repeat, min_time):
+    """Collect timings from `processes` fresh interpreters.
+
+    Hash seeds and memory layout are fixed for a process's lifetime and can
+    shift a case's time by tens of percent, so samples from one process
+    aren't enough to compare against a baseline taken in another.
+    """
+    if not processes:
+        cases = build_cases(BLOCK_SIZES, BIN_COUNTS)
+        return time_cases({name: cases[name] for name in names}, rounds, repeat, min_time)
+    command = [sys.executable, str(Path(__file__).resolve()), "--worker", ",".join(names),
+               "--rounds", str(rounds), "--repeat", str(repeat), "--min-time", str(min_time)]
+    samples = {name: [] for name in names}
+    for _ in range(processes):
+        out = subprocess.run(command, capture_output=True, text=True, check=True,
+                             cwd=Path(__file__).parent)
+        for name, values in json.loads(out.stdout).items():
+            samples[name].extend(values)
+    return samples
+
+
+def summarize(results, samples):
+    for name, values in samples.items():
+        results[name]["us"] = round(float(np.median(values)), 3)
+
+
+def confirm(results, samples, baseline, args):
+    """Give cases whose time regressed more timing processes before they count."""
+    for _ in range(args.confirm):
+        suspects = sorted({name for name, metric, *_, bad in compare(results, baseline)
+                           if bad and metric == "us"})
+        if not suspects:
+            return
+        more = time_in_workers(suspects, max(1, args.processes), args.rounds, args.repeat,
+                               args.min_time)
+        for name, values in more.items():
+            samples[name].extend(values)
+        summarize(results, {name: samples[name] for name in suspects})
+
+
+def compare(results, baseline):
+    """Yield (case, metric, value, base value, regressed)."""
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    base_cases = baseline.get("cases", {})
+    for name, metrics in results.items():
+        base = base_cases.get(name)
+        if base is None:
+            continue
+        for metric in METRICS:
+            value, ref = metrics.get(metric), base.get(metric)
+            if value is None or ref is None:
+                continue
+            limit = ref * (1 + thresholds[metric])
+            if metric == "us":
+                limit = max(limit, ref + thresholds["us_slack"])
+            elif metric == "retained_bytes":
+                limit += thresholds["retained_slack"]
+            yield name, metric, value, ref, value > limit
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "processor": platform.processor() or None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="write these results as the new baseline (keeps its thresholds)")
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--processes", type=int, default=3,
+                        help="worker interpreters to time in, 0 = this one (default: 3)")
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="timing passes over all cases per worker (default: 2)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="timing runs per case per pass (default: 3)")
+    parser.add_argument("--min-time", type=float, default=0.01,
+                        help="seconds per timing run (default: 0.01)")
+    parser.add_argument("--confirm", type=int, default=3,
+                        help="re-timing attempts before a slower case counts as regressed "
+                             "(default: 3)")
+    parser.add_argument("--json", type=Path, metavar="PATH", help="also write the results here")
+    parser.add_argument("--worker", metavar="CASES", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    cases = build_cases(BLOCK_SIZES, BIN_COUNTS)
+    if args.worker:
+        names = args.worker.split(",")
+        samples = time_cases({name: cases[name] for name in names}, args.rounds, args.repeat,
+                             args.min_time)
+        print(json.dumps(samples))
+        return 0
+    if args.only:
+        cases = {name: fn for name, fn in cases.items() if args.only in name}
+        if not cases:
+            parser.error(f"no cases match --only {args.only!r}")
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+
+    print("=" * 60)
+    print(f"BENCHMARK SUITE  {len(cases)} cases  processes={args.processes}  "
+          f"rounds={args.rounds}  repeat={args.repeat}  baseline={args.baseline.name}")
+    if baseline and baseline.get("environment") != environment():
+        print(f"Note: baseline recorded on {baseline.get('environment')}")
+    print("=" * 60)
+
+    results = profile(cases)
+    samples = time_in_workers(list(cases), args.processes, args.rounds, args.repeat,
+                              args.min_time)
+    summarize(results, samples)
+    if baseline and not args.update_baseline:
+        confirm(results, samples, baseline, args)
+    regressions = {(name, metric) for name, metric, *_, bad in compare(results, baseline) if bad}
+    base_cases = baseline.get("cases", {})
+
+    print(f"{'case':<26} {'us':>9} {'base':>9} {'change':>8} {'peak B':>8} {'held B':>7} "
+          f"{'frame B':>8}")
+    for name, metrics in results.items():
+        base_us = base_cases.get(name, {}).get("us")
+        change = f"{(metrics['us'] / base_us - 1) * 100:+7.1f}%" if base_us else f"{'new':>8}"
+        flags = ",".join(metric for case, metric in sorted(regressions) if case == name)
+        print(f"{name:<26} {metrics['us']:>9.2f} {base_us or 0:>9.2f} {change} "
+              f"{metrics['peak_bytes']:>8} {metrics['retained_bytes']:>7} "
+              f"{metrics['frame_bytes'] if metrics['frame_bytes'] is not None else '-':>8}"
+              + (f"  REGRESSED: {flags}" if flags else ""))
+    print("-" * 60)
+
+    if args.json:
+        args.json.write_text(json.dumps({"environment": environment(), "cases": results},
+                                         indent=2), encoding="utf-8")
+
+    if args.update_baseline:
+        updated = {
+            "thresholds": {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})},
+            "environment": environment(),
+            "cases": {**base_cases, **results},
+        }
+        args.baseline.write_text(json.dumps(updated, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline} ({len(results)} cases)")
+        return 0
+    if not baseline:
+        print(f"No baseline at {args.baseline} — run with --update-baseline first")
+        return 2
+    missing = [name for name in results if name not in base_cases]
+    if missing:
+        print(f"{len(missing)} case(s) not in the baseline: {', '.join(missing)}")
+    if regressions:
+        print(f"FAIL: {len(regressions)} regression(s) in "
+              f"{len({name for name, _ in regressions})} case(s)")
+        return 1
+    print("OK: no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Benchmark: browser tab-title parsing (title_parser.parse_tab_title).
+Runs headless — no Chrome or Windows APIs needed.
+
+Parses a corpus of real-world Chrome window titles (the " - Google Chrome"
+already stripped, as get_chrome_window_titles returns them) and measures:
+
+  check      every corpus title against its expected (artist, title)
+  uncached   the compiled parser alone, cache bypassed
+  poll       --polls media polls over the corpus' open tabs, through the
+             result cache, as detect_from_chrome_titles runs them
+  churn      titles never seen before, cache full and evicting
+
+    python bench_titles.py [--repeat 2000] [--polls 10000]
+"""
+import argparse
+import time
+
+from title_parser import TITLE_CACHE_SIZE, parse_tab_title
+
+NOT_A_SONG = ("", "")
+
+# (raw tab title, require_service, expected (artist, title))
+CORPUS = [
+    ("Roygbiv - Boards of Canada - Pandora", True, ("Boards of Canada", "Roygbiv")),
+    ("Teardrop - Massive Attack | Pandora", True, ("Massive Attack", "Teardrop")),
+    ("Windowlicker – Aphex Twin – Pandora", True, ("Aphex Twin", "Windowlicker")),
+    ("Hyperballad — Björk — Pandora", True, ("Björk", "Hyperballad")),
+    ("Song (feat. A · B) - Artist - Pandora", True, ("Artist", "Song (feat. A · B)")),
+    ("My Collection - Pandora", True, NOT_A_SONG),
+    ("Stations | Pandora", True, NOT_A_SONG),
+    ("Pandora", True, NOT_A_SONG),
+    ("Dreams - Fleetwood Mac - YouTube Music", True, ("Fleetwood Mac", "Dreams")),
+    ("(2) Lose Yourself - Eminem - YouTube Music", True, ("Eminem", "Lose Yourself")),
+    ("Library - YouTube Music", True, NOT_A_SONG),
+    ("Search - YouTube Music", True, NOT_A_SONG),
+    ("YouTube Music", True, NOT_A_SONG),
+    ("Daft Punk - Get Lucky (Official Video) - YouTube", True, ("Daft Punk", "Get Lucky")),
+    ("(3) Radiohead - Karma Police [Official Music Video] - YouTube", True,
+     ("Radiohead", "Karma Police")),
+    ("Billie Eilish - bad guy (Official Audio) - YouTube", True, ("Billie Eilish", "bad guy")),
+    ("Queen – Bohemian Rhapsody (Official Video Remastered) - YouTube", True,
+     ("Queen", "Bohemian Rhapsody (Official Video Remastered)")),
+    ("Tame Impala - The Less I Know The Better (Lyrics) - YouTube", True,
+     ("Tame Impala", "The Less I Know The Better")),
+    ("Nujabes - Aruarian Dance [HD] - YouTube", True, ("Nujabes", "Aruarian Dance")),
+    ("(12) YouTube", True, NOT_A_SONG),
+    ("lofi hip hop radio 📚 beats to relax/study to - YouTube", True,
+     ("", "lofi hip hop radio 📚 beats to relax/study to")),
+    ("Glue - Bicep - SoundCloud", True, ("Bicep", "Glue")),
+    ("Midnight City - M83 - Spotify", True, ("M83", "Midnight City")),
+    ("Blinding Lights | Spotify", True, ("", "Blinding Lights")),
+    ("Search | Spotify", True, NOT_A_SONG),
+    ("Home - Spotify", True, NOT_A_SONG),
+    ("Harder, Better, Faster, Stronger - Daft Punk - Tidal", True,
+     ("Daft Punk", "Harder, Better, Faster, Stronger")),
+    ("La Vie en rose - Édith Piaf - Deezer", True, ("Édith Piaf", "La Vie en rose")),
+    ("Bad Guy - Billie Eilish - Amazon Music", True, ("Billie Eilish", "Bad Guy")),
+    ("Clair de Lune - Claude Debussy - Apple Music", True, ("Claude Debussy", "Clair de Lune")),
+    ("Goldberg Variations, BWV 988: Aria - Glenn Gould - Qobuz", True,
+     ("Glenn Gould", "Goldberg Variations, BWV 988: Aria")),
+    ("Inbox (1,204) - someone@example.com - Gmail", True, NOT_A_SONG),
+    ("python - How do I reverse a list? - Stack Overflow", True, NOT_A_SONG),
+    ("Pull requests · jamscrapper/JamScrapper · GitHub", True, NOT_A_SONG),
+    ("New Tab", True, NOT_A_SONG),
+    ("Wikipedia, the free encyclopedia", True, NOT_A_SONG),
+    ("Roygbiv - Boards of Canada", False, ("Boards of Canada", "Roygbiv")),
+    ("Roygbiv", False, ("", "Roygbiv")),
+    ("Get Lucky - Daft Punk - YouTube Music", False, ("Daft Punk", "Get Lucky")),
+    ("", False, NOT_A_SONG),
+]
+
+OPEN_TABS = [(raw, require) for raw, require, _ in CORPUS if require][:12]  # a busy Chrome window
+
+
+def per_call(seconds, calls):
+    return f"{seconds / calls * 1e6:7.2f} us/title"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000, help="passes over the corpus")
+    parser.add_argument("--polls", type=int, default=10000)
+    args = parser.parse_args()
+    uncached = parse_tab_title.__wrapped__
+
+    print("=" * 60)
+    print(f"TAB TITLE PARSER BENCHMARK  {len(CORPUS)} titles  cache {TITLE_CACHE_SIZE}")
+    print("=" * 60)
+
+    wrong = [(raw, uncached(raw, require), expected) for raw, require, expected in CORPUS
+             if uncached(raw, require) != expected]
+    print(f"check    {len(CORPUS) - len(wrong)}/{len(CORPUS)} as expected")
+    for raw, got, expected in wrong:
+        print(f"  {raw!r}: got {got}, expected {expected}")
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for raw, require, _ in CORPUS:
+            uncached(raw, require)
+    print(f"uncached {per_call(time.perf_counter() - started, args.repeat * len(CORPUS))}")
+
+    parse_tab_title.cache_clear()
+    started = time.perf_counter()
+    for _ in range(args.polls):
+        for raw, require in OPEN_TABS:
+            parse_tab_title(raw, require)
+    elapsed = time.perf_counter() - started
+    info = parse_tab_title.cache_info()
+    print(f"poll     {per_call(elapsed, args.polls * len(OPEN_TABS))}  "
+          f"{elapsed / args.polls * 1e6:6.1f} us per {len(OPEN_TABS)}-tab poll, "
+          f"{info.hits / (info.hits + info.misses):.2%} cache hits")
+
+    titles = [f"Song {i} - Artist {i} - Pandora" for i in range(args.repeat * 10)]
+    for raw in titles[:TITLE_CACHE_SIZE]:
+        parse_tab_title(f"{raw} (warm)", True)
+    started = time.perf_counter()
+    for raw in titles:
+        parse_tab_title(raw, True)
+    print(f"churn    {per_call(time.perf_counter() - started, len(titles))}  "
+          f"({len(titles)} new titles through a full cache)")
+
+    print("-" * 60)
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+"""Dedicated audio capture thread feeding a preallocated ring buffer.
+
+The capture thread owns the AudioSource: it reads blocks, downmixes them to
+mono float32 straight into a SampleRing and pokes the asyncio loop with
+call_soon_threadsafe. Capture never goes through the default executor, so
+slow yt-dlp / MusicBrainz / Pillow jobs there can't starve it.
+
+Latency bound: the consumer never processes a block older than
+max_lag_blocks; if it falls further behind it skips ahead to the newest block
+(counted as overruns). Frame production therefore lags capture by at most
+max_lag_blocks * block_size / sample_rate plus processing time.
+"""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+
+class SampleRing:
+    """Fixed-capacity float32 sample ring.
+
+    The first `window` samples are mirrored past the end of the buffer, so any
+    span of up to `window` samples starting anywhere in the ring is available
+    as one contiguous view — no copy needed at the wrap point.
+    """
+
+    def __init__(self, capacity, window):
+        if window > capacity:
+            raise ValueError("window must not exceed capacity")
+        self.capacity = capacity
+        self.window = window
+        self._buf = np.zeros(capacity + window, dtype=np.float32)
+        self.written = 0  # total samples ever written; monotonic
+
+    def write(self, samples):
+        """Append up to `window` samples (called from the writer thread only)."""
+        n = len(samples)
+        if n > self.window:
+            raise ValueError("write larger than ring window")
+        pos = self.written % self.capacity
+        first = min(n, self.capacity - pos)
+        self._buf[pos:pos + first] = samples[:first]
+        if pos < self.window:
+            mirror = min(first, self.window - pos)
+            self._buf[self.capacity + pos:self.capacity + pos + mirror] = samples[:mirror]
+        rest = n - first
+        if rest:
+            self._buf[:rest] = samples[first:]
+            self._buf[self.capacity:self.capacity + rest] = samples[first:]
+        self.written += n
+
+    def view(self, start, length):
+        """Contiguous read-only view of `length` samples from absolute index `start`."""
+        if length > self.window:
+            raise ValueError("view larger than ring window")
+        if start < self.written - self.capacity or start + length > self.written:
+            raise IndexError("samples no longer (or not yet) in the ring")
+        pos = start % self.capacity
+        view = self._buf[pos:pos + length]
+        view.flags.writeable = False
+        return view
+
+
+class CaptureThread:
+    """Long-lived thread reading an AudioSource into a SampleRing."""
+
+    def __init__(self, source, loop, ring_blocks=16, max_lag_blocks=4, lookback=0):
+        self.source = source
+        self.block_size = source.block_size
+        self.sample_rate = source.sample_rate
+        self.max_lag_blocks = max_lag_blocks
+        # lookback: extra history recent() can return beyond one block (STFT spans)
+        self.ring = SampleRing(ring_blocks * self.block_size, self.block_size + lookback)
+
+        self._loop = loop
+        self._ready = asyncio.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._mono = np.zeros(self.block_size, dtype=np.float32)
+        self._block_times = np.zeros(ring_blocks, dtype=np.float64)
+        self._read_pos = 0
+
+        self.blocks_captured = 0
+        self.blocks_consumed = 0
+        self.overruns = 0       # blocks skipped because the consumer fell behind
+        self.underruns = 0      # waits that outlasted two block periods
+        self.read_errors = 0
+        self.max_lag_seen = 0.0  # seconds between capture and consumption
+
+    @property
+    def block_duration(self):
+        return self.block_size / self.sample_rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        with self.source:
+            print(f"Capturing audio from: {self.source.name}")
+            while not self._stop.is_set():
+                try:
+                    data = self.source.read()
+                except Exception as e:
+                    self.read_errors += 1
+                    print(f"Audio capture error: {e}")
+                    time.sleep(self.block_duration)
+                    continue
+                if data.ndim == 1:
+                    mono = data
+                else:
+                    mono = np.mean(data, axis=1, out=self._mono[:len(data)])
+                # Timestamp first: write() advancing ring.written is what
+                # publishes the block to next_block() on the loop thread
+                block_index = self.ring.written // self.block_size
+                self._block_times[block_index % len(self._block_times)] = time.time()
+                self.ring.write(mono)
+                self.blocks_captured += 1
+                try:
+                    self._loop.call_soon_threadsafe(self._ready.set)
+                except RuntimeError:
+                    return  # event loop closed
+
+    async def next_block(self):
+        """Wait for the next unread block. Returns (mono view, capture timestamp).
+
+        The view points into the ring — finish using it before the next await
+        that could let the consumer fall max_lag_blocks behind.
+        """
+        block = self.block_size
+        while self.ring.written - self._read_pos < block:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=2 * self.block_duration)
+            except asyncio.TimeoutError:
+                self.underruns += 1
+
+        lag = self.ring.written - self._read_pos
+        if lag > self.max_lag_blocks * block:
+            newest = (self.ring.written // block - 1) * block
+            self.overruns += (newest - self._read_pos) // block
+            self._read_pos = newest
+
+        start = self._read_pos
+        self._read_pos += block
+        self.blocks_consumed += 1
+        captured_at = self._block_times[(start // block) % len(self._block_times)]
+        self.max_lag_seen = max(self.max_lag_seen, time.time() - captured_at)
+        return self.ring.view(start, block), captured_at
+
+    @property
+    def read_end(self):
+        """Absolute index one past the last sample next_block() returned."""
+        return self._read_pos
+
+    def recent(self, length):
+        """Contiguous view of the `length` samples ending at read_end."""
+        return self.ring.view(self._read_pos - length, length)
+
+    def stats(self):
+        return {
+            "source": self.source.name,
+            "blocksCaptured": self.blocks_captured,
+            "blocksConsumed": self.blocks_consumed,
+            "overruns": self.overruns,
+            "underruns": self.underruns,
+            "readErrors": self.read_errors,
+            "maxLagMs": round(self.max_lag_seen * 1000, 1),
+            "latencyBoundMs": round(self.max_lag_blocks * self.block_duration * 1000, 1),
+        }
@@ -0,0 +1,142 @@
+"""Per-client outgoing queues for the WebSocket stream.
+
+Every connected client gets a ClientSession with its own sender task, so one
+slow consumer can't hold back the others:
+  * audio frames go into a small bounded queue — when it's full the OLDEST
+    frame is dropped, since a newer frame supersedes it anyway;
+  * control messages (now_playing state/deltas) go into an unbounded queue
+    that is never dropped and is always drained before audio.
+
+A client that keeps dropping frames gets its frame rate halved (backoff, on
+top of its subscribed fpsDivisor) and recovers once it keeps up again. A
+client whose send doesn't complete within stuck_timeout is disconnected.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+MAX_BACKOFF = 8          # at most every 8th subscribed frame
+BACKOFF_STEP_SECONDS = 1.0
+RECOVER_SECONDS = 5.0    # drop-free time before the backoff is halved again
+
+
+class ClientSession:
+    """One WebSocket client: stream options, outgoing queues and send stats."""
+
+    def __init__(self, websocket, opts, max_frames=4, stuck_timeout=5.0):
+        self.websocket = websocket
+        self.opts = opts
+        self.stuck_timeout = stuck_timeout
+        self.backoff = 1
+        self.last_seq = None  # seq of the newest frame queued for this client
+
+        self._frames = deque(maxlen=max_frames)  # (frame, queued_at)
+        self._control = deque()                   # (message, queued_at)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._last_adjust = time.monotonic()
+        self._last_drop = 0.0
+
+        self.connected_at = time.time()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.control_sent = 0
+        self.latency = 0.0      # EWMA of queue + send time, seconds
+        self.max_latency = 0.0
+        self.disconnect_reason = None
+
+    @property
+    def fps_divisor(self):
+        """Effective divisor: the subscribed one times the backpressure backoff."""
+        return self.opts["fpsDivisor"] * self.backoff
+
+    def frame_due(self, seq):
+        return self.last_seq is None or seq - self.last_seq >= self.fps_divisor
+
+    def push_frame(self, frame, seq):
+        """Queue an audio frame, dropping the oldest queued frame if full."""
+        now = time.monotonic()
+        if len(self._frames) == self._frames.maxlen:
+            self.frames_dropped += 1
+            self._last_drop = now
+            if self.backoff < MAX_BACKOFF and now - self._last_adjust >= BACKOFF_STEP_SECONDS:
+                self.backoff *= 2
+                self._last_adjust = now
+        elif (self.backoff > 1 and now - self._last_drop >= RECOVER_SECONDS
+              and now - self._last_adjust >= RECOVER_SECONDS):
+            self.backoff //= 2
+            self._last_adjust = now
+        self._frames.append((frame, now))
+        self.last_seq = seq
+        self._wakeup.set()
+
+    def push_control(self, message):
+        """Queue a state/delta message. These are never dropped."""
+        self._control.append((message, time.monotonic()))
+        self._wakeup.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._control or self._frames:
+                if self._control:
+                    message, queued_at = self._control.popleft()
+                    is_frame = False
+                else:
+                    message, queued_at = self._frames.popleft()
+                    is_frame = True
+                try:
+                    await asyncio.wait_for(self.websocket.send(message), timeout=self.stuck_timeout)
+                except asyncio.TimeoutError:
+                    self.disconnect_reason = f"send stalled for {self.stuck_timeout:g}s"
+                    print(f"  Disconnecting stuck client: {self.disconnect_reason}")
+                    # A stuck client won't finish a closing handshake either
+                    self.websocket.transport.abort()
+                    return
+                except Exception:
+                    return  # connection closed; handler() cleans up
+
+                elapsed = time.monotonic() - queued_at
+                self.latency = self.latency * 0.9 + elapsed * 0.1
+                self.max_latency = max(self.max_latency, elapsed)
+                if is_frame:
+                    self.frames_sent += 1
+                else:
+                    self.control_sent += 1
+
+    def stats(self):
+        remote = self.websocket.remote_address
+        return {
+            "remote": f"{remote[0]}:{remote[1]}" if remote else None,
+            "connectedAt": self.connected_at,
+            "channel": self.opts.get("channel"),
+            "format": self.opts["format"],
+            "encoding": self.opts["encoding"],
+            "bins": self.opts["bins"],
+            "bands": self.opts["bands"],
+            "points": self.opts["points"],
+            "waveformMode": self.opts["waveformMode"],
+            "fields": list(self.opts["fields"]),
+            "fpsDivisor": self.opts["fpsDivisor"],
+            "backoff": self.backoff,
+            "queueDepth": len(self._frames),
+            "controlQueueDepth": len(self._control),
+            "framesSent": self.frames_sent,
+            "framesDropped": self.frames_dropped,
+            "controlSent": self.control_sent,
+            "latencyMs": round(self.latency * 1000, 1),
+            "maxLatencyMs": round(self.max_latency * 1000, 1),
+        }
@@ -101,6 +101,18 @@ def init_db(conn: sqlite3.Connection):
             saved_at  TEXT NOT NULL
         );
 
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            recording_id TEXT NOT NULL DEFAULT '',
+            artist       TEXT NOT NULL DEFAULT '',
+            title        TEXT NOT NULL DEFAULT '',
+            album        TEXT NOT NULL DEFAULT '',
+            duration     REAL DEFAULT 0,
+            fingerprint  BLOB NOT NULL,  -- raw Chromaprint sub-fingerprints, little-endian uint32
+            created_at   TEXT NOT NULL
+        );
+
+
         CREATE INDEX IF NOT EXISTS idx_play_history_played_at ON play_history(played_at);
         CREATE INDEX IF NOT EXISTS idx_playlist_tracks_playlist ON playlist_tracks(playlist_id, position);
         CREATE INDEX IF NOT EXISTS idx_downloads_state ON downloads(state);
@@ -0,0 +1,136 @@
+"""In-process bus carrying track detections to the now-playing handler.
+
+Producers (the extension's POST /track on the HTTP thread, the media
+session and Chrome-title pollers, fingerprint identification, replay)
+publish() from any thread; the
+event is handed to the event loop with call_soon_threadsafe and the
+consumer (run()) picks it up as soon as the loop gets to it, with no
+polling in between.
+
+Detections of the same track from the same source that arrive before the
+consumer gets to the first one are coalesced into it: the queued event
+keeps its place and its publish time, and takes any album / album art the
+newer one adds. Nothing is overwritten without being seen, and a burst of
+repeats costs one handler call.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+LATENCY_HISTORY = 200  # publish-to-handler samples kept per source
+
+
+def _track_key(artist, title):
+    return " ".join((artist or "").lower().split()), " ".join((title or "").lower().split())
+
+
+class DetectionEvent:
+    def __init__(self, artist, title, album, album_art_url, source, musicbrainz_id=""):
+        self.artist = artist
+        self.title = title
+        self.album = album or ""
+        self.album_art_url = album_art_url
+        self.source = source
+        self.musicbrainz_id = musicbrainz_id or ""
+        self.key = (source, *_track_key(artist, title))
+        self.published_at = time.perf_counter()
+        self.coalesced = 0
+
+    def merge(self, newer):
+        """Fold a newer detection of the same track into this queued one."""
+        self.album = self.album or newer.album
+        self.album_art_url = self.album_art_url or newer.album_art_url
+        self.musicbrainz_id = self.musicbrainz_id or newer.musicbrainz_id
+        self.coalesced += 1
+
+
+class SourceStats:
+    def __init__(self):
+        self.published = 0
+        self.coalesced = 0
+        self.handled = 0
+        self.latency_ms = deque(maxlen=LATENCY_HISTORY)
+
+    def to_dict(self):
+        latency = sorted(self.latency_ms)
+        return {
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "handled": self.handled,
+            "latencyLastMs": round(self.latency_ms[-1], 3) if latency else None,
+            "latencyP50Ms": round(latency[len(latency) // 2], 3) if latency else None,
+            "latencyMaxMs": round(latency[-1], 3) if latency else None,
+        }
+
+
+class DetectionBus:
+    """asyncio.Queue of DetectionEvents, fed thread-safely, drained by run()."""
+
+    def __init__(self):
+        self._loop = None
+        self._queue = None
+        self._pending = {}  # event key -> queued, not yet handled event
+        self.sources = {}   # source name -> SourceStats
+        self.max_depth = 0
+
+    def attach(self, loop):
+        """Bind to the event loop run() will consume on."""
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+    def _stats(self, source):
+        stats = self.sources.get(source)
+        if stats is None:
+            stats = self.sources[source] = SourceStats()
+        return stats
+
+    def publish(self, artist, title, album="", album_art_url=None, source="unknown",
+                musicbrainz_id=""):
+        """Queue a detection. Safe from any thread; dropped before attach()."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        event = DetectionEvent(artist, title, album, album_art_url, source, musicbrainz_id)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._enqueue(event)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, event)
+
+    def _enqueue(self, event):
+        """Loop side of publish(): coalesce or queue."""
+        stats = self._stats(event.source)
+        stats.published += 1
+        queued = self._pending.get(event.key)
+        if queued is not None:
+            queued.merge(event)
+            stats.coalesced += 1
+            return
+        self._pending[event.key] = event
+        self._queue.put_nowait(event)
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def run(self, handler):
+        """Await handler(artist, title, album, album_art_url, source, musicbrainz_id)
+        for each event, in order."""
+        while True:
+            event = await self._queue.get()
+            del self._pending[event.key]  # later repeats queue anew: they may matter now
+            stats = self._stats(event.source)
+            stats.latency_ms.append((time.perf_counter() - event.published_at) * 1000)
+            stats.handled += 1
+            try:
+                await handler(event.artist, event.title, event.album, event.album_art_url,
+                              event.source, event.musicbrainz_id)
+            except Exception as e:
+                print(f"  [ERR] Detection from {event.source} failed: {e}")
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "maxDepth": self.max_depth,
+            "sources": {name: stats.to_dict() for name, stats in self.sources.items()},
+        }
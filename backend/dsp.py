@@ -0,0 +1,650 @@
+"""Audio analysis helpers for the capture loop.
+
+`DspPlan` precomputes everything the per-frame path needs (log-bin edges,
+waveform gather indices, output buffers) so that processing a block is a
+handful of vectorized NumPy calls with no Python loops and no allocations.
+`StftPlan` does the same for overlapping windowed frames: every hop in a
+span of the ring buffer goes through one batched 2D rfft. `FilterBank` and
+`BandAgc` provide mel/Bark bands with per-band gain control as an
+alternative to log binning, and `EnvelopePlan` min/max/RMS waveforms.
+`Decimator` low-passes and downsamples a stream (the fingerprint buffer).
+"""
+
+import inspect
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# NumPy 2.x can write the FFT into a caller-owned array; 1.x always allocates.
+_RFFT_HAS_OUT = "out" in inspect.signature(np.fft.rfft).parameters
+
+
+def log_bin(fft_data, num_bins):
+    """Group FFT bins into num_bins buckets using logarithmic spacing.
+
+    Reference implementation — the capture loop uses DspPlan.log_bin instead.
+    """
+    n = len(fft_data)
+    if n == 0:
+        return np.zeros(num_bins)
+
+    edges = np.logspace(np.log10(1), np.log10(n), num_bins + 1).astype(int)
+    edges = np.clip(edges, 0, n)
+    edges = np.unique(edges)
+
+    binned = np.zeros(len(edges) - 1)
+    for i in range(len(edges) - 1):
+        start, end = edges[i], edges[i + 1]
+        if start < end:
+            binned[i] = np.mean(fft_data[start:end])
+
+    if len(binned) < num_bins:
+        binned = np.pad(binned, (0, num_bins - len(binned)))
+    elif len(binned) > num_bins:
+        binned = binned[:num_bins]
+
+    return binned
+
+
+def downsample(data, target_len):
+    """Downsample an array to target_len points.
+
+    Reference implementation — the capture loop uses DspPlan.downsample instead.
+    """
+    if len(data) <= target_len:
+        return data
+    indices = np.linspace(0, len(data) - 1, target_len).astype(int)
+    return data[indices]
+
+
+def _log_bin_edges(n, num_bins):
+    """Same bucket edges as log_bin(), truncated to at most num_bins buckets."""
+    edges = np.logspace(np.log10(1), np.log10(n), num_bins + 1).astype(np.intp)
+    edges = np.unique(np.clip(edges, 0, n))
+    return edges[:num_bins + 1]
+
+
+class DspPlan:
+    """Precomputed FFT binning + waveform plan for one (block size, bins, points) shape.
+
+    Every method writes into buffers owned by the plan and returns them, so
+    callers must copy (or finish encoding) before processing the next block.
+    Plans are not thread-safe and their buffers must not be shared; use one
+    per consumer (each FrameAnalyzer builds its own). Only the constant
+    tables behind them are shared (see _plan_tables()).
+    """
+
+    def __init__(self, block_size, num_bins, waveform_points):
+        self.block_size = block_size
+        self.num_bins = num_bins
+        self.waveform_points = waveform_points
+        self.spectrum_size = block_size // 2 + 1
+
+        # reduceat sums [edges[i], edges[i+1]) and the final index runs to the
+        # end of the array, so magnitudes carry one trailing zero slot: the last
+        # edge may equal spectrum_size and its (discarded) sum is always 0.
+        self._edges, self._widths, self._wave_idx = _plan_tables(block_size, num_bins,
+                                                                 waveform_points)
+        self._used_bins = len(self._edges) - 1
+        self._sums = np.zeros(len(self._edges), dtype=np.float32)
+        self._padded = np.zeros(self.spectrum_size + 1, dtype=np.float32)
+        self.magnitudes = self._padded[:self.spectrum_size]
+        self._spectrum = np.zeros(self.spectrum_size, dtype=np.complex64)
+
+        self.mono = np.zeros(block_size, dtype=np.float32)
+        self.fft_out = np.zeros(num_bins, dtype=np.float32)
+        self.fft_norm = np.zeros(num_bins, dtype=np.float32)
+
+        self.waveform_out = np.zeros(min(block_size, waveform_points), dtype=np.float32)
+
+    def downmix(self, data):
+        """Average a (frames, channels) block to mono. Returns self.mono."""
+        if data.ndim == 1:
+            np.copyto(self.mono, data)
+        else:
+            np.mean(data, axis=1, out=self.mono)
+        return self.mono
+
+    def spectrum(self, mono):
+        """Magnitude spectrum of one block. Returns self.magnitudes."""
+        if _RFFT_HAS_OUT:
+            np.fft.rfft(mono, out=self._spectrum)
+            np.abs(self._spectrum, out=self.magnitudes)
+        else:
+            np.abs(np.fft.rfft(mono), out=self.magnitudes)
+        return self.magnitudes
+
+    def log_bin(self, magnitudes):
+        """Log-spaced bucket means of a magnitude spectrum. Returns self.fft_out."""
+        if magnitudes is not self.magnitudes:
+            np.copyto(self.magnitudes, magnitudes, casting="same_kind")
+        np.add.reduceat(self._padded, self._edges, out=self._sums)
+        np.divide(self._sums[:self._used_bins], self._widths,
+                  out=self.fft_out[:self._used_bins])
+        return self.fft_out
+
+    def normalize(self, binned, scale):
+        """Scale binned values into [0, 1]. Returns self.fft_norm."""
+        if scale > 0:
+            np.divide(binned, scale, out=self.fft_norm)
+            np.clip(self.fft_norm, 0, 1, out=self.fft_norm)
+        else:
+            self.fft_norm.fill(0)
+        return self.fft_norm
+
+    def downsample(self, mono):
+        """Evenly spaced waveform points of one block. Returns self.waveform_out."""
+        if self._wave_idx is None:
+            np.copyto(self.waveform_out, mono[:len(self.waveform_out)])
+        else:
+            np.take(mono, self._wave_idx, out=self.waveform_out)
+        return self.waveform_out
+
+    @staticmethod
+    def peak(mono):
+        """Absolute peak of a block without allocating an abs() temporary."""
+        return max(float(mono.max()), -float(mono.min()))
+
+
+@lru_cache(maxsize=16)
+def _plan_tables(block_size, num_bins, waveform_points):
+    """(bin edges, bin widths, waveform indices) shared by every DspPlan of one shape.
+
+    Nothing writes to them. They aren't flagged read-only because numpy copies
+    read-only index arrays on every take() / reduceat() call.
+    """
+    edges = _log_bin_edges(block_size // 2 + 1, num_bins)
+    wave_idx = None
+    if block_size > waveform_points:
+        wave_idx = np.linspace(0, block_size - 1, waveform_points).astype(np.intp)
+    return edges, np.diff(edges).astype(np.float32), wave_idx
+
+
+WINDOWS = {
+    "hann": np.hanning,
+    "hamming": np.hamming,
+    "blackman": np.blackman,
+    "rect": np.ones,
+}
+
+
+@lru_cache(maxsize=8)
+def get_window(name, size):
+    """Periodic analysis window as a shared read-only float32 array."""
+    if name not in WINDOWS:
+        raise ValueError(f"unknown window: {name!r} (choose from {', '.join(WINDOWS)})")
+    window = WINDOWS[name](size + 1)[:-1].astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+class StftPlan:
+    """Overlapping windowed magnitude spectra, batched into one 2D rfft.
+
+    analyse() takes a contiguous span of samples (a view into the capture
+    ring) and treats every hop-spaced frame in it as a row of a strided
+    sliding_window_view — frames are never copied out one by one. The only
+    pass over the data before the FFT is the single windowing multiply into
+    a preallocated (max_frames, frame_size) buffer.
+    """
+
+    def __init__(self, frame_size, hop, window="hann", max_frames=8):
+        if not 0 < hop <= frame_size:
+            raise ValueError("hop must be between 1 and the frame size")
+        self.frame_size = frame_size
+        self.hop = hop
+        self.window_name = window
+        self.window = get_window(window, frame_size)
+        self.max_frames = max_frames
+        self.spectrum_size = frame_size // 2 + 1
+
+        self._windowed = np.zeros((max_frames, frame_size), dtype=np.float32)
+        self._spectra = np.zeros((max_frames, self.spectrum_size), dtype=np.complex64)
+        self.magnitudes = np.zeros((max_frames, self.spectrum_size), dtype=np.float32)
+
+    def span(self, num_frames):
+        """Samples needed for num_frames consecutive hop-spaced frames."""
+        return self.frame_size + (num_frames - 1) * self.hop
+
+    def analyse(self, samples):
+        """Magnitude spectra of every frame in `samples`. Returns a (frames, bins) view."""
+        frames = sliding_window_view(samples, self.frame_size)[::self.hop]
+        n = len(frames)
+        if n > self.max_frames:
+            raise ValueError("span holds more frames than the plan was built for")
+        windowed = self._windowed[:n]
+        np.multiply(frames, self.window, out=windowed)
+        if _RFFT_HAS_OUT:
+            np.fft.rfft(windowed, axis=1, out=self._spectra[:n])
+            np.abs(self._spectra[:n], out=self.magnitudes[:n])
+        else:
+            np.abs(np.fft.rfft(windowed, axis=1), out=self.magnitudes[:n])
+        return self.magnitudes[:n]
+
+
+WAVEFORM_MODES = ("sample", "minmax", "rms")
+
+
+class EnvelopePlan:
+    """Peak-preserving waveform reducer for one (block size, points, mode) shape.
+
+    The block is split into near-equal segments and every segment is reduced
+    in one vectorized np.*.reduceat call over precomputed edges, so any point
+    count works and nothing is allocated per frame. Modes:
+      * "minmax" — points/2 segments, written as interleaved (min, max) pairs,
+        so the output stays `points` long and a polyline through it traces
+        the envelope without missing transients;
+      * "rms"    — per-segment RMS (0..1), one value per point;
+      * "sample" — evenly spaced samples, as DspPlan.downsample picks them.
+
+    Like DspPlan, a plan's output buffer is its own: one per consumer.
+    """
+
+    def __init__(self, block_size, points, mode="minmax"):
+        if mode not in WAVEFORM_MODES:
+            raise ValueError(f"unknown waveform mode: {mode!r}")
+        if mode == "minmax":
+            points -= points % 2
+        points = max(2, min(points, block_size))
+        self.block_size = block_size
+        self.points = points
+        self.mode = mode
+        self.out = np.zeros(points, dtype=np.float32)
+
+        segments = points // 2 if mode == "minmax" else points
+        self.segments = segments
+        self._edges = np.linspace(0, block_size, segments + 1).astype(np.intp)[:-1]
+        if mode == "rms":
+            self._widths = np.diff(np.append(self._edges, block_size)).astype(np.float32)
+            self._squares = np.zeros(block_size, dtype=np.float32)
+        elif mode == "sample":
+            self._edges = np.linspace(0, block_size - 1, points).astype(np.intp)
+
+    def reduce(self, mono):
+        """Reduce one block to `points` values. Returns self.out."""
+        if self.mode == "sample":
+            return np.take(mono, self._edges, out=self.out)
+        if self.mode == "minmax":
+            np.minimum.reduceat(mono, self._edges, out=self.out[0::2])
+            np.maximum.reduceat(mono, self._edges, out=self.out[1::2])
+            return self.out
+        np.square(mono, out=self._squares)
+        np.add.reduceat(self._squares, self._edges, out=self.out)
+        np.divide(self.out, self._widths, out=self.out)
+        np.sqrt(self.out, out=self.out)
+        return self.out
+
+
+class Decimator:
+    """Streaming anti-aliased decimation by an integer factor.
+
+    A windowed-sinc FIR low-pass (cutoff at 90% of the output Nyquist) is
+    evaluated only at the kept output positions: one matmul of a strided
+    sliding_window_view against the taps per block. The last taps-1 input
+    samples carry over between blocks, so a stream fed in any block sizes
+    decimates exactly as if it were one array.
+
+    `cutoff` (cycles per input sample) moves the low-pass, e.g. below the
+    Nyquist of a rate the output is resampled to afterwards; with it even
+    factor 1 filters. The filter is taps_per_phase taps per 0.45/cutoff.
+    """
+
+    def __init__(self, factor, taps_per_phase=16, cutoff=None):
+        if factor < 1:
+            raise ValueError("decimation factor must be at least 1")
+        self.factor = factor
+        self.filtered = factor > 1 or cutoff is not None
+        if cutoff is None:
+            cutoff = 0.45 / factor  # cycles per input sample
+        num_taps = 2 * (round(taps_per_phase * 0.45 / cutoff) // 2) - 1
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(num_taps)
+        self.taps = (taps / taps.sum()).astype(np.float32)
+        self._history = num_taps - 1
+        self._work = np.zeros(self._history, dtype=np.float32)
+        self._out = np.zeros(0, dtype=np.float32)
+        self._phase = 0  # offset of the next kept sample within the next block
+
+    def reset(self):
+        self._work[:self._history] = 0
+        self._phase = 0
+
+    def process(self, block):
+        """Decimate the next block of the stream. Returns a view of a reused buffer."""
+        n, history = len(block), self._history
+        if len(self._work) < history + n:
+            work = np.zeros(history + n, dtype=np.float32)
+            work[:history] = self._work[:history]
+            self._work = work
+            self._out = np.zeros(n // self.factor + 1, dtype=np.float32)
+        if not self.filtered:
+            out = self._out[:n]
+            np.copyto(out, block)
+            return out
+        x = self._work[:history + n]
+        x[history:] = block
+        windows = sliding_window_view(x, len(self.taps))[self._phase::self.factor]
+        out = self._out[:len(windows)]
+        np.matmul(windows, self.taps, out=out)
+        self._phase = (self._phase - n) % self.factor
+        x[:history] = x[n:]
+        return out
+
+
+BAND_SCALES = ("mel", "bark")
+
+
+def hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+
+def mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+
+def hz_to_bark(hz):
+    return 6.0 * np.arcsinh(np.asarray(hz) / 600.0)
+
+
+def bark_to_hz(bark):
+    return 600.0 * np.sinh(np.asarray(bark) / 6.0)
+
+
+class FilterBank:
+    """Triangular mel or Bark filterbank for one (sample rate, block size, bands) shape.
+
+    Filters only cover a contiguous run of FFT bins, so the weight matrix is
+    stored trimmed to the columns any filter touches and applied with one
+    matmul into a preallocated output. (scipy.sparse would avoid the zeros
+    inside that run too, but isn't a dependency; the dense trimmed product
+    is a single BLAS call either way.) Use get_filterbank() to share them.
+    """
+
+    def __init__(self, sample_rate, block_size, bands, scale="mel", fmin=20.0, fmax=None):
+        if scale not in BAND_SCALES:
+            raise ValueError(f"unknown band scale: {scale!r}")
+        to_scale, from_scale = (hz_to_mel, mel_to_hz) if scale == "mel" else (hz_to_bark, bark_to_hz)
+        fmax = fmax or sample_rate / 2
+        spectrum_size = block_size // 2 + 1
+        freqs = np.arange(spectrum_size) * sample_rate / block_size
+        edges = from_scale(np.linspace(to_scale(fmin), to_scale(fmax), bands + 2))
+
+        lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+        rising = (freqs[None, :] - lower) / (center - lower)
+        falling = (upper - freqs[None, :]) / (upper - center)
+        weights = np.maximum(0.0, np.minimum(rising, falling))
+        # Low filters can be narrower than one FFT bin; give them their nearest bin
+        empty = weights.sum(axis=1) == 0
+        nearest = np.clip(np.rint(center[empty, 0] * block_size / sample_rate).astype(np.intp),
+                          0, spectrum_size - 1)
+        weights[np.flatnonzero(empty), nearest] = 1.0
+        weights /= weights.sum(axis=1, keepdims=True)  # each band is a weighted mean
+
+        used = np.flatnonzero(weights.any(axis=0))
+        self.lo, self.hi = int(used[0]), int(used[-1]) + 1
+        self.scale = scale
+        self.bands = bands
+        self.matrix = np.ascontiguousarray(weights[:, self.lo:self.hi], dtype=np.float32)
+        self.matrix.flags.writeable = False
+        self.out = np.zeros(bands, dtype=np.float32)
+
+    def apply(self, magnitudes):
+        """Band energies of one magnitude spectrum. Returns self.out."""
+        np.matmul(self.matrix, magnitudes[self.lo:self.hi], out=self.out)
+        return self.out
+
+
+@lru_cache(maxsize=16)
+def get_filterbank(sample_rate, block_size, bands, scale="mel"):
+    """Return the shared FilterBank for this shape, building it on first use."""
+    return FilterBank(sample_rate, block_size, bands, scale)
+
+
+class BandAgc:
+    """Per-band automatic gain control with separate attack and release.
+
+    Each band follows its own envelope (fast attack, slow release) and is
+    divided by it, so quiet treble bands aren't flattened by a loud bass
+    line. A floor relative to the loudest band keeps silent bands from
+    being amplified into noise. All state lives in preallocated arrays.
+    """
+
+    def __init__(self, bands, attack=0.01, release=2.0, floor=0.01):
+        self.attack = attack
+        self.release = release
+        self.floor = floor
+        self._envelope = np.zeros(bands, dtype=np.float32)
+        self._delta = np.zeros(bands, dtype=np.float32)
+        self._coeff = np.zeros(bands, dtype=np.float32)
+        self._rising = np.zeros(bands, dtype=bool)
+        self.out = np.zeros(bands, dtype=np.float32)
+        self._last_time = None
+
+    def process(self, energies, timestamp):
+        """Gain-normalized bands in [0, 1]. Returns self.out."""
+        dt = 1.0 / 20 if self._last_time is None else min(max(timestamp - self._last_time, 1e-3), 1.0)
+        self._last_time = timestamp
+        attack = 1.0 - np.exp(-dt / self.attack)
+        release = 1.0 - np.exp(-dt / self.release)
+
+        env = self._envelope
+        np.subtract(energies, env, out=self._delta)
+        np.greater(self._delta, 0, out=self._rising)
+        self._coeff.fill(release)
+        np.copyto(self._coeff, attack, where=self._rising)
+        np.multiply(self._delta, self._coeff, out=self._delta)
+        np.add(env, self._delta, out=env)
+
+        floor = max(float(env.max()) * self.floor, 1e-6)
+        np.maximum(env, floor, out=self._delta)
+        np.divide(energies, self._delta, out=self.out)
+        np.clip(self.out, 0, 1, out=self.out)
+        return self.out
+
+
+class FrameAnalyzer:
+    """Per-frame analysis shared by every subscriber, computed on demand.
+
+    begin() only records the block. The rFFT runs the first time any bin
+    resolution is asked for, and each resolution, the waveform and the peak
+    are computed at most once per frame — so clients asking for 64 and 512
+    bins cost one FFT plus two cheap reduceat passes, and a frame nobody
+    encodes costs nothing. Normalization keeps a separate running max per
+    bin count. The counters show how much work demand saved.
+
+    With an StftPlan the spectrum comes from feed() instead: every hop frame
+    is analysed as audio arrives, and a broadcast frame's spectrum is the
+    per-bin max over the hop frames since the previous begin(), so short
+    transients survive a broadcast rate lower than the analysis rate.
+    """
+
+    def __init__(self, block_size, waveform_points, default_bins, stft=None, sample_rate=44100):
+        if stft is not None and stft.frame_size != block_size:
+            raise ValueError("STFT frame size must match the block size")
+        self.block_size = block_size
+        self.waveform_points = waveform_points
+        self.sample_rate = sample_rate
+        self.stft = stft
+        self._plan = DspPlan(block_size, default_bins, waveform_points)
+        self._plans = {default_bins: self._plan}  # bins -> this analyzer's own DspPlan
+        self._envelopes = {}    # (points, mode) -> this analyzer's own EnvelopePlan
+        self._running_max = {}  # bins -> decaying max of the binned spectrum
+        self._bins = {}         # (scale, bins) -> normalized output for the current frame
+        self._agc = {}          # (scale, bands) -> BandAgc
+        self._waveforms = {}    # (points, mode) -> output for the current frame
+        self._peak = None
+        self._have_spectrum = False
+        self.mono = None
+        self.seq = 0
+        self.timestamp = 0.0
+
+        if stft is not None:
+            self._magnitudes = np.zeros(stft.spectrum_size, dtype=np.float32)
+            self._pooled = np.zeros(stft.spectrum_size, dtype=np.float32)
+            self._hop_max = np.zeros(stft.spectrum_size, dtype=np.float32)
+            self._next_end = None  # absolute sample index the next hop frame ends at
+        else:
+            self._magnitudes = self._plan.magnitudes
+            self._fed_end = None   # block whose spectrum feed() already computed
+
+        self.frames = 0
+        self.spectra = 0
+        self.binnings = 0
+        self.waveforms = 0
+        self.stft_frames = 0
+        self.stft_frames_skipped = 0
+
+    @property
+    def lookback(self):
+        """Samples of history beyond one block that feed() needs from the ring."""
+        if self.stft is None:
+            return 0
+        return self.stft.span(self.stft.max_frames) + self.stft.hop - self.block_size
+
+    def feed(self, end, recent):
+        """Analyse audio up to sample `end` for per-frame consumers (beat tracking).
+
+        recent(n) must return the n samples ending at absolute index `end`.
+        Returns the (frames, bins) magnitudes of the new analysis frames: every
+        hop frame in STFT mode, or the single block ending at `end` otherwise
+        (which begin() then reuses instead of running the FFT again).
+        """
+        stft = self.stft
+        if stft is None:
+            self._plan.spectrum(recent(self.block_size))
+            self._fed_end = end
+            self.spectra += 1
+            return self._magnitudes[None]
+        if self._next_end is None:
+            self._next_end = max(end, stft.frame_size)
+        total = (end - self._next_end) // stft.hop + 1
+        if total <= 0:
+            return stft.magnitudes[:0]
+        last_end = self._next_end + (total - 1) * stft.hop
+        n = min(total, stft.max_frames)
+        self.stft_frames_skipped += total - n
+        span = stft.span(n)
+        mags = stft.analyse(recent(end - last_end + span)[:span])
+        np.max(mags, axis=0, out=self._hop_max)
+        np.maximum(self._pooled, self._hop_max, out=self._pooled)
+        self._next_end = last_end + stft.hop
+        self.stft_frames += n
+        return mags
+
+    def begin(self, mono, seq, timestamp, end=None, magnitudes=None):
+        """Start a new frame. Nothing is computed until an output is requested.
+
+        `end` is the block's absolute end sample, used to reuse a spectrum
+        feed() already computed for it. `magnitudes` is a spectrum computed
+        elsewhere (the DSP child process); it is copied in and used as is.
+        """
+        self.mono = mono
+        self.seq = seq
+        self.timestamp = timestamp
+        self._peak = None
+        self._bins.clear()
+        self._waveforms.clear()
+        self.frames += 1
+        if magnitudes is not None:
+            np.copyto(self._magnitudes, magnitudes)
+            self._have_spectrum = True
+        elif self.stft is not None:
+            np.copyto(self._magnitudes, self._pooled)
+            self._pooled.fill(0)
+            self._have_spectrum = True
+        else:
+            self._have_spectrum = end is not None and end == self._fed_end
+
+    @property
+    def peak(self):
+        if self._peak is None:
+            self._peak = self._plan.peak(self.mono)
+        return self._peak
+
+    def spectrum(self):
+        """Magnitude spectrum of the current frame (pooled over hops in STFT mode)."""
+        return self._spectrum()
+
+    def _spectrum(self):
+        if not self._have_spectrum:
+            self._plan.spectrum(self.mono)
+            self._have_spectrum = True
+            self.spectra += 1
+        return self._magnitudes
+
+    def bands(self, num_bands, scale="log"):
+        """Spectrum bands for one subscription: log bins, or mel/Bark bands with AGC."""
+        if scale == "log":
+            return self.bins(num_bands)
+        key = (scale, num_bands)
+        out = self._bins.get(key)
+        if out is not None:
+            return out
+        bank = get_filterbank(self.sample_rate, self.block_size, num_bands, scale)
+        agc = self._agc.get(key)
+        if agc is None:
+            agc = self._agc[key] = BandAgc(num_bands)
+        out = agc.process(bank.apply(self._spectrum()), self.timestamp)
+        self.binnings += 1
+        self._bins[key] = out
+        return out
+
+    def bins(self, num_bins):
+        """Normalized log-binned spectrum at this resolution (plan-owned buffer)."""
+        out = self._bins.get(("log", num_bins))
+        if out is not None:
+            return out
+        self._spectrum()
+        plan = self._plans.get(num_bins)
+        if plan is None:
+            plan = self._plans[num_bins] = DspPlan(self.block_size, num_bins, self.waveform_points)
+        binned = plan.log_bin(self._magnitudes)
+        self.binnings += 1
+
+        current_max = float(binned.max())
+        running_max = self._running_max.get(num_bins, 1.0)
+        if current_max > running_max:
+            running_max = current_max
+        else:
+            running_max = running_max * 0.995 + current_max * 0.005
+        self._running_max[num_bins] = running_max
+
+        out = plan.normalize(binned, running_max)
+        self._bins[("log", num_bins)] = out
+        return out
+
+    def waveform(self, points=None, mode="sample"):
+        """Waveform of the current block at this point count and mode (see EnvelopePlan)."""
+        key = (points or self.waveform_points, mode)
+        out = self._waveforms.get(key)
+        if out is None:
+            if key == (self.waveform_points, "sample"):
+                out = self._plan.downsample(self.mono)
+            else:
+                envelope = self._envelopes.get(key)
+                if envelope is None:
+                    envelope = self._envelopes[key] = EnvelopePlan(self.block_size, *key)
+                out = envelope.reduce(self.mono)
+            self._waveforms[key] = out
+            self.waveforms += 1
+        return out
+
+    def stats(self):
+        stats = {
+            "mode": "stft" if self.stft is not None else "block",
+            "frames": self.frames,
+            "binnings": self.binnings,
+            "waveformsComputed": self.waveforms,
+            "waveformsSkipped": self.frames - self.waveforms,
+        }
+        if self.stft is None:
+            stats["fftsComputed"] = self.spectra
+        else:
+            stats.update({
+                "hop": self.stft.hop,
+                "window": self.stft.window_name,
+                "stftFrames": self.stft_frames,
+                "stftFramesSkipped": self.stft_frames_skipped,
+            })
+        return stats
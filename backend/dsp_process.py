@@ -0,0 +1,355 @@
+"""Capture + DSP in a child process, frames exchanged through shared memory.
+
+With --dsp-process the audio source, FFT (block or STFT) and beat tracking
+run in a spawned child with its own GIL, so SQLite commits, enrichment
+bookkeeping and WebSocket sends in the server process can't delay them,
+and their CPU time can't delay the event loop.
+
+The child writes each frame into one slot of a multiprocessing.shared_memory
+ring (a numpy structured array: timestamp, peak, beat state, magnitude
+spectrum, mono block) and sends its seq down a pipe. In the server, a reader
+thread blocks on the pipe and wakes the event loop with call_soon_threadsafe;
+DspProcess.next_frame() then copies the newest slot out. Slots are
+seqlocked — seq is written before the data and seq_end after — so a slot
+the child overwrote mid-copy is detected and skipped, never half-used.
+
+Binning, waveforms and encoding stay in the server: they depend on what
+each subscription group asked for and cost microseconds from the spectrum.
+
+Analysis is demand-driven here too: the server sends the pipeline's demand
+(anything to analyse for, anyone subscribed to beat) down a second pipe
+whenever it changes, and the child only runs the FFT and the beat tracker
+while they're wanted. Slots written without a spectrum say so, and the
+server computes one itself if such a frame is encoded after all.
+
+The child is supervised: if it exits or stops producing, it is restarted
+(with backoff) on the same shared memory.
+"""
+
+import asyncio
+import multiprocessing
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+SLOTS = 8
+STATS_INTERVAL = 1.0     # seconds between child -> server stats messages
+STALL_SECONDS = 3.0      # no frame for this long while alive => restart
+RESTART_DELAYS = (0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+def slot_dtype(block_size):
+    return np.dtype([
+        ("seq", "<u8"),
+        ("timestamp", "<f8"),
+        ("peak", "<f4"),
+        ("bpm", "<f4"),
+        ("confidence", "<f4"),
+        ("beats", "<u8"),  # beats detected so far; a change means "beat since last read"
+        ("analysed", "u1"),  # magnitudes hold this block's spectrum
+        ("magnitudes", "<f4", (block_size // 2 + 1,)),
+        ("mono", "<f4", (block_size,)),
+        ("seq_end", "<u8"),
+    ])
+
+
+class RemoteBeat:
+    """The child's beat tracker state, as seen from the server process."""
+
+    def __init__(self):
+        self.bpm = 0.0
+        self.confidence = 0.0
+        self._stats = {}
+
+    def stats(self):
+        return self._stats
+
+
+def _child_main(config, shm_name, conn, control):
+    """Child process entry point: read, analyse, publish until the pipe closes.
+
+    `control` brings ("demand", analyse, beat) messages from the server.
+    """
+    # The server terminates us; don't die on the terminal's Ctrl+C first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from audio_sources import create_source
+    from beat_tracker import BeatTracker
+    from capture import SampleRing
+    from dsp import FrameAnalyzer, StftPlan
+
+    sample_rate, block_size = config["sample_rate"], config["block_size"]
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray((config["slots"],), dtype=slot_dtype(block_size), buffer=shm.buf)
+
+    stft = None
+    frame_rate = sample_rate / block_size
+    if config["analysis"] == "stft":
+        stft = StftPlan(block_size, config["hop"], config["window"],
+                        max_frames=2 * max(1, block_size // config["hop"]))
+        frame_rate = sample_rate / config["hop"]
+    analyzer = FrameAnalyzer(block_size, 128, 128, stft=stft, sample_rate=sample_rate)
+    tracker = BeatTracker(frame_rate, block_size // 2 + 1,
+                          max_frames=stft.max_frames if stft else 16)
+    ring = SampleRing(16 * block_size, block_size + analyzer.lookback)
+    mono = np.zeros(block_size, dtype=np.float32)
+
+    def recent(length):
+        return ring.view(ring.written - length, length)
+
+    source = create_source(config["source"], sample_rate, block_size)
+    analyse = want_beat = True  # until the server says otherwise
+    seq = 0
+    read_errors = 0
+    max_work = 0.0
+    next_stats = time.monotonic() + STATS_INTERVAL
+    try:
+        with source:
+            print(f"[dsp] Capturing audio from: {source.name}")
+            while True:
+                try:
+                    data = source.read()
+                except Exception as e:
+                    read_errors += 1
+                    print(f"[dsp] Audio capture error: {e}")
+                    time.sleep(block_size / sample_rate)
+                    continue
+                captured_at = time.time()
+                start = time.perf_counter()
+                while control.poll():
+                    _, analyse, want_beat = control.recv()
+                block = data if data.ndim == 1 else np.mean(data, axis=1, out=mono[:len(data)])
+                ring.write(block)
+                if analyse or want_beat:
+                    spectra = analyzer.feed(ring.written, recent)
+                    if want_beat:
+                        tracker.process(spectra)
+                seq += 1
+                analyzer.begin(ring.view(ring.written - block_size, block_size), seq,
+                               captured_at, ring.written)
+
+                slot = slots[seq % len(slots)]
+                slot["seq"] = seq
+                slot["timestamp"] = captured_at
+                slot["peak"] = analyzer.peak
+                slot["bpm"] = tracker.bpm
+                slot["confidence"] = tracker.confidence
+                slot["beats"] = tracker.beats
+                slot["analysed"] = analyse
+                if analyse:
+                    slot["magnitudes"] = analyzer.spectrum()
+                slot["mono"] = analyzer.mono
+                slot["seq_end"] = seq
+                max_work = max(max_work, time.perf_counter() - start)
+                conn.send(("frame", seq))
+
+                now = time.monotonic()
+                if now >= next_stats:
+                    next_stats = now + STATS_INTERVAL
+                    conn.send(("stats", {
+                        "source": source.name,
+                        "frames": seq,
+                        "readErrors": read_errors,
+                        "maxWorkMs": round(max_work * 1000, 2),
+                        "analysis": analyzer.stats(),
+                        "beat": tracker.stats(),
+                    }))
+    except (BrokenPipeError, EOFError, OSError):
+        pass  # server went away
+    finally:
+        del slots
+        shm.close()
+
+
+class DspProcess:
+    """Owns the shared memory ring and supervises the DSP child process."""
+
+    def __init__(self, source_spec, sample_rate, block_size, analysis="block", hop=512,
+                 window="hann", slots=SLOTS):
+        self.config = {
+            "source": source_spec,
+            "sample_rate": sample_rate,
+            "block_size": block_size,
+            "analysis": analysis,
+            "hop": hop,
+            "window": window,
+            "slots": slots,
+        }
+        self.block_size = block_size
+        dtype = slot_dtype(block_size)
+        self._shm = shared_memory.SharedMemory(create=True, size=dtype.itemsize * slots)
+        self._slots = np.ndarray((slots,), dtype=dtype, buffer=self._shm.buf)
+        self._slots["seq"] = 0
+        self._slots["seq_end"] = 0
+        self._ctx = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self._control = None  # server -> child demand messages
+        self._demand = (True, True)  # (analyse, beat), resent to every new child
+        self._loop = None
+        self._ready = asyncio.Event()
+        self._latest = 0     # newest seq announced by the child
+        self._read_seq = 0   # seq of the frame next_frame() last returned
+        self._beats = 0      # child's beat count as of that frame
+        self._last_frame_at = 0.0
+
+        # Latest frame, copied out of shared memory by next_frame()
+        self.mono = np.zeros(block_size, dtype=np.float32)
+        self.magnitudes = np.zeros(block_size // 2 + 1, dtype=np.float32)
+        self.timestamp = 0.0
+        self.peak = 0.0
+        self.beat = False
+        self.analysed = False  # self.magnitudes is the latest frame's spectrum
+        self.remote_beat = RemoteBeat()
+
+        self.frames = 0
+        self.skipped = 0     # frames the child published that were never read
+        self.torn = 0        # slots overwritten while being copied
+        self.restarts = 0
+        self.child_stats = {}
+
+    def start(self, loop):
+        self._loop = loop
+        self._spawn()
+
+    def _spawn(self):
+        receive, send = self._ctx.Pipe(duplex=False)
+        control_receive, control_send = self._ctx.Pipe(duplex=False)
+        self._process = self._ctx.Process(
+            target=_child_main, args=(self.config, self._shm.name, send, control_receive),
+            name="jam-dsp", daemon=True,
+        )
+        self._process.start()
+        send.close()  # the child holds the only write end: EOF when it dies
+        control_receive.close()
+        self._conn = receive
+        self._control = control_send
+        self._send_demand()
+        self._latest = self._read_seq = self._beats = 0
+        self._last_frame_at = time.monotonic()
+        threading.Thread(target=self._read_pipe, args=(receive,), name="dsp-pipe",
+                         daemon=True).start()
+
+    def _read_pipe(self, conn):
+        """Forward child messages to the event loop until the pipe closes."""
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = ("exit", None)
+            try:
+                self._loop.call_soon_threadsafe(self._on_message, conn, message)
+            except RuntimeError:
+                return  # event loop closed
+            if message[0] == "exit":
+                return
+
+    def set_demand(self, analyse, beat):
+        """Tell the child whether to run the FFT / beat tracker; sent only on change."""
+        if (analyse, beat) != self._demand:
+            self._demand = (analyse, beat)
+            self._send_demand()
+
+    def _send_demand(self):
+        if self._control is None:
+            return
+        try:
+            self._control.send(("demand", *self._demand))
+        except OSError:
+            pass  # child gone; the restart sends the demand again
+
+    def _on_message(self, conn, message):
+        if conn is not self._conn:
+            return  # from a child that has since been replaced
+        kind, payload = message
+        if kind == "frame":
+            self._latest = payload
+        elif kind == "stats":
+            self.child_stats = payload
+            self.remote_beat._stats = payload["beat"]
+        self._ready.set()
+
+    async def _restart(self, reason):
+        delay = RESTART_DELAYS[min(self.restarts, len(RESTART_DELAYS) - 1)]
+        self.restarts += 1
+        print(f"DSP process {reason} — restarting in {delay:g}s (restart #{self.restarts})")
+        self._terminate()
+        await asyncio.sleep(delay)
+        self._spawn()
+
+    def _terminate(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._control is not None:
+            self._control.close()
+            self._control = None
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process.join(timeout=2)
+            self._process = None
+
+    async def next_frame(self):
+        """Wait for a new frame from the child and copy the newest one out."""
+        while True:
+            if self._latest > self._read_seq:
+                if self._copy(self._latest):
+                    return
+                continue
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            if self._process is None or not self._process.is_alive():
+                code = self._process.exitcode if self._process is not None else None
+                await self._restart(f"exited (code {code})")
+            elif time.monotonic() - self._last_frame_at > STALL_SECONDS:
+                await self._restart(f"stalled for {STALL_SECONDS:g}s")
+
+    def _copy(self, seq):
+        slot = self._slots[seq % len(self._slots)]
+        if slot["seq"] != seq:
+            self.torn += 1
+            self._read_seq = seq
+            return False
+        np.copyto(self.mono, slot["mono"])
+        analysed = bool(slot["analysed"])
+        if analysed:
+            np.copyto(self.magnitudes, slot["magnitudes"])
+        timestamp, peak = float(slot["timestamp"]), float(slot["peak"])
+        bpm, confidence, beats = float(slot["bpm"]), float(slot["confidence"]), int(slot["beats"])
+        if slot["seq"] != seq or slot["seq_end"] != seq:
+            self.torn += 1  # the child lapped us mid-copy
+            self._read_seq = seq
+            return False
+        self.skipped += seq - self._read_seq - 1
+        self._read_seq = seq
+        self._last_frame_at = time.monotonic()
+        self.timestamp, self.peak = timestamp, peak
+        self.analysed = analysed
+        self.beat = beats != self._beats
+        self._beats = beats
+        self.remote_beat.bpm, self.remote_beat.confidence = bpm, confidence
+        self.frames += 1
+        return True
+
+    def stop(self):
+        self._terminate()
+        self._slots = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def stats(self):
+        return {
+            "pid": self._process.pid if self._process is not None else None,
+            "alive": self._process is not None and self._process.is_alive(),
+            "framesRead": self.frames,
+            "framesSkipped": self.skipped,
+            "tornReads": self.torn,
+            "restarts": self.restarts,
+            "child": self.child_stats,
+        }
@@ -0,0 +1,209 @@
+"""Local index of identified fingerprints, checked before calling AcoustID.
+
+Every fingerprint AcoustID identifies is stored in SQLite as raw Chromaprint
+sub-fingerprints (one uint32 per ~0.12 s of audio) next to its track. To
+find it again without an exact match, the index hashes short sub-sequences
+bit-slice by bit-slice: a key is one 8-bit slice (band) of KEY_ITEMS
+sub-fingerprints KEY_SPACING items apart. (Neighbouring sub-fingerprints
+share most of their bits; keys made of adjacent ones pile up in a few
+buckets.) Stored fingerprints are keyed every INDEX_STRIDE items, queries at
+every item, so any alignment between the two is found. Keys are short
+enough that a re-capture with a tenth of its bits flipped still shares
+several of them with the original.
+
+The buckets live in memory, rebuilt from the stored fingerprints at
+startup: entries sorted by key plus a table of where each key's run starts
+(there are only NUM_KEYS keys), so a lookup is two array reads.
+match() votes for (fingerprint, offset) pairs over all bucket hits and
+verifies the best few candidates by their bit error rate over the aligned
+overlap. A candidate is only accepted at or below max_ber — unrelated audio
+sits near 0.5, a repeat of the same recording well under 0.25.
+"""
+
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+KEY_ITEMS = 2        # sub-fingerprints per key
+KEY_SPACING = 4      # items between them (~0.5 s)
+KEY_SPAN = (KEY_ITEMS - 1) * KEY_SPACING + 1  # items one key covers
+BANDS = 4            # 8-bit slices of each sub-fingerprint, one key per band
+NUM_KEYS = BANDS << (8 * KEY_ITEMS)
+INDEX_STRIDE = 4     # stored fingerprints are keyed every INDEX_STRIDE items
+MIN_VOTES = 2        # bucket hits a candidate alignment needs before it's verified
+MAX_CANDIDATES = 5   # alignments verified per query
+MIN_OVERLAP = 32     # sub-fingerprints (~4 s) a verified match must overlap
+MIN_DISTINCT = 0.5   # queries with fewer distinct items (silence, drones) aren't matched
+DEFAULT_MAX_BER = 0.25
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _keys_at(items, starts):
+    """keys[b, i]: band b of items starts[i], starts[i] + KEY_SPACING, ...
+    packed into 8 * KEY_ITEMS bits, with the band number above them."""
+    keys = np.empty((BANDS, len(starts)), dtype=np.uint32)
+    for band in range(BANDS):
+        key = np.full(len(starts), band << (8 * KEY_ITEMS), dtype=np.uint32)
+        for item in range(KEY_ITEMS):
+            slices = (items[starts + item * KEY_SPACING] >> np.uint32(8 * band)) & np.uint32(0xFF)
+            key |= slices << np.uint32(8 * (KEY_ITEMS - 1 - item))
+        keys[band] = key
+    return keys
+
+
+def lsh_keys(fingerprint, stride=1):
+    """(keys, positions) of a uint32 sub-fingerprint array, keyed every `stride` items."""
+    fingerprint = np.asarray(fingerprint, dtype=np.uint32)
+    positions = np.arange(0, max(len(fingerprint) - KEY_SPAN + 1, 0), stride)
+    return _keys_at(fingerprint, positions), positions
+
+
+def bit_error_rate(a, b):
+    """Fraction of differing bits between two equal-length uint32 arrays."""
+    diff = np.bitwise_xor(a, b)
+    return int(_POPCOUNT[diff.view(np.uint8)].sum(dtype=np.int64)) / (32 * len(diff))
+
+
+class FingerprintIndex:
+    """Raw fingerprints in SQLite (see db.init_db), their LSH buckets in memory."""
+
+    def __init__(self, conn, max_ber=DEFAULT_MAX_BER):
+        self._conn = conn
+        self.max_ber = max_ber
+        self.count = 0
+        self.load_seconds = 0.0
+        self.queries = 0
+        self.hits = 0
+        self.last_match_ms = None
+        self.last_ber = None
+        self.load()
+
+    # ---------- Buckets ----------
+
+    def load(self):
+        """(Re)build the in-memory buckets from every stored fingerprint."""
+        started = time.perf_counter()
+        rows = self._conn.execute("SELECT id, fingerprint FROM fingerprints").fetchall()
+        self.count = len(rows)
+        # All fingerprints back to back; key positions of each, in both indexings
+        items = np.frombuffer(b"".join(row[1] for row in rows), dtype="<u4")
+        lengths = np.array([len(row[1]) // 4 for row in rows], dtype=np.int64)
+        firsts = np.cumsum(lengths) - lengths
+        counts = -(-np.maximum(lengths - KEY_SPAN + 1, 0) // INDEX_STRIDE)
+        total = int(counts.sum())
+        local = INDEX_STRIDE * (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+        keys = _keys_at(items, np.repeat(firsts, counts) + local).ravel()
+        order = np.argsort(keys, kind="stable")
+        ids = np.repeat(np.array([row[0] for row in rows], dtype=np.uint32), counts)
+        self._starts = np.zeros(NUM_KEYS + 1, dtype=np.int64)  # key k: entries starts[k]:starts[k+1]
+        np.cumsum(np.bincount(keys, minlength=NUM_KEYS), out=self._starts[1:])
+        self._ids = np.tile(ids, BANDS)[order]
+        self._positions = np.tile(local.astype(np.uint16), BANDS)[order]
+        self.load_seconds = time.perf_counter() - started
+
+    def _insert_keys(self, fingerprint_id, fingerprint):
+        keys, positions = lsh_keys(fingerprint, INDEX_STRIDE)
+        keys = keys.ravel()
+        at = self._starts[keys + 1]  # end of each key's run
+        self._ids = np.insert(self._ids, at, np.uint32(fingerprint_id))
+        self._positions = np.insert(self._positions, at,
+                                    np.tile(positions, BANDS).astype(np.uint16))
+        self._starts[1:] += np.cumsum(np.bincount(keys, minlength=NUM_KEYS))
+
+    # ---------- Storage ----------
+
+    def _store(self, fingerprint, duration, artist, title, album, recording_id):
+        cur = self._conn.execute(
+            "INSERT INTO fingerprints (recording_id, artist, title, album, duration, fingerprint, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (recording_id or "", artist or "", title or "", album or "", float(duration),
+             np.asarray(fingerprint, dtype="<u4").tobytes(),
+             datetime.now(timezone.utc).isoformat()),
+        )
+        return cur.lastrowid
+
+    def add(self, fingerprint, duration, artist, title, album="", recording_id=""):
+        """Store one identified fingerprint and index it. Returns its row id."""
+        fingerprint = np.asarray(fingerprint, dtype=np.uint32)
+        fingerprint_id = self._store(fingerprint, duration, artist, title, album, recording_id)
+        self._conn.commit()
+        self._insert_keys(fingerprint_id, fingerprint)
+        self.count += 1
+        return fingerprint_id
+
+    def add_many(self, entries):
+        """Bulk add(): entries of (fingerprint, duration, artist, title, album,
+        recording_id), committed once and indexed with a single rebuild."""
+        for entry in entries:
+            self._store(*entry)
+        self._conn.commit()
+        self.load()
+
+    # ---------- Matching ----------
+
+    def _candidates(self, fingerprint):
+        """[((fingerprint id, offset), votes)] for the best-supported alignments."""
+        keys, positions = lsh_keys(fingerprint)
+        keys, query_pos = keys.ravel(), np.tile(positions, BANDS)
+        lo = self._starts[keys]
+        hits = self._starts[keys + 1] - lo
+        total = int(hits.sum())
+        if not total:
+            return []
+        # Entry indices of every hit: each key's run lo..lo+hits-1, back to back
+        runs = np.repeat(lo - np.cumsum(hits) + hits, hits) + np.arange(total)
+        offsets = self._positions[runs].astype(np.int64) - np.repeat(query_pos, hits)
+        alignments = (self._ids[runs].astype(np.int64) << 20) | (offsets + (1 << 19))
+        alignments, votes = np.unique(alignments, return_counts=True)
+        best = np.argsort(votes)[::-1][:MAX_CANDIDATES]
+        return [((int(alignments[i] >> 20), int(alignments[i] & 0xFFFFF) - (1 << 19)), int(votes[i]))
+                for i in best if votes[i] >= MIN_VOTES]
+
+    def match(self, fingerprint):
+        """Best stored track for a query fingerprint, or None.
+
+        Returns a dict with artist, title, album, recordingId, ber, offset
+        (query item 0 = stored item offset), votes and fingerprintId.
+        """
+        started = time.perf_counter()
+        fingerprint = np.asarray(fingerprint, dtype=np.uint32)
+        self.queries += 1
+        best = None
+        if (len(fingerprint) >= MIN_OVERLAP
+                and len(np.unique(fingerprint)) >= MIN_DISTINCT * len(fingerprint)):
+            for (fingerprint_id, offset), votes in self._candidates(fingerprint):
+                row = self._conn.execute(
+                    "SELECT artist, title, album, recording_id, fingerprint FROM fingerprints WHERE id = ?",
+                    (fingerprint_id,),
+                ).fetchone()
+                if row is None:
+                    continue
+                stored = np.frombuffer(row[4], dtype="<u4")
+                start, end = max(0, -offset), min(len(fingerprint), len(stored) - offset)
+                if end - start < MIN_OVERLAP:
+                    continue
+                ber = bit_error_rate(fingerprint[start:end], stored[start + offset:end + offset])
+                if ber <= self.max_ber and (best is None or ber < best["ber"]):
+                    best = {"artist": row[0], "title": row[1], "album": row[2],
+                            "recordingId": row[3], "ber": ber, "offset": offset,
+                            "votes": votes, "fingerprintId": fingerprint_id}
+        self.last_match_ms = round((time.perf_counter() - started) * 1000, 2)
+        if best is not None:
+            best["ber"] = self.last_ber = round(best["ber"], 4)
+            self.hits += 1
+        return best
+
+    def stats(self):
+        return {
+            "fingerprints": self.count,
+            "entries": len(self._ids),
+            "indexBytes": self._starts.nbytes + self._ids.nbytes + self._positions.nbytes,
+            "loadSeconds": round(self.load_seconds, 3),
+            "maxBer": self.max_ber,
+            "queries": self.queries,
+            "hits": self.hits,
+            "lastMatchMs": self.last_match_ms,
+            "lastBer": self.last_ber,
+        }
@@ -0,0 +1,267 @@
+"""When to fingerprint: lookups driven by what the audio is doing.
+
+Instead of a lookup every 12 s whatever is playing, the scheduler watches
+two cheap signals computed from every captured block (see NoveltyTracker):
+
+    silence   block RMS under SILENCE_DB. No lookups while it's silent, and
+              audio resuming after SILENCE_GAP seconds of it is a boundary.
+    novelty   mean per-band level difference (dB) between the last
+              NOVELTY_WINDOW seconds and the NOVELTY_WINDOW before them.
+              Crossing NOVELTY_DB is a boundary (a segue with no gap).
+
+On a boundary the fingerprint buffer is cleared and a lookup is due as soon
+as MIN_AUDIO seconds of the new audio are buffered. After that the
+interval starts at base_interval and doubles, up to max_interval, each time
+a lookup confirms the track already identified (or finds nothing again);
+a different answer starts it over. A lookup asked for while one for the
+same audio is in flight joins it instead of starting another, and a
+lookup over audio that hasn't changed since the last one reuses its answer.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from dsp import DspPlan
+
+SILENCE_DB = -55.0       # block RMS (dBFS) below which a block counts as silence
+SILENCE_GAP = 1.5        # seconds of silence that make the next audio a new song
+NOVELTY_WINDOW = 3.0     # seconds per side of the novelty comparison
+NOVELTY_DB = 6.0         # mean band level change that counts as a boundary
+NOVELTY_BANDS = 16
+MIN_AUDIO = 10.0         # seconds of non-silent audio a lookup needs
+BASE_INTERVAL = 12.0
+MAX_INTERVAL = 192.0
+TTID_HISTORY = 50        # time-to-identification samples kept for the median
+
+
+class NoveltyTracker:
+    """Per-block silence and spectral-novelty signals.
+
+    Each non-silent block is reduced to NOVELTY_BANDS log-spaced band levels
+    in dB; running sums over two adjacent windows of them give the novelty.
+    About 50 us per 2048-sample block: one FFT and a few 16-element ops.
+    """
+
+    def __init__(self, sample_rate, window_seconds=NOVELTY_WINDOW, bands=NOVELTY_BANDS):
+        self.sample_rate = sample_rate
+        self.window_seconds = window_seconds
+        self.bands = bands
+        self._plan = None  # DspPlan for the block size, built on the first block
+        self.silent = False
+        self.silent_seconds = 0.0  # length of the current run of silence
+        self.level_db = -120.0
+        self.novelty = 0.0
+        self.reset()
+
+    def reset(self):
+        """Forget the comparison windows (after a boundary)."""
+        self._filled = 0
+        self._pos = 0
+        self.novelty = 0.0
+        if self._plan is not None:
+            self._ring[:] = 0
+            self._recent[:] = 0
+            self._previous[:] = 0
+
+    def _setup(self, block_size):
+        self._plan = DspPlan(block_size, self.bands, 2)  # own plan: its buffers are ours alone
+        self._window = max(1, round(self.window_seconds * self.sample_rate / block_size))
+        self._ring = np.zeros((2 * self._window, self.bands), dtype=np.float64)
+        self._recent = np.zeros(self.bands, dtype=np.float64)    # sum of the newest window
+        self._previous = np.zeros(self.bands, dtype=np.float64)  # sum of the one before
+        self._levels = np.zeros(self.bands, dtype=np.float64)
+        self.reset()
+
+    def process(self, mono):
+        """Update from one block. Returns the novelty (dB) once both windows are full, else 0."""
+        if self._plan is None or self._plan.block_size != len(mono):
+            self._setup(len(mono))
+        seconds = len(mono) / self.sample_rate
+        rms = math.sqrt(float(np.dot(mono, mono)) / len(mono)) if len(mono) else 0.0
+        self.level_db = 20 * math.log10(rms) if rms > 1e-6 else -120.0
+        self.silent = self.level_db < SILENCE_DB
+        if self.silent:
+            self.silent_seconds += seconds
+            return 0.0
+        self.silent_seconds = 0.0
+
+        plan = self._plan
+        binned = plan.log_bin(plan.spectrum(mono))
+        np.maximum(binned, 1e-9, out=self._levels)
+        np.log10(self._levels, out=self._levels)
+        self._levels *= 20
+
+        # The oldest block of the newest window moves to the previous one; the
+        # block it displaces there falls out of both
+        window, ring = self._window, self._ring
+        moving = ring[(self._pos - window) % (2 * window)]
+        leaving = ring[self._pos]
+        self._previous += moving - leaving
+        self._recent += self._levels - moving
+        ring[self._pos] = self._levels
+        self._pos = (self._pos + 1) % (2 * window)
+        self._filled += 1
+        if self._filled < 2 * window:
+            self.novelty = 0.0
+        else:
+            self.novelty = float(np.abs(self._recent - self._previous).mean()) / window
+        return self.novelty
+
+
+class FingerprintScheduler:
+    """Feeds the fingerprinter and decides when its lookups run."""
+
+    def __init__(self, fingerprinter, sample_rate=44100, base_interval=BASE_INTERVAL,
+                 max_interval=MAX_INTERVAL):
+        self.fingerprinter = fingerprinter
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.novelty = NoveltyTracker(sample_rate)
+        self.wakeup = asyncio.Event()
+
+        self.generation = 0        # bumped on every boundary: which song the buffer holds
+        self.voiced_seconds = 0.0  # non-silent audio buffered since the boundary
+        self.boundary_at = time.time()
+        self.interval = base_interval
+        self.next_due = None       # set once MIN_AUDIO is buffered
+        self._identified = False   # this generation has an answer
+        self._confirmed = None     # that answer
+        self._inflight = None      # (generation, voiced seconds, future) of the running lookup
+        self._last_key = None      # (generation, voiced seconds) of the last finished lookup
+        self._last_answer = None
+
+        self.boundaries = {"novelty": 0, "silence": 0, "track": 0}
+        self.lookups = {"boundary": 0, "backoff": 0}
+        self.identified = 0
+        self.confirmations = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.silence_skips = 0
+        self.deferred = 0
+        self.ttid = deque(maxlen=TTID_HISTORY)  # seconds from boundary to first answer
+
+    # ---------- Capture side ----------
+
+    def feed(self, mono):
+        """on_block hook: buffer the audio and watch for song boundaries."""
+        fingerprinter = self.fingerprinter
+        if not fingerprinter.enabled:
+            return
+        novelty = self.novelty
+        was_gap = novelty.silent_seconds >= SILENCE_GAP
+        level = novelty.process(mono)
+        if novelty.silent:
+            return  # keep silence out of the fingerprint and the clock
+        if was_gap:
+            self.boundary("silence")
+        elif level >= NOVELTY_DB:
+            self.boundary("novelty")
+        fingerprinter.feed(mono)
+        self.voiced_seconds += len(mono) / novelty.sample_rate
+        if self.next_due is None and self.voiced_seconds >= MIN_AUDIO:
+            self.next_due = time.monotonic()
+            self.wakeup.set()
+
+    def boundary(self, kind):
+        """A new song (probably) started: fingerprint only what comes next."""
+        self.boundaries[kind] += 1
+        self.generation += 1
+        self.boundary_at = time.time()
+        self.voiced_seconds = 0.0
+        self.interval = self.base_interval
+        self.next_due = None
+        self._identified = False
+        self.novelty.reset()
+        self.fingerprinter.reset()
+
+    # ---------- Lookup side ----------
+
+    async def wait_due(self):
+        """Sleep until a lookup should run; returns its reason."""
+        while True:
+            self.wakeup.clear()
+            now = time.monotonic()
+            if self.next_due is not None and now >= self.next_due:
+                if not self.novelty.silent:
+                    return "backoff" if self._identified else "boundary"
+                self.silence_skips += 1
+                self.next_due = None  # feed() makes it due again when the audio resumes
+            timeout = self.next_due - now if self.next_due is not None else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def defer(self):
+        """Skip this turn (another source already knows the track)."""
+        self.deferred += 1
+        self.next_due = time.monotonic() + self.base_interval
+
+    async def lookup(self, reason="boundary"):
+        """Run fingerprinter.identify() in a thread, sharing identical lookups."""
+        key = (self.generation, self.voiced_seconds)
+        if self._inflight is not None:
+            generation, _, future = self._inflight
+            if generation == self.generation:
+                self.deduplicated += 1
+                return await asyncio.shield(future)
+            await asyncio.shield(future)  # one identify() at a time: it owns the snapshot
+        if key == self._last_key:
+            self.deduplicated += 1  # nothing new buffered since the last one
+            self._record(self._last_answer)
+            return self._last_answer
+
+        self.lookups[reason] = self.lookups.get(reason, 0) + 1
+        future = asyncio.ensure_future(asyncio.to_thread(self.fingerprinter.identify))
+        self._inflight = (key[0], key[1], future)
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            self._inflight = None
+        self._last_key, self._last_answer = key, result
+        if key[0] == self.generation:
+            self._record(result)
+        return result
+
+    def _record(self, result):
+        if result is None:
+            self.misses += 1
+        elif self._identified and result == self._confirmed:
+            self.confirmations += 1
+        else:
+            if not self._identified:
+                self.ttid.append(time.time() - self.boundary_at)
+            self.identified += 1
+            self._identified, self._confirmed = True, result
+            self.interval = self.base_interval
+            self.next_due = time.monotonic() + self.interval
+            return
+        self.interval = min(self.interval * 2, self.max_interval)
+        self.next_due = time.monotonic() + self.interval
+
+    def stats(self):
+        ttid = sorted(self.ttid)
+        return {
+            "generation": self.generation,
+            "silent": self.novelty.silent,
+            "levelDb": round(self.novelty.level_db, 1),
+            "novelty": round(self.novelty.novelty, 2),
+            "voicedSeconds": round(self.voiced_seconds, 1),
+            "interval": self.interval,
+            "dueIn": (round(self.next_due - time.monotonic(), 1)
+                      if self.next_due is not None else None),
+            "boundaries": self.boundaries,
+            "lookups": self.lookups,
+            "identified": self.identified,
+            "confirmations": self.confirmations,
+            "misses": self.misses,
+            "deduplicated": self.deduplicated,
+            "silenceSkips": self.silence_skips,
+            "deferred": self.deferred,
+            "timeToIdLast": round(self.ttid[-1], 1) if ttid else None,
+            "timeToIdMedian": round(ttid[len(ttid) // 2], 1) if ttid else None,
+        }
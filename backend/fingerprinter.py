@@ -1,17 +1,26 @@
 import os
-import tempfile
-import time
-import wave
+import subprocess
 from pathlib import Path
 
 import numpy as np
 
+from dsp import Decimator
+
 try:
     import acoustid
     ACOUSTID_AVAILABLE = True
 except ImportError:
     ACOUSTID_AVAILABLE = False
-    print("pyacoustid not installed — audio fingerprinting disabled")
+
+try:
+    import chromaprint  # pyacoustid's ctypes binding; needs libchromaprint
+    CHROMAPRINT_AVAILABLE = True
+except ImportError:
+    CHROMAPRINT_AVAILABLE = False
+
+# Chromaprint analyses audio at 11025 Hz, so that's all the buffer keeps
+FINGERPRINT_RATE = 11025
+FPCALC_TIMEOUT = 30.0
 
 
 def load_acoustid_key():
@@ -33,119 +42,208 @@ def load_acoustid_key():
 
 
 class AudioFingerprinter:
-    """Buffers system audio and periodically identifies songs via AcoustID."""
+    """Buffers system audio and periodically identifies songs via AcoustID.
+
+    feed() low-passes and decimates the capture stream to ~11 kHz on the
+    way in, so the 20 s ring holds a quarter of the samples. identify()
+    hands that PCM to Chromaprint straight from memory — through the
+    libchromaprint binding when it loads, else piped into `fpcalc -` — with
+    no temp file in between.
+
+    With an index (fingerprint_index.FingerprintIndex) every fingerprint is
+    matched locally first and AcoustID is only asked on a miss; its answers
+    are added to the index. `lookup` replaces the AcoustID web service, e.g.
+    with a local stand-in: lookup(fingerprint, duration) -> iterable of
+    (score, recording_id, title, artist).
+    """
 
     def __init__(self, api_key="", sample_rate=44100, buffer_seconds=20.0,
-                 query_interval=12.0):
+                 index=None, lookup=None):
         self.api_key = api_key
+        self.index = index
+        self._lookup = lookup or self._acoustid_lookup
+        self.local_hits = 0
+        self.remote_lookups = 0
         self.sample_rate = sample_rate
-        self.buffer_size = int(sample_rate * buffer_seconds)
-        self.query_interval = query_interval
+        self._decimator = Decimator(max(1, round(sample_rate / FINGERPRINT_RATE)))
+        self.rate = sample_rate // self._decimator.factor  # rate of the buffered audio
+        self.buffer_size = int(self.rate * buffer_seconds)
 
         self._buffer = np.zeros(self.buffer_size, dtype=np.int16)
+        self._snapshot = np.zeros(self.buffer_size, dtype=np.int16)  # what identify() reads
         self._buffer_pos = 0
         self._buffer_filled = False
-        self._last_query_time = 0.0
         self._last_result = None
 
         self.enabled = bool(api_key) and ACOUSTID_AVAILABLE
-        if not self.enabled and api_key and not ACOUSTID_AVAILABLE:
-            print("AcoustID key found but pyacoustid not installed")
+        if not ACOUSTID_AVAILABLE:
+            # Said here, not at import: DSP child processes import this module too
+            print("AcoustID key found but pyacoustid not installed" if api_key
+                  else "pyacoustid not installed — audio fingerprinting disabled")
 
     def feed(self, mono_float):
         """Accept a chunk of mono float32 audio and append to circular buffer."""
         if not self.enabled:
             return
 
-        int16_chunk = (mono_float * 32767).clip(-32768, 32767).astype(np.int16)
-        chunk_len = len(int16_chunk)
+        decimated = self._decimator.process(mono_float)
+        np.multiply(decimated, 32767, out=decimated)
+        chunk_len = len(decimated)
         end_pos = self._buffer_pos + chunk_len
 
         if end_pos <= self.buffer_size:
-            self._buffer[self._buffer_pos:end_pos] = int16_chunk
+            self._store(decimated, self._buffer[self._buffer_pos:end_pos])
         else:
             first_part = self.buffer_size - self._buffer_pos
-            self._buffer[self._buffer_pos:] = int16_chunk[:first_part]
-            remaining = chunk_len - first_part
-            self._buffer[:remaining] = int16_chunk[first_part:]
+            self._store(decimated[:first_part], self._buffer[self._buffer_pos:])
+            self._store(decimated[first_part:], self._buffer[:chunk_len - first_part])
             self._buffer_filled = True
 
         self._buffer_pos = end_pos % self.buffer_size
 
-    def can_query(self):
-        """Check if enough audio is buffered and enough time has elapsed."""
-        if not self.enabled:
-            return False
-        if time.time() - self._last_query_time < self.query_interval:
-            return False
-        min_samples = int(self.sample_rate * 10)
-        filled = self.buffer_size if self._buffer_filled else self._buffer_pos
-        return filled >= min_samples
+    @staticmethod
+    def _store(scaled, out):
+        np.clip(scaled, -32768, 32767, out=out, casting="unsafe")
 
     def _get_buffer_snapshot(self):
-        """Get a contiguous copy of the buffered audio."""
-        if self._buffer_filled:
-            return np.concatenate([
-                self._buffer[self._buffer_pos:],
-                self._buffer[:self._buffer_pos],
-            ])
-        return self._buffer[:self._buffer_pos].copy()
+        """Copy the buffered audio, oldest first, into the reused snapshot buffer.
+
+        feed() keeps writing while identify() runs in a thread, so the
+        fingerprint is taken from this copy rather than the live ring.
+        """
+        pos = self._buffer_pos
+        if not self._buffer_filled:
+            np.copyto(self._snapshot[:pos], self._buffer[:pos])
+            return self._snapshot[:pos]
+        tail = self.buffer_size - pos
+        np.copyto(self._snapshot[:tail], self._buffer[pos:])
+        np.copyto(self._snapshot[tail:], self._buffer[:pos])
+        return self._snapshot
+
+    def _fingerprint(self, audio_data):
+        """(duration, fingerprint) of int16 mono PCM at self.rate, from memory."""
+        if CHROMAPRINT_AVAILABLE:
+            # pyacoustid returns just the fingerprint, and reads pcmiter with next()
+            pcm = memoryview(audio_data).cast("B")
+            return len(audio_data) / self.rate, acoustid.fingerprint(self.rate, 1, iter([pcm]))
+        return self._fpcalc(audio_data)
+
+    def _raw_fingerprint(self, audio_data):
+        """(duration, uint32 sub-fingerprints, compressed fingerprint or None).
+
+        The compressed form comes for free from libchromaprint; fpcalc only
+        prints one or the other, so it's left to a second run on an index miss.
+        """
+        if CHROMAPRINT_AVAILABLE:
+            duration, fingerprint = self._fingerprint(audio_data)
+            raw, _ = chromaprint.decode_fingerprint(fingerprint)
+            return duration, np.array(raw, dtype=np.int64).astype(np.uint32), fingerprint
+        duration, raw = self._fpcalc(audio_data, raw=True)
+        return duration, raw, None
+
+    def _fpcalc(self, audio_data, raw=False):
+        """Pipe the PCM into `fpcalc -`; raw=True asks for the sub-fingerprints."""
+        pcm = memoryview(audio_data).cast("B")
+        fpcalc = os.environ.get(acoustid.FPCALC_ENVVAR, acoustid.FPCALC_COMMAND)
+        command = [fpcalc, "-format", "s16le", "-rate", str(self.rate), "-channels", "1",
+                   "-length", str(len(audio_data) // self.rate + 1), "-"]
+        if raw:
+            command.insert(1, "-raw")
+        try:
+            proc = subprocess.run(command, input=pcm, capture_output=True,
+                                  timeout=FPCALC_TIMEOUT)
+        except FileNotFoundError:
+            raise acoustid.NoBackendError("fpcalc not found")
+        if proc.returncode:
+            raise acoustid.FingerprintGenerationError(
+                f"fpcalc exited with status {proc.returncode}: "
+                f"{proc.stderr.decode(errors='replace').strip()}")
+        fields = dict(line.split(b"=", 1) for line in proc.stdout.splitlines() if b"=" in line)
+        try:
+            duration, fingerprint = float(fields[b"DURATION"]), fields[b"FINGERPRINT"]
+            if raw:
+                fingerprint = np.array([int(v) for v in fingerprint.split(b",")],
+                                       dtype=np.int64).astype(np.uint32)
+            return duration, fingerprint
+        except (KeyError, ValueError):
+            raise acoustid.FingerprintGenerationError("malformed fpcalc output")
+
+    def _acoustid_lookup(self, fingerprint, duration):
+        results = acoustid.lookup(self.api_key, fingerprint, duration, meta="recordings")
+        return acoustid.parse_lookup_result(results)
+
+    def identify_local(self, raw):
+        """(artist, title, album, musicbrainz_id) from the local index, or None."""
+        if self.index is None:
+            return None
+        match = self.index.match(raw)
+        if match is None:
+            return None
+        self.local_hits += 1
+        return (match["artist"], match["title"], match["album"], match["recordingId"])
+
+    def identify_remote(self, duration, fingerprint, raw=None):
+        """Ask the lookup service; a confident answer is added to the index with `raw`."""
+        self.remote_lookups += 1
+        for score, rec_id, title, artist in self._lookup(fingerprint, duration):
+            if score >= 0.5:
+                result = (artist or "", title or "", "", rec_id or "")
+                if self.index is not None and raw is not None:
+                    self.index.add(raw, duration, *result)
+                return result
+        return None
 
     def identify(self):
-        """Run fingerprint + AcoustID lookup. BLOCKING — call via asyncio.to_thread().
+        """Fingerprint, then match locally or ask AcoustID. BLOCKING — call via asyncio.to_thread().
 
         Returns (artist, title, album, musicbrainz_id) or None.
         """
         if not self.enabled:
             return None
 
-        self._last_query_time = time.time()
         audio_data = self._get_buffer_snapshot()
 
-        if len(audio_data) < self.sample_rate * 3:
+        if len(audio_data) < self.rate * 3:
             return None
 
-        tmp_path = None
         try:
-            # Write buffer to temp WAV for acoustid.fingerprint_file()
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-                tmp_path = f.name
-                with wave.open(f, "wb") as wav:
-                    wav.setnchannels(1)
-                    wav.setsampwidth(2)
-                    wav.setframerate(self.sample_rate)
-                    wav.writeframes(audio_data.tobytes())
-
-            duration, fingerprint = acoustid.fingerprint_file(tmp_path)
-
-            results = acoustid.lookup(
-                self.api_key, fingerprint, duration, meta="recordings"
-            )
-
-            for score, rec_id, title, artist in acoustid.parse_lookup_result(results):
-                if score >= 0.5:
-                    self._last_result = (artist or "", title or "", "", rec_id or "")
-                    return self._last_result
-
-            return None
+            raw = fingerprint = None
+            if self.index is not None:
+                duration, raw, fingerprint = self._raw_fingerprint(audio_data)
+                result = self.identify_local(raw)
+                if result is not None:
+                    print(f"Fingerprint matched locally (BER {self.index.last_ber:.3f}, "
+                          f"{self.index.last_match_ms} ms)")
+                    self._last_result = result
+                    return result
+            if fingerprint is None:
+                duration, fingerprint = self._fingerprint(audio_data)
+
+            result = self.identify_remote(duration, fingerprint, raw)
+            if result is not None:
+                self._last_result = result
+            return result
 
         except Exception as e:
             print(f"Fingerprint error: {e}")
             return None
-        finally:
-            if tmp_path:
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "bufferRate": self.rate,
+            "localHits": self.local_hits,
+            "remoteLookups": self.remote_lookups,
+            "index": self.index.stats() if self.index is not None else None,
+        }
 
     @property
     def last_result(self):
         return self._last_result
 
     def reset(self):
-        """Clear the audio buffer (call on track change)."""
-        self._buffer = np.zeros(self.buffer_size, dtype=np.int16)
+        """Clear the audio buffer (call on track change). Nothing is reallocated."""
+        self._decimator.reset()
         self._buffer_pos = 0
         self._buffer_filled = False
         self._last_result = None
@@ -0,0 +1,275 @@
+"""WebSocket audio frame encodings.
+
+Two wire formats share the same stream:
+  * "json"   — the original text frame ({"seq": 1, "t": ..., "fft": [...], ...}).
+  * "binary" — a 26-byte header followed by packed FFT and waveform arrays.
+
+Clients opt in by sending a hello message after connecting:
+    {"type": "hello", "format": "binary", "encoding": "u8"}    # or "f16", or "format": "json"
+Clients that never send one are "legacy" and keep receiving JSON frames with
+the full media state embedded. Clients that do send one get audio-only frames
+plus the media state as its own text messages (see now_playing.py):
+    {"type": "state", "version": 7, "media": {...}}                 # on hello
+    {"type": "delta", "version": 9, "base": 7, "changes": {...}, "removed": [...]}
+
+A hello (or a later subscribe, which only changes the keys it names) can also
+pick what the client receives:
+    {"type": "subscribe", "fpsDivisor": 3, "bins": 64, "fields": ["fft", "peak"]}
+  * fpsDivisor — send every Nth frame (1..MAX_FPS_DIVISOR)
+  * bins       — FFT resolution, one of BIN_COUNTS
+  * bands      — how bins are formed, one of BAND_MODES: "log" (log-spaced
+                 FFT buckets, global normalization) or "mel"/"bark"
+                 (filterbank bands, per-band automatic gain control)
+  * points     — waveform length, MIN_WAVEFORM_POINTS..MAX_WAVEFORM_POINTS
+  * waveformMode — how the block is reduced to those points, one of WAVEFORM_MODES:
+                   "minmax" (interleaved per-segment min, max — peak preserving,
+                   the default after a hello), "rms" (per-segment RMS, 0..1)
+                   or "sample" (evenly spaced samples, what legacy clients get)
+  * channel    — which audio channel to listen to (the server's --channel
+                 names; "main" by default, or ?channel=NAME in the URL)
+  * fields     — any of FIELDS; leaving out "media" also stops state/delta messages,
+                 "beat" adds the server-side beat flag, beat count, bpm and confidence
+Clients with identical options form a group and share one encoded frame.
+
+Every frame carries a monotonically increasing sequence number and its
+capture timestamp. A gap in seq larger than fpsDivisor means frames were
+dropped; a repeated seq is
+a keepalive re-send of the last frame while no new audio is arriving.
+
+The beat flag covers the frame before this one on the server, which a client
+skipping frames (fpsDivisor, backpressure, drops) may never have seen. The
+beat count does not depend on that: it goes up by one with every frame that
+had a beat, so a client sees a beat whenever it differs from the count in the
+last frame it received.
+
+Binary frame layout (little-endian):
+    u8  version        FRAME_VERSION
+    u8  flags          bit 0 FLAG_F16 => arrays are float16, else uint8
+                       bit 1 FLAG_BEAT => a beat occurred since the previous frame
+                       bits 2..7 beat confidence * 63
+    u16 fft_count      0 when "fft" isn't subscribed
+    u16 waveform_count 0 when "waveform" isn't subscribed
+    u16 bpm            tempo estimate * 100, 0 = none (or "beat" not subscribed)
+    u32 seq            frame sequence number (wraps at 2**32)
+    f64 timestamp      capture time, seconds since the epoch
+    f32 peak           absolute peak of the block, 0..1 (always sent in binary)
+    u16 beats          frames with a beat so far (wraps at 2**16), 0 if "beat" isn't subscribed
+    fft_count values   uint8: round(v * 255)            float16: v
+    waveform values    uint8: round((v + 1) * 127.5)    float16: v
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from dsp import WAVEFORM_MODES
+
+FRAME_VERSION = 2  # 2: beat count at the end of the header
+FLAG_F16 = 0x01
+FLAG_BEAT = 0x02
+CONFIDENCE_SHIFT = 2  # beat confidence * 63 lives in flags bits 2..7
+
+HEADER = struct.Struct("<BBHHHIdfH")
+
+FORMATS = ("json", "binary")
+ENCODINGS = ("u8", "f16")
+BIN_COUNTS = (64, 128, 256, 512)
+BAND_MODES = ("log", "mel", "bark")
+FIELDS = ("fft", "waveform", "peak", "media", "beat")
+LEGACY_FIELDS = ("fft", "waveform", "peak", "media")  # what pre-hello clients always got
+DEFAULT_BINS = 128
+MAX_FPS_DIVISOR = 30
+DEFAULT_WAVEFORM_POINTS = 128
+MIN_WAVEFORM_POINTS = 16
+MAX_WAVEFORM_POINTS = 1024
+
+
+def stream_options(fmt="legacy", encoding="u8", bins=DEFAULT_BINS, fields=FIELDS, fps_divisor=1,
+                   bands="log", points=DEFAULT_WAVEFORM_POINTS, waveform="minmax"):
+    """Options for one client's stream. Clients with an equal "group" share encodes.
+
+    The group is the frame's content only: fpsDivisor just decides which of
+    those frames a client gets, and broadcast() applies it per client.
+    """
+    fields = tuple(f for f in FIELDS if f in fields)
+    return {
+        "format": fmt,
+        "encoding": encoding,
+        "bins": bins,
+        "bands": bands,
+        "points": points,
+        "waveformMode": waveform,
+        "fields": fields,
+        "fpsDivisor": fps_divisor,
+        "group": (fmt, encoding, bins, bands, points, waveform, fields),
+    }
+
+
+def _is_int(value):
+    """A JSON integer: 64.0 equals 64 but can't size an array, and True is not a count."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_client_message(message, current):
+    """Parse a hello/subscribe control message against a client's current options.
+
+    Returns (message type, new options), or (None, None) for anything else.
+    "hello" starts from the defaults; "subscribe" only changes the keys it names.
+    """
+    try:
+        msg = json.loads(message)
+    except (TypeError, ValueError):
+        return None, None
+    if not isinstance(msg, dict) or msg.get("type") not in ("hello", "subscribe"):
+        return None, None
+
+    base = stream_options("json") if msg["type"] == "hello" else current
+    fmt = msg.get("format", base["format"])
+    if fmt not in FORMATS:
+        fmt = "json"
+    encoding = msg.get("encoding", base["encoding"])
+    if encoding not in ENCODINGS:
+        encoding = base["encoding"]
+    bins = msg.get("bins", base["bins"])
+    if not _is_int(bins) or bins not in BIN_COUNTS:
+        bins = base["bins"]
+    bands = msg.get("bands", base["bands"])
+    if bands not in BAND_MODES:
+        bands = base["bands"]
+    waveform = msg.get("waveformMode", base["waveformMode"])
+    if waveform not in WAVEFORM_MODES:
+        waveform = base["waveformMode"]
+    points = msg.get("points", base["points"])
+    if _is_int(points):
+        points = min(max(points, MIN_WAVEFORM_POINTS), MAX_WAVEFORM_POINTS)
+    else:
+        points = base["points"]
+    if waveform == "minmax":
+        points -= points % 2  # whole (min, max) pairs
+    fields = msg.get("fields", base["fields"])
+    if not isinstance(fields, (list, tuple)):
+        fields = base["fields"]
+    divisor = msg.get("fpsDivisor", base["fpsDivisor"])
+    divisor = min(max(divisor, 1), MAX_FPS_DIVISOR) if _is_int(divisor) else base["fpsDivisor"]
+    opts = stream_options(fmt, encoding, bins, fields, divisor, bands, points, waveform)
+    # The channel persists across hellos; the server checks that it exists
+    channel = msg.get("channel", current.get("channel"))
+    opts["channel"] = channel if isinstance(channel, str) else current.get("channel")
+    return msg["type"], opts
+
+
+def encode_json_frame(seq, timestamp, peak=None, fft=None, waveform=None, media_json=None,
+                      beat=None):
+    """Encode one frame in the JSON text format. Fields passed as None are left out.
+
+    beat is (beat since the previous frame, beat count, bpm, confidence)
+    from the beat tracker, sent as "beat": 0|1, "beats", "bpm" and "beatConf".
+
+    media_json is the pre-encoded media state, spliced in for legacy clients
+    that expect it inside every frame; negotiated clients get audio only.
+    """
+    frame = {"seq": seq, "t": timestamp}
+    if fft is not None:
+        frame["fft"] = np.round(np.asarray(fft, dtype=np.float64), 4).tolist()
+    if waveform is not None:
+        frame["waveform"] = np.round(np.asarray(waveform, dtype=np.float64), 4).tolist()
+    if peak is not None:
+        frame["peak"] = round(peak, 4)
+    if beat is not None:
+        frame["beat"] = int(beat[0])
+        frame["beats"] = int(beat[1])
+        frame["bpm"] = round(float(beat[2]), 1)
+        frame["beatConf"] = round(float(beat[3]), 2)
+    frame = json.dumps(frame)
+    if media_json is None:
+        return frame
+    return frame[:-1] + ', "media": ' + media_json + "}"
+
+
+class BinaryFrameEncoder:
+    """Packs frames for one (fft bins, waveform points, encoding) shape.
+
+    A count of 0 leaves that array out (clients that didn't subscribe to it).
+
+    The frame is assembled in a preallocated buffer straight from the float32
+    DSP outputs; only the final bytes() copy handed to the socket allocates.
+    """
+
+    def __init__(self, fft_bins, waveform_points, encoding="u8"):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"unknown encoding: {encoding}")
+        self.fft_bins = fft_bins
+        self.waveform_points = waveform_points
+        self.encoding = encoding
+        self._flags = FLAG_F16 if encoding == "f16" else 0
+
+        item = 2 if encoding == "f16" else 1
+        fft_end = HEADER.size + fft_bins * item
+        self._buf = np.zeros(fft_end + waveform_points * item, dtype=np.uint8)
+        if encoding == "f16":
+            self._fft = self._buf[HEADER.size:fft_end].view(np.float16)
+            self._wave = self._buf[fft_end:].view(np.float16)
+        else:
+            self._fft = self._buf[HEADER.size:fft_end]
+            self._wave = self._buf[fft_end:]
+            self._scratch_fft = np.zeros(fft_bins, dtype=np.float32)
+            self._scratch_wave = np.zeros(waveform_points, dtype=np.float32)
+
+    @property
+    def size(self):
+        return len(self._buf)
+
+    def encode(self, seq, timestamp, peak, fft, waveform, beat=None):
+        """Return one binary frame as bytes. beat is (on, count, bpm, confidence) or None."""
+        flags = self._flags
+        bpm = beats = 0
+        if beat is not None:
+            on, beats, tempo, confidence = beat
+            flags |= (FLAG_BEAT if on else 0) | (round(min(max(confidence, 0.0), 1.0) * 63) << CONFIDENCE_SHIFT)
+            bpm = min(round(tempo * 100), 0xFFFF)
+        HEADER.pack_into(self._buf, 0, FRAME_VERSION, flags,
+                         self.fft_bins, self.waveform_points, bpm,
+                         seq & 0xFFFFFFFF, timestamp, peak, beats & 0xFFFF)
+        if self.encoding == "f16":
+            if self.fft_bins:
+                np.copyto(self._fft, fft, casting="same_kind")
+            if self.waveform_points:
+                np.copyto(self._wave, waveform, casting="same_kind")
+        else:
+            if self.fft_bins:
+                s = self._scratch_fft
+                np.multiply(fft, 255, out=s)
+                np.clip(s, 0, 255, out=s)
+                np.rint(s, out=s)
+                np.copyto(self._fft, s, casting="unsafe")
+
+            if self.waveform_points:
+                s = self._scratch_wave
+                np.add(waveform, 1, out=s)
+                np.multiply(s, 127.5, out=s)
+                np.clip(s, 0, 255, out=s)
+                np.rint(s, out=s)
+                np.copyto(self._wave, s, casting="unsafe")
+        return self._buf.tobytes()
+
+
+def decode_binary_frame(data):
+    """Decode a binary frame back into a dict (mirror of the frontend decoder)."""
+    version, flags, fft_count, wave_count, bpm, seq, timestamp, peak, beats = HEADER.unpack_from(data, 0)
+    if version != FRAME_VERSION:
+        raise ValueError(f"unsupported frame version: {version}")
+    offset = HEADER.size
+    if flags & FLAG_F16:
+        fft = np.frombuffer(data, dtype=np.float16, count=fft_count, offset=offset).astype(np.float32)
+        offset += fft_count * 2
+        waveform = np.frombuffer(data, dtype=np.float16, count=wave_count, offset=offset).astype(np.float32)
+    else:
+        fft = np.frombuffer(data, dtype=np.uint8, count=fft_count, offset=offset) / 255.0
+        offset += fft_count
+        waveform = np.frombuffer(data, dtype=np.uint8, count=wave_count, offset=offset) / 127.5 - 1.0
+    return {
+        "seq": seq, "timestamp": timestamp, "peak": peak, "fft": fft, "waveform": waveform,
+        "beat": bool(flags & FLAG_BEAT), "beats": beats, "bpm": bpm / 100,
+        "beatConf": (flags >> CONFIDENCE_SHIFT) / 63,
+    }
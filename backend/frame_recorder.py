@@ -0,0 +1,251 @@
+"""Record the analysis frame stream to disk and replay it later.
+
+A recording is a directory:
+    meta.json     shapes and record layout (written on open, finalized on close)
+    frames.bin    fixed-size records, appended through an np.memmap
+    tracks.jsonl  one line per track change, keyed by the frame seq it happened at
+
+Each record holds what a subscriber would have been sent: seq, capture
+timestamp, block peak, the normalized log-binned FFT and the min/max
+waveform envelope. Records are a packed numpy structured dtype, so a
+replay maps the file read-only and hands out views of it — no copy per
+frame. The file grows in chunks while recording; an unclean stop leaves
+zero-filled spare records, which readers drop (seq 0 is never written).
+"""
+
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_VERSION = 1
+CHUNK_FRAMES = 4096  # ~3 minutes of frames at 21.5/s per file growth step
+
+
+def record_dtype(fft_bins, waveform_points):
+    """Structured dtype of one frame record (8-byte aligned fields first)."""
+    return np.dtype([
+        ("timestamp", "<f8"),
+        ("seq", "<u4"),
+        ("peak", "<f4"),
+        ("fft", "<f4", (fft_bins,)),
+        ("waveform", "<f4", (waveform_points,)),
+    ])
+
+
+class FrameRecorder:
+    """Appends analysis frames to a memory-mapped recording directory."""
+
+    def __init__(self, path, fft_bins, waveform_points, waveform_mode="minmax",
+                 sample_rate=44100, block_size=2048, chunk_frames=CHUNK_FRAMES):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dtype = record_dtype(fft_bins, waveform_points)
+        self.chunk_frames = chunk_frames
+        self.count = 0
+        self.tracks = 0
+        self.meta = {
+            "version": FORMAT_VERSION,
+            "fftBins": fft_bins,
+            "waveformPoints": waveform_points,
+            "waveformMode": waveform_mode,
+            "sampleRate": sample_rate,
+            "blockSize": block_size,
+            "recordSize": self.dtype.itemsize,
+            "createdAt": time.time(),
+            "frames": None,  # filled in by close()
+        }
+        self._frames_path = self.path / "frames.bin"
+        self._tracks = open(self.path / "tracks.jsonl", "w", encoding="utf-8")
+        self._write_meta()
+        with open(self._frames_path, "wb"):
+            pass
+        self._map = None
+        self._grow()
+
+    def _write_meta(self):
+        with open(self.path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+
+    def _grow(self):
+        capacity = (len(self._map) if self._map is not None else 0) + self.chunk_frames
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        with open(self._frames_path, "r+b") as f:
+            f.truncate(capacity * self.dtype.itemsize)
+        self._map = np.memmap(self._frames_path, dtype=self.dtype, mode="r+", shape=(capacity,))
+
+    def write(self, seq, timestamp, peak, fft, waveform):
+        """Append one frame. fft and waveform must match the recorder's shapes."""
+        if self.count == len(self._map):
+            self._grow()
+        record = self._map[self.count]
+        record["timestamp"] = timestamp
+        record["seq"] = seq
+        record["peak"] = peak
+        record["fft"] = fft
+        record["waveform"] = waveform
+        self.count += 1
+
+    def mark_track(self, artist, title, album="", source="", seq=0, timestamp=0.0):
+        """Note a track change at frame `seq` in the sidecar index."""
+        line = {"seq": seq, "t": timestamp, "frame": self.count, "artist": artist,
+                "title": title, "album": album or "", "source": source}
+        self._tracks.write(json.dumps(line) + "\n")
+        self._tracks.flush()
+        self.tracks += 1
+
+    def close(self):
+        if self._map is None:
+            return
+        self._map.flush()
+        self._map = None
+        os.truncate(self._frames_path, self.count * self.dtype.itemsize)
+        self._tracks.close()
+        self.meta["frames"] = self.count
+        self._write_meta()
+
+    def stats(self):
+        return {
+            "path": str(self.path),
+            "frames": self.count,
+            "tracks": self.tracks,
+            "bytes": self.count * self.dtype.itemsize,
+        }
+
+
+class FrameRecording:
+    """A recording opened read-only; frames[i] fields are views into the file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported recording version: {self.meta.get('version')}")
+        self.dtype = record_dtype(self.meta["fftBins"], self.meta["waveformPoints"])
+        frames_path = self.path / "frames.bin"
+        capacity = os.path.getsize(frames_path) // self.dtype.itemsize
+        count = 0
+        if capacity:
+            frames = np.memmap(frames_path, dtype=self.dtype, mode="r", shape=(capacity,))
+            count = self.meta.get("frames")
+            if count is None:
+                # Not closed cleanly: trim the zero-filled tail of the last chunk
+                written = np.flatnonzero(frames["seq"])
+                count = int(written[-1]) + 1 if len(written) else 0
+        if not count:
+            raise ValueError(f"recording has no frames: {self.path}")
+        self.frames = frames[:count]
+        self.fft = self.frames["fft"]
+        self.waveform = self.frames["waveform"]
+
+        self.tracks = []
+        tracks_path = self.path / "tracks.jsonl"
+        if tracks_path.exists():
+            with open(tracks_path, encoding="utf-8") as f:
+                self.tracks = [json.loads(line) for line in f if line.strip()]
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def duration(self):
+        if len(self.frames) < 2:
+            return 0.0
+        return float(self.frames["timestamp"][-1] - self.frames["timestamp"][0])
+
+
+class ReplayAnalyzer:
+    """Stands in for FrameAnalyzer while a recording is replayed.
+
+    bands()/waveform() return views straight into the recording when the
+    subscriber asks for the recorded shape; other sizes are linearly
+    resampled into a per-size buffer. Band scales and waveform modes can't
+    be recomputed without the audio, so every subscriber gets the recorded
+    log bins and envelope, just at its own length.
+    """
+
+    stft = None
+    lookback = 0
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.index = -1
+        self.seq = 0
+        self.timestamp = 0.0
+        self.frames = 0
+        self.resamples = 0
+        self._resampled = {}  # (field, length) -> (x positions, buffer)
+        self._fresh = set()   # (field, length) already resampled for this frame
+
+    def begin(self, index, seq, timestamp):
+        self.index = index
+        self.seq = seq
+        self.timestamp = timestamp
+        self._fresh.clear()
+        self.frames += 1
+
+    @property
+    def peak(self):
+        return float(self.recording.frames["peak"][self.index])
+
+    def _fit(self, field, values, length):
+        if length == len(values):
+            return values
+        key = (field, length)
+        entry = self._resampled.get(key)
+        if entry is None:
+            x = np.linspace(0, len(values) - 1, length)
+            entry = self._resampled[key] = (x, np.zeros(length, dtype=np.float32))
+        x, out = entry
+        if key not in self._fresh:
+            out[:] = np.interp(x, np.arange(len(values)), values)
+            self._fresh.add(key)
+            self.resamples += 1
+        return out
+
+    def bands(self, num_bands, scale="log"):
+        return self._fit("fft", self.recording.fft[self.index], num_bands)
+
+    def bins(self, num_bins):
+        return self.bands(num_bins)
+
+    def waveform(self, points=None, mode="sample"):
+        values = self.recording.waveform[self.index]
+        return self._fit("waveform", values, points or len(values))
+
+    def stats(self):
+        return {
+            "mode": "replay",
+            "frames": self.frames,
+            "recording": str(self.recording.path),
+            "recordingFrames": len(self.recording),
+            "position": self.index,
+            "resamples": self.resamples,
+        }
+
+
+async def replay_frames(recording, speed=1.0, loop=True):
+    """Yield (index, wall-clock timestamp) at the recording's pace / speed.
+
+    Timestamps are rebased onto the current wall clock so clients see a live
+    stream. With loop=True the recording starts over when it ends.
+    """
+    stamps = recording.frames["timestamp"]
+    while True:
+        start_wall = time.time()
+        start_mono = time.monotonic()
+        first = float(stamps[0])
+        for index in range(len(recording)):
+            offset = (float(stamps[index]) - first) / speed
+            delay = start_mono + offset - time.monotonic()
+            # Always yield to the event loop, even when behind (high speeds)
+            await asyncio.sleep(max(delay, 0))
+            yield index, start_wall + offset
+        if not loop:
+            return
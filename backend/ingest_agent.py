@@ -0,0 +1,83 @@
+"""
+Capture agent: stream local audio to a JamScrapper server's /ingest endpoint.
+
+Runs next to the audio (e.g. natively on the Windows machine playing music)
+while the server runs elsewhere with --source ingest or
+--channel NAME=ingest:
+
+    python ingest_agent.py ws://server:8765/ingest --source loopback
+    python ingest_agent.py ws://server:8765/ingest?channel=stage --source file:set.wav
+    python ingest_agent.py ws://localhost:8765/ingest --source synthetic:tones=440 --format f32
+
+Audio is sent as --chunk-ms chunks of interleaved PCM at the source's rate;
+the server resamples and jitter-buffers it (see network_ingest.py).
+"""
+import argparse
+import asyncio
+import json
+
+import numpy as np
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from audio_sources import create_source
+
+
+async def stream(args):
+    block = max(1, args.sample_rate * args.chunk_ms // 1000)
+    source = create_source(args.source, args.sample_rate, block)
+    with source:
+        first = source.read()
+        channels = 1 if first.ndim == 1 else first.shape[1]
+        header = {"type": "ingest", "sampleRate": args.sample_rate, "channels": channels,
+                  "format": args.format}
+        if args.channel:
+            header["channel"] = args.channel
+        async with connect(args.url, max_queue=None) as ws:
+            await ws.send(json.dumps(header))
+            ready = json.loads(await ws.recv())
+            print(f"Streaming {source.name} -> {args.url} ({args.sample_rate} Hz, {channels} ch, "
+                  f"{args.format}, {args.chunk_ms} ms chunks; server buffer {ready['targetMs']} ms)")
+
+            async def report():
+                async for message in ws:
+                    stats = json.loads(message)
+                    if args.verbose and stats.get("type") == "ingest_stats":
+                        print(f"  buffered {stats['bufferedMs']} ms, dropped "
+                              f"{stats['droppedSamples']}, underruns {stats['underruns']}")
+
+            reporter = asyncio.create_task(report())
+            data = first
+            try:
+                while True:
+                    if args.format == "s16":
+                        payload = (np.clip(data, -1, 1) * 32767).astype("<i2").tobytes()
+                    else:
+                        payload = np.asarray(data, dtype="<f4").tobytes()
+                    await ws.send(payload)
+                    data = await asyncio.to_thread(source.read)
+            finally:
+                reporter.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("url", help="ws://host:8765/ingest[?channel=NAME]")
+    parser.add_argument("--source", default="loopback",
+                        help="local audio input, same syntax as server.py --source")
+    parser.add_argument("--channel", help="server channel to feed (default: from the URL, else main)")
+    parser.add_argument("--sample-rate", type=int, default=48000)
+    parser.add_argument("--format", choices=("s16", "f32"), default="s16")
+    parser.add_argument("--chunk-ms", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="print the server's buffer stats")
+    args = parser.parse_args()
+    try:
+        asyncio.run(stream(args))
+    except ConnectionClosed as e:
+        print(f"Server closed the connection: {e.rcvd.reason if e.rcvd else e}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""PCM ingest over WebSocket: remote capture agents feeding a channel.
+
+A channel whose source is `ingest` (e.g. --source ingest or
+--channel stage=ingest:latency=60) gets its audio from ws://host:8765/ingest
+instead of a local device. The agent — ingest_agent.py, or a browser tab
+using the Web Audio API — opens the endpoint and sends:
+
+    1. one text message, the header:
+       {"type": "ingest", "channel": "stage", "sampleRate": 48000,
+        "channels": 2, "format": "s16"}          (format: s16 | f32, little-endian)
+       The channel can also come from the URL: /ingest?channel=stage
+    2. binary messages of interleaved PCM frames, ideally 10-50 ms each.
+
+The server answers the header with {"type": "ingest_ready", ...} and then
+sends {"type": "ingest_stats", ...} about once a second so the agent can see
+drops. A bad header closes the socket with 1008, a channel that already has
+an agent with 1013.
+
+Each chunk is downmixed to mono, linearly resampled to the server rate and
+appended to the channel's jitter buffer. The capture thread takes one block
+per block period by the server's clock, after waiting for `latency` ms of
+audio to build up; a buffer that runs dry plays silence and re-buffers
+(underruns), one that passes `max` ms — a fast agent clock, a burst after a
+stall — drops its oldest audio back to the target latency (drops). Latency
+through the buffer therefore stays between `latency` and `max`.
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+from websockets.exceptions import ConnectionClosed
+
+from audio_sources import _PacedSource
+from dsp import Decimator
+
+FORMATS = {"s16": ("<i2", 32768.0), "f32": ("<f4", 1.0)}
+MIN_RATE, MAX_RATE = 8000, 192000
+MAX_CHANNELS = 8
+DEFAULT_LATENCY_MS = 80.0
+DEFAULT_MAX_MS = 250.0
+HEADER_TIMEOUT = 5.0   # seconds an agent has to send its header
+STATS_INTERVAL = 1.0   # seconds between ingest_stats messages to the agent
+
+
+def parse_ingest_header(message, channel=None):
+    """Validate an agent's header message. Raises ValueError with the reason."""
+    if not isinstance(message, str):
+        raise ValueError("first message must be the JSON header")
+    try:
+        header = json.loads(message)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"header is not JSON: {e}")
+    if not isinstance(header, dict) or header.get("type") != "ingest":
+        raise ValueError('header must be an object with "type": "ingest"')
+    fmt = header.get("format", "s16")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    rate = header.get("sampleRate")
+    if not isinstance(rate, int) or isinstance(rate, bool) or not MIN_RATE <= rate <= MAX_RATE:
+        raise ValueError(f"sampleRate must be an integer in {MIN_RATE}..{MAX_RATE}")
+    channels = header.get("channels", 1)
+    if not isinstance(channels, int) or isinstance(channels, bool) or not 1 <= channels <= MAX_CHANNELS:
+        raise ValueError(f"channels must be an integer in 1..{MAX_CHANNELS}")
+    channel = header.get("channel", channel)
+    if channel is not None and not isinstance(channel, str):
+        raise ValueError("channel must be a string")
+    return {"channel": channel, "sampleRate": rate, "channels": channels, "format": fmt}
+
+
+class StreamResampler:
+    """Linear-interpolation resampler that stays continuous across chunks.
+
+    Downsampling first low-passes below the output Nyquist (and decimates by
+    the whole part of the ratio) with dsp.Decimator, so a 96/192 kHz agent's
+    ultrasonic content doesn't alias into the analysis.
+    """
+
+    def __init__(self, src_rate, dst_rate):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self._decimator = None
+        if src_rate > dst_rate:
+            factor = src_rate // dst_rate
+            self._decimator = Decimator(factor, taps_per_phase=32,
+                                        cutoff=0.45 * dst_rate / src_rate)
+            src_rate /= factor
+        self.step = src_rate / dst_rate  # input samples per output sample
+        self._last = None  # last input sample of the previous chunk (index 0 of the next)
+        self._pos = 0.0    # position of the next output sample in that indexing
+
+    def process(self, samples):
+        if self.src_rate == self.dst_rate or not len(samples):
+            return samples
+        if self._decimator is not None:
+            samples = self._decimator.process(samples)
+            if self.step == 1.0 or not len(samples):
+                return samples.copy()  # the decimator reuses its buffer
+        if self._last is None:
+            x = samples
+        else:
+            x = np.concatenate(([self._last], samples))
+        end = len(x) - 1
+        n = int((end - self._pos) // self.step) + 1 if self._pos <= end else 0
+        positions = self._pos + self.step * np.arange(n)
+        out = np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+        self._pos += self.step * n - end
+        self._last = x[-1]
+        return out
+
+
+class IngestStream:
+    """One connected agent: decodes its chunks to mono at the server rate."""
+
+    def __init__(self, header, sample_rate, peer=""):
+        self.header = header
+        self.peer = peer
+        self.channels = header["channels"]
+        dtype, scale = FORMATS[header["format"]]
+        self.dtype = np.dtype(dtype)
+        self.scale = scale
+        self.frame_bytes = self.dtype.itemsize * self.channels
+        self.resampler = StreamResampler(header["sampleRate"], sample_rate)
+        self.connected_at = time.time()
+        self.chunks = 0
+        self.bytes = 0
+        self.malformed = 0   # chunks whose length wasn't a whole number of frames
+        self.jitter = 0.0    # RFC 3550-style smoothed arrival jitter, seconds
+        self._arrival = None  # (arrival time, stream time) of the previous chunk
+        self._frames = 0      # input frames received so far
+
+    def decode(self, data):
+        """Bytes of interleaved PCM -> float32 mono at the server rate."""
+        self.chunks += 1
+        self.bytes += len(data)
+        usable = len(data) - len(data) % self.frame_bytes
+        if usable != len(data):
+            self.malformed += 1
+        pcm = np.frombuffer(data, dtype=self.dtype, count=usable // self.dtype.itemsize)
+        frames = pcm.reshape(-1, self.channels)
+        mono = frames[:, 0] if self.channels == 1 else frames.mean(axis=1, dtype=np.float32)
+        mono = mono.astype(np.float32, copy=False)
+        if self.scale != 1.0:
+            mono = mono / np.float32(self.scale)
+        self._track_arrival(len(frames))
+        return self.resampler.process(mono)
+
+    def _track_arrival(self, frames):
+        now = time.monotonic()
+        stream_time = self._frames / self.header["sampleRate"]
+        if self._arrival is not None:
+            last_now, last_stream = self._arrival
+            deviation = abs((now - last_now) - (stream_time - last_stream))
+            self.jitter += (deviation - self.jitter) / 16
+        self._arrival = (now, stream_time)
+        self._frames += frames
+
+    def stats(self):
+        return {
+            "peer": self.peer,
+            "format": self.header["format"],
+            "sampleRate": self.header["sampleRate"],
+            "channels": self.channels,
+            "connectedFor": round(time.time() - self.connected_at, 1),
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "malformedChunks": self.malformed,
+            "arrivalJitterMs": round(self.jitter * 1000, 2),
+        }
+
+
+class NetworkSource(_PacedSource):
+    """Audio source fed by an ingest agent through a bounded jitter buffer.
+
+    push() runs on the event loop; read() runs on the capture thread and is
+    paced by the server's clock, so frames keep their spacing whatever the
+    network does. With no agent connected it plays silence.
+    """
+
+    def __init__(self, sample_rate, block_size, latency_ms=DEFAULT_LATENCY_MS,
+                 max_ms=DEFAULT_MAX_MS):
+        super().__init__(sample_rate, block_size)
+        self.name = "ingest"
+        self.target = max(block_size, int(sample_rate * latency_ms / 1000))
+        self.capacity = max(self.target + block_size, int(sample_rate * max_ms / 1000))
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self._block = np.zeros(block_size, dtype=np.float32)
+        self._lock = threading.Lock()
+        self._written = 0  # samples ever pushed
+        self._read = 0     # samples ever taken (or dropped)
+        self._playing = False
+        self.stream = None  # IngestStream of the connected agent
+        self.connections = 0
+        self.rejected = 0
+        self.samples_in = 0
+        self.dropped = 0    # samples discarded on overflow
+        self.overflows = 0
+        self.underruns = 0  # blocks played as silence after the buffer ran dry
+        self.silent_blocks = 0
+
+    # ---------- Agent side (event loop) ----------
+
+    def attach(self, stream):
+        """Make `stream` the channel's agent. Raises RuntimeError if taken."""
+        if self.stream is not None:
+            self.rejected += 1
+            raise RuntimeError("channel already has an ingest agent")
+        self.stream = stream
+        self.connections += 1
+        with self._lock:
+            self._read = self._written  # start from an empty buffer
+            self._playing = False
+
+    def detach(self, stream):
+        if self.stream is stream:
+            self.stream = None
+
+    def push(self, samples):
+        """Append mono samples at the server rate, dropping the oldest on overflow."""
+        n = len(samples)
+        if not n:
+            return
+        with self._lock:
+            self.samples_in += n
+            if self._written + n - self._read > self.capacity:
+                # Overflow: keep only the newest `target` samples
+                keep_from = self._written + n - self.target
+                self.dropped += keep_from - self._read
+                self.overflows += 1
+                if n > self.target:
+                    skip = n - self.target
+                    samples = samples[skip:]
+                    self._written += skip
+                    n = self.target
+                self._read = keep_from
+            pos = self._written % self.capacity
+            first = min(n, self.capacity - pos)
+            self._buf[pos:pos + first] = samples[:first]
+            self._buf[:n - first] = samples[first:]
+            self._written += n
+
+    # ---------- Capture side (capture thread) ----------
+
+    def read(self):
+        self._pace()
+        block = self.block_size
+        with self._lock:
+            available = self._written - self._read
+            if not self._playing and available >= self.target:
+                self._playing = True
+            if self._playing:
+                if available >= block:
+                    pos = self._read % self.capacity
+                    first = min(block, self.capacity - pos)
+                    self._block[:first] = self._buf[pos:pos + first]
+                    self._block[first:] = self._buf[:block - first]
+                    self._read += block
+                    return self._block
+                self._playing = False  # ran dry: re-buffer up to target
+                self.underruns += 1
+            self.silent_blocks += 1
+        self._block[:] = 0
+        return self._block
+
+    @property
+    def buffered(self):
+        """Samples waiting in the jitter buffer."""
+        return self._written - self._read
+
+    def stats(self):
+        rate = self.sample_rate / 1000
+        return {
+            "agent": self.stream.stats() if self.stream is not None else None,
+            "connections": self.connections,
+            "rejected": self.rejected,
+            "bufferedMs": round(self.buffered / rate, 1),
+            "targetMs": round(self.target / rate, 1),
+            "maxMs": round(self.capacity / rate, 1),
+            "samplesIn": self.samples_in,
+            "droppedSamples": self.dropped,
+            "overflows": self.overflows,
+            "underruns": self.underruns,
+            "silentBlocks": self.silent_blocks,
+        }
+
+
+async def run_ingest(websocket, source, header):
+    """Feed one agent's PCM into `source` until it disconnects."""
+    peer = websocket.remote_address
+    stream = IngestStream(header, source.sample_rate, f"{peer[0]}:{peer[1]}" if peer else "")
+    try:
+        source.attach(stream)
+    except RuntimeError as e:
+        await websocket.close(1013, str(e))
+        return
+    try:
+        await websocket.send(json.dumps({
+            "type": "ingest_ready",
+            "sampleRate": source.sample_rate,
+            "targetMs": round(source.target * 1000 / source.sample_rate, 1),
+            "maxMs": round(source.capacity * 1000 / source.sample_rate, 1),
+        }))
+        next_stats = time.monotonic() + STATS_INTERVAL
+        async for message in websocket:
+            if isinstance(message, str):
+                continue  # nothing to say after the header yet
+            source.push(stream.decode(message))
+            now = time.monotonic()
+            if now >= next_stats:
+                next_stats = now + STATS_INTERVAL
+                await websocket.send(json.dumps({"type": "ingest_stats", **source.stats()}))
+    except ConnectionClosed:
+        pass  # agents stop by dropping the connection as often as by closing it
+    finally:
+        source.detach(stream)
+
+
+async def read_ingest_header(websocket, channel=None):
+    """Wait for and parse the agent's header; closes the socket if it's bad."""
+    try:
+        message = await asyncio.wait_for(websocket.recv(), timeout=HEADER_TIMEOUT)
+        return parse_ingest_header(message, channel)
+    except asyncio.TimeoutError:
+        await websocket.close(1008, "no ingest header")
+    except ValueError as e:
+        await websocket.close(1008, str(e)[:120])
+    return None
@@ -0,0 +1,120 @@
+import json
+from collections import deque
+
+
+class NowPlayingState:
+    """Versioned now-playing media state.
+
+    Every change bumps `version` and records a field-level delta, so the
+    WebSocket layer can send a snapshot once per client and then only the
+    fields that changed. The current dict is replaced (never mutated) on each
+    change, so readers on other threads always see a consistent snapshot.
+    """
+
+    def __init__(self, initial, max_deltas=64):
+        self._current = (0, dict(initial))  # (version, fields) — swapped atomically
+        self._deltas = deque(maxlen=max_deltas)  # (version, changes, removed)
+        self._cache = {}  # (kind, version) -> encoded message
+        self._listeners = []
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    @property
+    def snapshot(self):
+        """Current fields. Treat as read-only."""
+        return self._current[1]
+
+    def add_listener(self, callback):
+        """Call callback() after every committed change (on the updating thread)."""
+        self._listeners.append(callback)
+
+    def get(self, key, default=None):
+        return self._current[1].get(key, default)
+
+    def update(self, changes):
+        """Merge changed fields into the state. Returns True if anything changed."""
+        _, fields = self._current
+        diff = {k: v for k, v in changes.items() if k not in fields or fields[k] != v}
+        return self._commit(diff, [])
+
+    def replace(self, new_fields):
+        """Swap in a whole new field set (e.g. on track change)."""
+        _, fields = self._current
+        diff = {k: v for k, v in new_fields.items() if k not in fields or fields[k] != v}
+        removed = [k for k in fields if k not in new_fields]
+        return self._commit(diff, removed)
+
+    def _commit(self, changes, removed):
+        if not changes and not removed:
+            return False
+        version, fields = self._current
+        merged = {k: v for k, v in fields.items() if k not in removed}
+        merged.update(changes)
+        version += 1
+        self._deltas.append((version, changes, removed))
+        self._current = (version, merged)
+        self._cache = {}
+        for callback in self._listeners:
+            callback()
+        return True
+
+    def delta_since(self, base_version):
+        """Merged (changes, removed) after base_version, or None if history is gone."""
+        version = self.version
+        if base_version == version:
+            return {}, []
+        if base_version > version or not self._deltas or self._deltas[0][0] > base_version + 1:
+            return None
+        changes = {}
+        removed = set()
+        for v, c, r in self._deltas:
+            if v <= base_version:
+                continue
+            for k in r:
+                changes.pop(k, None)
+                removed.add(k)
+            for k, val in c.items():
+                changes[k] = val
+                removed.discard(k)
+        return changes, sorted(removed)
+
+    def _cached(self, key, build):
+        msg = self._cache.get(key)
+        if msg is None:
+            msg = build()
+            self._cache[key] = msg
+        return msg
+
+    def snapshot_message(self):
+        """WebSocket message carrying the full state."""
+        version, fields = self._current
+        return self._cached(("state", version), lambda: json.dumps(
+            {"type": "state", "version": version, "media": fields}))
+
+    def delta_message(self, base_version):
+        """WebSocket message moving a client from base_version to now.
+        Falls back to a snapshot when the delta history no longer reaches back."""
+        version = self.version
+        if base_version == version:
+            return None
+        delta = self.delta_since(base_version)
+        if delta is None:
+            return self.snapshot_message()
+        changes, removed = delta
+        return self._cached(("delta", base_version, version), lambda: json.dumps({
+            "type": "delta", "version": version, "base": base_version,
+            "changes": changes, "removed": removed,
+        }))
+
+    def media_json(self):
+        """JSON of the fields alone, for legacy frames that embed media."""
+        version, fields = self._current
+        return self._cached(("media", version), lambda: json.dumps(fields))
+
+    def http_body(self):
+        """Encoded /now-playing response body for the current version."""
+        version, fields = self._current
+        return self._cached(("http", version), lambda: json.dumps(
+            {"media": fields, "version": version}).encode())
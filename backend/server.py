@@ -1,29 +1,44 @@
 import asyncio
-import base64
 import ctypes
 import ctypes.wintypes
 import io
 import json
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from pathlib import Path
+from urllib.parse import parse_qs, urlparse
 import threading
-import numpy as np
+import time
+import argparse
 import requests
-import soundcard as sc
-from websockets.asyncio.server import serve, broadcast
-from winrt.windows.media.control import (
-    GlobalSystemMediaTransportControlsSessionManager as MediaManager,
-)
-from winrt.windows.storage.streams import Buffer, InputStreamOptions
+from websockets.asyncio.server import serve
 
 import mimetypes
+import multiprocessing
 import sys
 
 from db import get_db, init_db
+from dsp import WINDOWS, FrameAnalyzer, StftPlan
+from audio_sources import create_source
+from network_ingest import NetworkSource, read_ingest_header, run_ingest
+from audio_pipeline import DEFAULT_CHANNEL, AudioPipeline
+from beat_tracker import BeatTracker
+from client_session import ClientSession
+from frame_recorder import FrameRecorder, FrameRecording, ReplayAnalyzer
+from spectrogram_history import SpectrogramHistory
+from dsp_process import DspProcess
+from now_playing import NowPlayingState
+from frame_protocol import (
+    LEGACY_FIELDS, parse_client_message, stream_options,
+)
 from fingerprinter import AudioFingerprinter, load_acoustid_key
+from fingerprint_index import DEFAULT_MAX_BER, FingerprintIndex
+from fingerprint_scheduler import FingerprintScheduler
+from detection_bus import DetectionBus
+from title_parser import parse_tab_title
 from artist_store import ArtistStore, enrich_artist_profile, fetch_album_from_musicbrainz
 from history_store import HistoryStore
 from media_cache import MediaCache
+from album_art_store import AlbumArtStore
 from playlist_store import PlaylistStore
 from choreography_store import ChoreographyStore
 from player_state_store import PlayerStateStore
@@ -32,9 +47,14 @@ SAMPLE_RATE = 44100
 BLOCK_SIZE = 2048
 FFT_BINS = 128
 WAVEFORM_POINTS = 128
-FPS = 30
+BROADCAST_FPS = 0  # cap on frames/s sent to clients; 0 = one frame per captured block (~21.5/s)
+ANALYSIS_MODE = "block"  # "block": one unwindowed FFT per block; "stft": overlapping windowed frames
+HOP_SIZE = 512  # STFT hop: 512 samples = ~86 analysis frames/s at 44.1 kHz
+STFT_WINDOW = "hann"
+HISTORY_SECONDS = 0.0  # spectrogram history kept for /stream/spectrogram; 0 = off (opt-in:
+                       # storing it analyses every frame, listeners or not)
+KEEPALIVE_INTERVAL = 1.0  # seconds between re-sends of the last frame while no new audio arrives
 MEDIA_POLL_INTERVAL = 1.0
-EXTENSION_POLL_INTERVAL = 0.05
 
 # Resolve frontend static files directory.
 # PyInstaller bundles into sys._MEIPASS; otherwise look for ../frontend/dist
@@ -44,45 +64,14 @@ else:
     FRONTEND_DIR = Path(__file__).parent.parent / "frontend" / "dist"
 
 
-def log_bin(fft_data, num_bins):
-    """Group FFT bins into num_bins buckets using logarithmic spacing."""
-    n = len(fft_data)
-    if n == 0:
-        return np.zeros(num_bins)
-
-    edges = np.logspace(np.log10(1), np.log10(n), num_bins + 1).astype(int)
-    edges = np.clip(edges, 0, n)
-    edges = np.unique(edges)
-
-    binned = np.zeros(len(edges) - 1)
-    for i in range(len(edges) - 1):
-        start, end = edges[i], edges[i + 1]
-        if start < end:
-            binned[i] = np.mean(fft_data[start:end])
-
-    if len(binned) < num_bins:
-        binned = np.pad(binned, (0, num_bins - len(binned)))
-    elif len(binned) > num_bins:
-        binned = binned[:num_bins]
-
-    return binned
-
-
-def downsample(data, target_len):
-    """Downsample an array to target_len points."""
-    if len(data) <= target_len:
-        return data
-    indices = np.linspace(0, len(data) - 1, target_len).astype(int)
-    return data[indices]
-
-
 # ---------- Media session & artist images ----------
 
-media_info = {
+# Fields of the now-playing state every client sees
+NOW_PLAYING_FIELDS = {
     "artist": "",
     "title": "",
     "album": "",
-    "albumArt": None,       # base64 data URI
+    "albumArt": None,       # /media/albumart/<hash> URL
     "artistImages": [],     # list of image URLs
     "dominantColors": [],
     "genres": [],
@@ -97,11 +86,17 @@ media_info = {
     "youtubeThumbnailUrl": "",
     "youtubeDuration": 0,
 }
+now_playing = None  # NowPlayingState, built in main()
 _last_track_key = ""
 _last_track_seen_at = 0.0
 _profile_version = 0
 _detection_source = ""
 _image_cache = {}  # artist -> image list
+_thumb_track_key = ""  # track whose WinRT thumbnail was last read
+_thumb_url = None  # album art URL for _thumb_track_key
+_thumb_attempts = 0
+THUMBNAIL_MAX_ATTEMPTS = 5  # re-read a missing thumbnail this many polls, then give up
+THUMBNAIL_MAX_BYTES = 5 * 1024 * 1024
 _extension_seen_at = 0.0  # timestamp of last extension detection (for priority)
 _enrichment_track_key = ""  # track key that current enrichment is for
 
@@ -110,97 +105,70 @@ _enrichment_track_key = ""  # track key that current enrichment is for
 SOURCE_PRIORITY = {"extension": 3, "chrome_tab": 2, "media_session": 1, "fingerprint": 0}
 EXTENSION_PRIORITY_WINDOW = 5.0  # seconds to trust extension over lower sources
 
-# Initialize SQLite database (main connection for asyncio loop)
-_db_conn = get_db()
-init_db(_db_conn)
-
-# Separate connection for the HTTP server thread — avoids cross-thread cursor corruption.
-# WAL mode + separate connections = safe concurrent reads while the async loop writes.
-_http_db_conn = get_db()
-
-# Artist profile storage, audio fingerprinter, history, and media cache (main thread)
-artist_store = ArtistStore(_db_conn)
-fingerprinter = AudioFingerprinter(api_key=load_acoustid_key())
-history_store = HistoryStore(_db_conn)
-media_cache = MediaCache(_db_conn)
-media_cache.purge_topic_channels()  # Clear static-image videos so they re-search as real music videos
-playlist_store = PlaylistStore(_db_conn)
-choreography_store = ChoreographyStore(_db_conn)
-player_state_store = PlayerStateStore(_db_conn)
-
-# HTTP-thread stores — read-only operations from the HTTP handler use these
-history_store_http = HistoryStore(_http_db_conn)
-media_cache_http = MediaCache(_http_db_conn)
-
-
-# Known streaming services and their tab title patterns
-# Most use "Song - Artist - Service" or "Artist - Song - Service"
-STREAMING_SUFFIXES = [
-    " - Pandora", " | Pandora", " – Pandora", " — Pandora",
-    " - YouTube Music", " - YouTube", " - SoundCloud",
-    " - Spotify", " | Spotify", " - Tidal", " - Deezer",
-    " - Amazon Music", " - Apple Music", " - Qobuz",
-]
-
-# Splitters: hyphen, en-dash, em-dash, pipe (Pandora/Chrome often use these)
-TITLE_SPLITTERS = [" - ", " – ", " — ", " | ", " · "]
-
-
-def _split_track_parts(text):
-    """Split track string into at most 2 parts using common delimiters. Returns [part1, part2] or [part]."""
-    text = (text or "").strip()
-    if not text:
-        return []
-    for sep in TITLE_SPLITTERS:
-        if sep in text:
-            parts = [p.strip() for p in text.split(sep, 1)]
-            if len(parts) >= 2 and parts[0] and parts[1]:
-                return parts
-    return [text] if text else []
-
-
-def parse_tab_title(title, require_service=False):
-    """Try to extract artist/title from a browser tab title (e.g. Pandora, YT Music).
-    If require_service=True, only returns results if a known streaming suffix was found."""
-    if not title:
-        return "", ""
-
-    # Strip known service suffixes (try longest first so " - YouTube Music" before " - YouTube")
-    clean = title.strip()
-    found_service = False
-    for suffix in sorted(STREAMING_SUFFIXES, key=len, reverse=True):
-        if clean.endswith(suffix):
-            clean = clean[: -len(suffix)].strip()
-            found_service = True
-            break
-
-    # When called from Chrome title scraper, only proceed if it's a known streaming tab
-    if require_service and not found_service:
-        return "", ""
-
-    # If nothing was stripped, still try to parse in case title is "Song - Artist" with no suffix
-    if not clean:
-        return "", ""
-
-    # Filter out non-song pages (navigation pages, settings, etc.)
-    non_song = ["my collection", "stations", "browse", "search", "settings", "home", "library", "queue", "playlist"]
-    if any(ns in clean.lower() for ns in non_song):
-        return "", ""
-
-    parts = _split_track_parts(clean)
-    if len(parts) == 2:
-        # Assume "Title - Artist" (most common); also accept "Artist - Title"
-        return parts[1], parts[0]  # artist, title
-    if len(parts) == 1:
-        return "", parts[0]
-
-    return "", ""
+# Databases and stores are opened by init_services() from main(), not at import:
+# --dsp-process children are spawned, and spawn re-imports this module in each.
+_db_conn = None  # main connection for the asyncio loop
+_http_db_conn = None  # HTTP server thread
+_fingerprint_db_conn = None  # fingerprint index, queried from the identify() thread
+artist_store = None
+fingerprinter = None
+fingerprint_scheduler = None
+history_store = None
+media_cache = None
+album_art_store = None
+playlist_store = None
+choreography_store = None
+player_state_store = None
+history_store_http = None  # HTTP-thread stores — read-only operations from the HTTP handler
+media_cache_http = None
+detection_bus = DetectionBus()  # track detections from every source -> _handle_track_detected
+
+
+def init_services(fingerprint_max_ber=DEFAULT_MAX_BER):
+    """Open the databases and build the stores, fingerprinter and caches.
+
+    The local fingerprint index (every stored fingerprint, loaded into
+    memory) is only built when fingerprinting is on and fingerprint_max_ber > 0.
+    """
+    global _db_conn, _http_db_conn, _fingerprint_db_conn, artist_store, fingerprinter
+    global fingerprint_scheduler, history_store, media_cache, album_art_store, playlist_store
+    global choreography_store, player_state_store, history_store_http, media_cache_http
+
+    # Initialize SQLite database (main connection for asyncio loop)
+    _db_conn = get_db()
+    init_db(_db_conn)
+
+    # Separate connection for the HTTP server thread — avoids cross-thread cursor corruption.
+    # WAL mode + separate connections = safe concurrent reads while the async loop writes.
+    _http_db_conn = get_db()
+
+    # Artist profile storage, audio fingerprinter, history, and media cache (main thread)
+    artist_store = ArtistStore(_db_conn)
+    fingerprinter = AudioFingerprinter(api_key=load_acoustid_key())
+    if fingerprinter.enabled and fingerprint_max_ber > 0:
+        # Its own connection: the index is queried from the identify() thread
+        _fingerprint_db_conn = get_db()
+        fingerprinter.index = FingerprintIndex(_fingerprint_db_conn, max_ber=fingerprint_max_ber)
+    fingerprint_scheduler = FingerprintScheduler(fingerprinter, SAMPLE_RATE)
+    history_store = HistoryStore(_db_conn)
+    media_cache = MediaCache(_db_conn)
+    media_cache.purge_topic_channels()  # Clear static-image videos so they re-search as real music videos
+    album_art_store = AlbumArtStore()
+    playlist_store = PlaylistStore(_db_conn)
+    choreography_store = ChoreographyStore(_db_conn)
+    player_state_store = PlayerStateStore(_db_conn)
+
+    # HTTP-thread stores — read-only operations from the HTTP handler use these
+    history_store_http = HistoryStore(_http_db_conn)
+    media_cache_http = MediaCache(_http_db_conn)
 
 
 def get_chrome_window_titles():
     """Read all Chrome window titles using Windows API (no extra deps).
     Returns a list of window title strings."""
     titles = []
+    if sys.platform != "win32":
+        return titles
     EnumWindows = ctypes.windll.user32.EnumWindows
     EnumWindowsProc = ctypes.WINFUNCTYPE(ctypes.wintypes.BOOL, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)
     GetWindowTextW = ctypes.windll.user32.GetWindowTextW
@@ -261,11 +229,35 @@ def _extract_from_props(props, best_artist, best_title):
     return None
 
 
+_winrt = None  # (MediaManager, Buffer, InputStreamOptions) once imported, False if unavailable
+
+
+def _load_winrt():
+    """Import the WinRT media bindings on first use. Returns None where they don't exist."""
+    global _winrt
+    if _winrt is None:
+        try:
+            from winrt.windows.media.control import (
+                GlobalSystemMediaTransportControlsSessionManager as MediaManager,
+            )
+            from winrt.windows.storage.streams import Buffer, InputStreamOptions
+            _winrt = (MediaManager, Buffer, InputStreamOptions)
+        except ImportError:
+            print("winrt not available -- Windows media session detection disabled")
+            _winrt = False
+    return _winrt or None
+
+
 async def get_media_session_info():
     """Read current 'Now Playing' info from Windows media session."""
-    global _poll_count
+    global _poll_count, _thumb_track_key, _thumb_url, _thumb_attempts
     verbose = _poll_count <= 3 or _poll_count % 10 == 0
 
+    winrt = _load_winrt()
+    if winrt is None:
+        return None, None, None, None
+    MediaManager, Buffer, InputStreamOptions = winrt
+
     try:
         sessions = await MediaManager.request_async()
         best_artist = ""
@@ -309,18 +301,28 @@ async def get_media_session_info():
         if not best_artist and not best_title:
             return None, None, None, None
 
-        # Read album art thumbnail from the session we chose
-        if best_props and best_props.thumbnail:
+        # Read album art thumbnail from the session we chose — only when the
+        # track changed (or an earlier read came back empty); otherwise reuse it.
+        track_key = _normalize_key(best_artist, best_title)
+        if track_key != _thumb_track_key:
+            _thumb_track_key = track_key
+            _thumb_url = None
+            _thumb_attempts = 0
+        if _thumb_url is None and _thumb_attempts < THUMBNAIL_MAX_ATTEMPTS and best_props and best_props.thumbnail:
+            _thumb_attempts += 1
             try:
                 stream = await best_props.thumbnail.open_read_async()
-                buf = Buffer(5 * 1024 * 1024)
+                size = min(int(stream.size or THUMBNAIL_MAX_BYTES), THUMBNAIL_MAX_BYTES)
+                buf = Buffer(size)
                 await stream.read_async(buf, buf.capacity, InputStreamOptions.READ_AHEAD)
                 raw = bytes(bytearray(buf))
                 stream.close()
                 if raw:
-                    best_thumb = "data:image/png;base64," + base64.b64encode(raw).decode()
+                    art_hash = await asyncio.to_thread(album_art_store.put, raw)
+                    _thumb_url = album_art_store.url_for(art_hash)
             except Exception:
                 pass
+        best_thumb = _thumb_url
 
         return best_artist, best_title, best_album, best_thumb
     except Exception as e:
@@ -388,9 +390,9 @@ def _normalize_key(artist, title):
     return f"{a}|||{t}"
 
 
-async def _handle_track_detected(artist, title, album, thumb_b64, source):
+async def _handle_track_detected(artist, title, album, album_art_url, source, musicbrainz_id=""):
     """Common handler for when a track is detected (from any source)."""
-    global _last_track_key, _last_track_seen_at, media_info, _profile_version, _detection_source
+    global _last_track_key, _last_track_seen_at, _profile_version, _detection_source
     global _extension_seen_at, _enrichment_track_key
 
     # Reject incomplete detections — need both artist and title
@@ -405,9 +407,11 @@ async def _handle_track_detected(artist, title, album, thumb_b64, source):
         if source == "extension":
             _extension_seen_at = now
         # Same track — but update album if it just became available
-        if album and not media_info.get("album"):
-            media_info = {**media_info, "album": album}
+        if album and not now_playing.get("album"):
+            now_playing.update({"album": album})
             print(f"  >> Album updated: {album}")
+        if album_art_url and not now_playing.get("albumArt"):
+            now_playing.update({"albumArt": album_art_url})
         return  # Same track, skip
 
     # --- Source priority gate ---
@@ -428,12 +432,17 @@ async def _handle_track_detected(artist, title, album, thumb_b64, source):
     _profile_version += 1
     _enrichment_track_key = track_key
     print(f"  >> Now playing: {artist} - {title} ({album}) [via {source}]")
+    if main_pipeline.recorder is not None:
+        main_pipeline.recorder.mark_track(artist, title, album, source, main_pipeline.seq,
+                                          main_pipeline.analyzer.timestamp)
 
     # Log to play history (returns row ID for enrichment backfill)
     _current_history_id = history_store.add(artist, title, album, source)
 
-    # Reset fingerprinter on track change
-    fingerprinter.reset()
+    # A track change is a song boundary for the fingerprint scheduler too
+    # (unless the fingerprint found it: its buffer already holds this song)
+    if source != "fingerprint":
+        fingerprint_scheduler.boundary("track")
 
     # Check for cached YouTube data
     cached_yt = media_cache.get_cached(artist, title)
@@ -451,11 +460,11 @@ async def _handle_track_detected(artist, title, album, thumb_b64, source):
         initial_yt_status = "searching"
 
     # IMMEDIATE broadcast — no blocking, user sees track info instantly
-    media_info = {
+    now_playing.replace({
         "artist": artist,
         "title": title,
         "album": album,
-        "albumArt": thumb_b64,
+        "albumArt": album_art_url,
         "artistImages": [],
         "dominantColors": [],
         "genres": [],
@@ -463,25 +472,26 @@ async def _handle_track_detected(artist, title, album, thumb_b64, source):
         "preferredVisualizer": "",
         "detectionSource": source,
         "_profileVersion": _profile_version,
-        "_historyVersion": media_info.get("_historyVersion", 0) + 1,
+        "_historyVersion": now_playing.get("_historyVersion", 0) + 1,
         "youtubeVideoId": cached_vid,
         "youtubeTitle": cached_yt.get("videoTitle", "") if cached_yt else "",
         "youtubeUrl": cached_yt.get("videoUrl", "") if cached_yt else "",
         "youtubeThumbnailUrl": f"/media/thumbnails/{cached_vid}.jpg" if cached_vid else "",
         "youtubeDuration": cached_yt.get("duration", 0) if cached_yt else 0,
         "youtubeSearchStatus": initial_yt_status,
-    }
+    })
 
     # Fire off all enrichment as non-blocking background tasks
-    asyncio.create_task(_enrich_track(artist, title, album, thumb_b64, _current_history_id))
+    asyncio.create_task(_enrich_track(artist, title, album, album_art_url, _current_history_id,
+                                      musicbrainz_id))
 
 
-async def _enrich_track(artist, title, album, thumb_b64, history_id=None):
+async def _enrich_track(artist, title, album, album_art_url, history_id=None, musicbrainz_id=""):
     """Background enrichment: images, genres, colors, YouTube. Non-blocking.
     YouTube search runs in parallel with artist enrichment for instant video playback.
-    Guards every update: if the user skipped to a new track, stop writing to media_info.
+    Guards every update: if the user skipped to a new track, stop writing to now_playing.
     Backfills enrichment data to play_history row via history_id."""
-    global media_info, _profile_version
+    global _profile_version
 
     my_key = _normalize_key(artist, title)
 
@@ -502,12 +512,11 @@ async def _enrich_track(artist, title, album, thumb_b64, history_id=None):
             print(f"  [STALE] Dropping image results for {artist} - {title}")
         else:
             _profile_version += 1
-            media_info = {
-                **media_info,
+            now_playing.update({
                 "artistImages": artist_imgs,
-                "albumArt": thumb_b64 or media_info.get("albumArt"),
+                "albumArt": album_art_url or now_playing.get("albumArt"),
                 "_profileVersion": _profile_version,
-            }
+            })
     except Exception as e:
         print(f"  Image fetch error: {e}")
 
@@ -518,7 +527,7 @@ async def _enrich_track(artist, title, album, thumb_b64, history_id=None):
             if mb_album and not _stale():
                 album = mb_album
                 _profile_version += 1
-                media_info = {**media_info, "album": album, "_profileVersion": _profile_version}
+                now_playing.update({"album": album, "_profileVersion": _profile_version})
                 print(f"  Album (MusicBrainz): {album}")
         except Exception as e:
             print(f"  Album lookup error: {e}")
@@ -531,18 +540,17 @@ async def _enrich_track(artist, title, album, thumb_b64, history_id=None):
             )
             if title:
                 await asyncio.to_thread(
-                    artist_store.update_song, artist, title, album
+                    artist_store.update_song, artist, title, album, musicbrainz_id
                 )
             if not _stale():
                 _profile_version += 1
-                media_info = {
-                    **media_info,
+                now_playing.update({
                     "dominantColors": profile.get("dominantColors", []),
                     "genres": profile.get("genres", []),
                     "moodTags": profile.get("moodTags", []),
                     "preferredVisualizer": profile.get("preferredVisualizer", ""),
                     "_profileVersion": _profile_version,
-                }
+                })
                 print(f"  Genres: {profile.get('genres', [])}")
                 print(f"  Colors: {len(profile.get('dominantColors', []))} extracted")
                 print(f"  Images: {len(artist_imgs)} found")
@@ -557,17 +565,17 @@ async def _enrich_track(artist, title, album, thumb_b64, history_id=None):
     # Backfill all enrichment data to play_history
     if history_id and not _stale():
         try:
-            yt_vid = media_info.get("youtubeVideoId", "")
+            media = now_playing.snapshot
             history_store.update(
                 history_id,
-                genres=media_info.get("genres", []),
-                dominant_colors=media_info.get("dominantColors", []),
-                artist_images=media_info.get("artistImages", []),
-                youtube_video_id=yt_vid,
-                youtube_title=media_info.get("youtubeTitle", ""),
-                youtube_url=media_info.get("youtubeUrl", ""),
-                thumbnail_url=media_info.get("youtubeThumbnailUrl", ""),
-                album=media_info.get("album", "") or album,
+                genres=media.get("genres", []),
+                dominant_colors=media.get("dominantColors", []),
+                artist_images=media.get("artistImages", []),
+                youtube_video_id=media.get("youtubeVideoId", ""),
+                youtube_title=media.get("youtubeTitle", ""),
+                youtube_url=media.get("youtubeUrl", ""),
+                thumbnail_url=media.get("youtubeThumbnailUrl", ""),
+                album=media.get("album", "") or album,
             )
         except Exception as e:
             print(f"  History backfill error: {e}")
@@ -584,7 +592,7 @@ async def _mark_track_unplayable(artist, title, video_id):
     """Flip the currently-playing track to not_found if it matches.
     Called from HTTP thread via run_coroutine_threadsafe when the YouTube
     IFrame reports the cached videoId can't actually play."""
-    global media_info, _profile_version
+    global _profile_version
     if not (artist and title):
         return
     key = _normalize_key(artist, title)
@@ -592,14 +600,13 @@ async def _mark_track_unplayable(artist, title, video_id):
     # that already advanced are ignored.
     if key != _enrichment_track_key:
         return
-    cur_vid = media_info.get("youtubeVideoId", "")
+    cur_vid = now_playing.get("youtubeVideoId", "")
     # Only flip if the reported bad id matches what we were showing (or if no id
     # was reported — be defensive and flip anyway).
     if video_id and cur_vid and cur_vid != video_id:
         return
     _profile_version += 1
-    media_info = {
-        **media_info,
+    now_playing.update({
         "youtubeVideoId": "",
         "youtubeTitle": "",
         "youtubeUrl": "",
@@ -607,35 +614,34 @@ async def _mark_track_unplayable(artist, title, video_id):
         "youtubeDuration": 0,
         "youtubeSearchStatus": "not_found",
         "_profileVersion": _profile_version,
-    }
+    })
     print(f"  [YT] Marked unplayable: {artist} - {title} (video {video_id or 'unknown'})")
 
 
 def _set_yt_status(track_key, status):
-    """Update media_info.youtubeSearchStatus if the track is still current.
+    """Update now_playing youtubeSearchStatus if the track is still current.
     Returns True if the update was applied."""
-    global media_info, _profile_version
+    global _profile_version
     if _enrichment_track_key != track_key:
         return False
-    if media_info.get("youtubeSearchStatus") == status:
+    if now_playing.get("youtubeSearchStatus") == status:
         return False
     _profile_version += 1
-    media_info = {
-        **media_info,
+    now_playing.update({
         "youtubeSearchStatus": status,
         "_profileVersion": _profile_version,
-    }
+    })
     return True
 
 
 async def _fetch_youtube_data(artist, title, history_id=None, max_retries=2):
-    """Search YouTube and update media_info with video metadata.
+    """Search YouTube and update now_playing with video metadata.
     Retries on failure with a delay — aggressively tries to find a video.
     Emits youtubeSearchStatus transitions: searching → found | not_found.
     If the search drags past PROVISIONAL_NOT_FOUND_DELAY, provisionally flips to
     not_found so the frontend can switch to synthetic video; a later hit still
     flips back to found."""
-    global media_info, _profile_version
+    global _profile_version
     my_key = _normalize_key(artist, title)
 
     async def _provisional_flip():
@@ -643,12 +649,12 @@ async def _fetch_youtube_data(artist, title, history_id=None, max_retries=2):
             await asyncio.sleep(PROVISIONAL_NOT_FOUND_DELAY)
         except asyncio.CancelledError:
             return
-        if _enrichment_track_key == my_key and media_info.get("youtubeSearchStatus") == "searching":
+        if _enrichment_track_key == my_key and now_playing.get("youtubeSearchStatus") == "searching":
             print(f"  [YT] Search still running after {PROVISIONAL_NOT_FOUND_DELAY}s — provisionally flipping to not_found")
             _set_yt_status(my_key, "not_found")
 
     # Skip the watchdog if we already know the answer (cached hit or cached miss).
-    current_status = media_info.get("youtubeSearchStatus", "searching")
+    current_status = now_playing.get("youtubeSearchStatus", "searching")
     flip_task = asyncio.create_task(_provisional_flip()) if current_status == "searching" else None
 
     try:
@@ -661,8 +667,7 @@ async def _fetch_youtube_data(artist, title, history_id=None, max_retries=2):
                 if result and _enrichment_track_key == my_key:
                     video_id = result.get("videoId", "")
                     _profile_version += 1
-                    media_info = {
-                        **media_info,
+                    now_playing.update({
                         "youtubeVideoId": video_id,
                         "youtubeTitle": result.get("videoTitle", ""),
                         "youtubeUrl": result.get("videoUrl", ""),
@@ -670,7 +675,7 @@ async def _fetch_youtube_data(artist, title, history_id=None, max_retries=2):
                         "youtubeDuration": result.get("duration", 0),
                         "youtubeSearchStatus": "found",
                         "_profileVersion": _profile_version,
-                    }
+                    })
                     # Backfill YouTube data to history
                     if history_id:
                         try:
@@ -717,13 +722,13 @@ async def media_poll_loop():
         detected = False
 
         # --- Source 1: Windows Media Session API ---
-        artist, title, album, thumb_b64 = await get_media_session_info()
+        artist, title, album, album_art_url = await get_media_session_info()
 
         if _poll_count <= 3 or _poll_count % 10 == 0:
             print(f"[poll #{_poll_count}] Media session: artist='{artist}' title='{title}' album='{album}'")
 
         if artist is not None and (artist or title):
-            await _handle_track_detected(artist, title, album, thumb_b64, "media_session")
+            detection_bus.publish(artist, title, album, album_art_url, "media_session")
             detected = True
 
         # --- Source 2: Chrome window title scraper (fallback) ---
@@ -732,172 +737,135 @@ async def media_poll_loop():
             if _poll_count <= 3 or _poll_count % 10 == 0:
                 print(f"[poll #{_poll_count}] Chrome titles: artist='{chrome_artist}' title='{chrome_title}'")
             if chrome_artist or chrome_title:
-                await _handle_track_detected(
-                    chrome_artist or "", chrome_title or "", "", None, "chrome_tab"
-                )
+                detection_bus.publish(chrome_artist or "", chrome_title or "", "", None, "chrome_tab")
 
         await asyncio.sleep(MEDIA_POLL_INTERVAL)
 
 
 # ---------- Audio capture ----------
 
-connected_clients = set()
-latest_frame = None
-running_max = 1.0
-
+pipelines = {}  # channel name -> AudioPipeline; DEFAULT_CHANNEL is the --source one
+main_pipeline = None  # AudioPipeline for --source, built in main()
+ingest_sources = {}  # channel name -> NetworkSource, for channels fed through /ingest
 
-async def audio_capture_loop():
-    """Continuously capture system audio via WASAPI loopback and compute FFT."""
-    global latest_frame, running_max
 
-    speaker = sc.default_speaker()
-    mic = sc.get_microphone(id=str(speaker.id), include_loopback=True)
+def _all_sessions():
+    """Every connected ClientSession. Event loop only: handler() adds and removes them."""
+    return [s for pipeline in pipelines.values() for s in pipeline.clients.values()]
 
-    print(f"Capturing audio from: {speaker.name}")
-    print(f"Sample rate: {SAMPLE_RATE}, Block size: {BLOCK_SIZE}")
-
-    with mic.recorder(samplerate=SAMPLE_RATE, blocksize=BLOCK_SIZE) as rec:
-        while True:
-            data = await asyncio.to_thread(rec.record, BLOCK_SIZE)
 
-            mono = data.mean(axis=1)
-            fingerprinter.feed(mono)
-            fft_raw = np.abs(np.fft.rfft(mono))
-            fft_binned = log_bin(fft_raw, FFT_BINS)
+def _on_loop(fn, timeout=2.0):
+    """Call fn() on the event loop and return its result — for HTTP handlers
+    reading state (client dicts, stats) the loop mutates as it goes."""
+    async def call():
+        return fn()
+    return asyncio.run_coroutine_threadsafe(call(), MAIN_LOOP).result(timeout)
 
-            current_max = fft_binned.max()
-            if current_max > running_max:
-                running_max = current_max
-            else:
-                running_max = running_max * 0.995 + current_max * 0.005
 
-            if running_max > 0:
-                fft_normalized = (fft_binned / running_max).clip(0, 1)
-            else:
-                fft_normalized = np.zeros(FFT_BINS)
-
-            waveform = downsample(mono, WAVEFORM_POINTS)
-            peak = float(np.max(np.abs(mono)))
-
-            latest_frame = json.dumps({
-                "fft": np.round(fft_normalized, 4).tolist(),
-                "waveform": np.round(waveform, 4).tolist(),
-                "peak": round(peak, 4),
-                "media": media_info,
-            })
-
-            await asyncio.sleep(1 / FPS)
+def _channel_from_path(path):
+    """Channel named in the WebSocket URL (?channel=NAME), or None."""
+    channel = parse_qs(urlparse(path or "").query).get("channel")
+    return channel[0] if channel else None
 
 
 async def handler(websocket):
-    """Handle a new WebSocket client connection."""
-    connected_clients.add(websocket)
-    print(f"Client connected ({len(connected_clients)} total)")
+    """Handle a new WebSocket client connection.
+
+    The client listens to the channel named in its URL (?channel=NAME) or in
+    a hello/subscribe "channel" key, "main" by default. Capture agents
+    connect to /ingest instead (see network_ingest.py).
+    """
+    if urlparse(websocket.request.path).path == "/ingest":
+        await ingest_handler(websocket)
+        return
+    session = ClientSession(websocket, stream_options("legacy", bins=FFT_BINS, fields=LEGACY_FIELDS,
+                                                    points=WAVEFORM_POINTS, waveform="sample"))
+    name = _channel_from_path(websocket.request.path) or DEFAULT_CHANNEL
+    if name not in pipelines:
+        print(f"Client asked for unknown channel {name!r} — using {DEFAULT_CHANNEL!r}")
+        name = DEFAULT_CHANNEL
+    session.opts["channel"] = name
+    pipeline = pipelines[name]
+    pipeline.clients[websocket] = session
+    session.start()
+    print(f"Client connected to {name!r} ({len(_all_sessions())} total)")
     try:
-        async for _ in websocket:
-            pass
+        async for message in websocket:
+            current = session.opts
+            kind, opts = parse_client_message(message, current)
+            if not opts:
+                continue
+            if opts["channel"] not in pipelines:
+                print(f"  Unknown channel {opts['channel']!r} — staying on {pipeline.name!r}")
+                opts["channel"] = pipeline.name
+            elif opts["channel"] != pipeline.name:
+                del pipeline.clients[websocket]
+                pipeline = pipelines[opts["channel"]]
+                pipeline.clients[websocket] = session
+                session.last_seq = None  # seq numbers are per channel
+            # Negotiated clients get the media state as its own channel:
+            # a full snapshot on hello (or when media is first subscribed),
+            # then deltas from AudioPipeline.broadcast.
+            if "media" not in opts["fields"]:
+                opts["stateVersion"] = None
+            elif kind == "hello" or current.get("stateVersion") is None:
+                opts["stateVersion"] = now_playing.version
+                session.push_control(now_playing.snapshot_message())
+            else:
+                opts["stateVersion"] = current["stateVersion"]
+            session.opts = opts
+            print(f"  Client {kind} on {pipeline.name!r}: {opts['format']} frames ({opts['encoding']}), "
+                  f"{opts['bins']} {opts['bands']} bins, {opts['points']}-point {opts['waveformMode']} waveform, every {opts['fpsDivisor']} frame(s), "
+                  f"fields={','.join(opts['fields'])}")
     finally:
-        connected_clients.discard(websocket)
-        print(f"Client disconnected ({len(connected_clients)} total)")
+        pipeline.clients.pop(websocket, None)
+        await session.stop()
+        print(f"Client disconnected ({len(_all_sessions())} total)")
 
 
-async def broadcast_loop():
-    """Send the latest audio frame to all connected clients."""
-    while True:
-        if connected_clients:
-            frame = latest_frame
-            if not frame:
-                frame = json.dumps({
-                    "fft": [],
-                    "waveform": [],
-                    "peak": 0,
-                    "media": media_info,
-                })
-            broadcast(connected_clients, frame)
-        await asyncio.sleep(1 / FPS)
+async def ingest_handler(websocket):
+    """Stream a remote agent's PCM into the ingest channel its header names."""
+    header = await read_ingest_header(websocket, _channel_from_path(websocket.request.path))
+    if header is None:
+        return
+    name = header["channel"] or DEFAULT_CHANNEL
+    source = ingest_sources.get(name)
+    if source is None:
+        await websocket.close(1008, f"channel {name!r} does not take ingest")
+        return
+    print(f"Ingest agent connected to {name!r}: {header['sampleRate']} Hz, "
+          f"{header['channels']} ch, {header['format']}")
+    try:
+        await run_ingest(websocket, source, header)
+    finally:
+        print(f"Ingest agent left {name!r} ({source.dropped} samples dropped, "
+              f"{source.underruns} underruns so far)")
 
 
 async def fingerprint_poll_loop():
-    """Periodically attempt audio fingerprint identification as fallback."""
-    global media_info, _last_track_key, _profile_version, _detection_source
-
+    """Audio fingerprint identification as fallback, whenever the scheduler says
+    a lookup is due (see fingerprint_scheduler.py)."""
     while True:
-        await asyncio.sleep(3)
+        reason = await fingerprint_scheduler.wait_due()
 
         # Only fingerprint if media session didn't identify the track
-        if media_info.get("artist") and _detection_source == "media_session":
-            continue
-
-        if not fingerprinter.can_query():
+        if now_playing.get("artist") and _detection_source == "media_session":
+            fingerprint_scheduler.defer()
             continue
 
-        result = await asyncio.to_thread(fingerprinter.identify)
+        result = await fingerprint_scheduler.lookup(reason)
         if result is None:
             continue
 
         fp_artist, fp_title, fp_album, fp_mbid = result
-        if not fp_artist and not fp_title:
-            continue
-
-        track_key = f"{fp_artist}|||{fp_title}"
-        if track_key == _last_track_key:
-            continue
-
-        _last_track_key = track_key
-        _detection_source = "fingerprint"
-        _profile_version += 1
-        print(f"Fingerprint identified: {fp_artist} - {fp_title}")
-
-        fp_history_id = history_store.add(fp_artist, fp_title, fp_album, "fingerprint")
-
-        artist_imgs = await asyncio.to_thread(fetch_artist_images, fp_artist)
-        profile = await enrich_artist_profile(artist_store, fp_artist, artist_imgs)
-
-        if fp_title:
-            await asyncio.to_thread(
-                artist_store.update_song, fp_artist, fp_title, fp_album, fp_mbid
-            )
-
-        _profile_version += 1
-        media_info = {
-            "artist": fp_artist,
-            "title": fp_title,
-            "album": fp_album,
-            "albumArt": media_info.get("albumArt"),
-            "artistImages": artist_imgs,
-            "dominantColors": profile.get("dominantColors", []),
-            "genres": profile.get("genres", []),
-            "moodTags": profile.get("moodTags", []),
-            "preferredVisualizer": profile.get("preferredVisualizer", ""),
-            "detectionSource": "fingerprint",
-            "_profileVersion": _profile_version,
-            "_historyVersion": media_info.get("_historyVersion", 0) + 1,
-            "youtubeVideoId": "",
-            "youtubeTitle": "",
-            "youtubeUrl": "",
-            "youtubeThumbnailUrl": "",
-            "youtubeDuration": 0,
-        }
-
-        # Backfill enrichment to history
-        try:
-            history_store.update(
-                fp_history_id,
-                genres=profile.get("genres", []),
-                dominant_colors=profile.get("dominantColors", []),
-                artist_images=artist_imgs,
-            )
-        except Exception as e:
-            print(f"  Fingerprint history backfill error: {e}")
-
-        if fp_artist and fp_title:
-            asyncio.create_task(_fetch_youtube_data(fp_artist, fp_title, fp_history_id))
+        if fp_artist or fp_title:
+            # Through the bus like every other source, so it meets the priority gate
+            detection_bus.publish(fp_artist, fp_title, fp_album, None, "fingerprint",
+                                  musicbrainz_id=fp_mbid)
 
 
 # ---------- HTTP server for Chrome extension ----------
 
-_extension_track = None  # latest track from extension
-
 
 class TrackHandler(BaseHTTPRequestHandler):
 
@@ -909,10 +877,69 @@ class TrackHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def _raw_json_response(self, body, status=200):
+        """Send an already-encoded JSON body."""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
     def _read_body(self):
         length = int(self.headers.get("Content-Length", 0))
         return json.loads(self.rfile.read(length)) if length else {}
 
+    def _pipeline(self):
+        """AudioPipeline for the request's ?channel= (default "main"); 404s if unknown."""
+        name = _channel_from_path(self.path) or DEFAULT_CHANNEL
+        pipeline = pipelines.get(name)
+        if pipeline is None:
+            self._json_response({"error": f"unknown channel: {name}"}, 404)
+        return pipeline
+
+    def _spectrogram_response(self):
+        """Rows of the spectrogram history as raw uint8, oldest first.
+
+        Query: channel, from/to (epoch seconds) or seconds (the last N), and
+        decimate (max over every N rows). Shape and time range come back as headers.
+        """
+        pipeline = self._pipeline()
+        if pipeline is None:
+            return
+        history = pipeline.history
+        if history is None:
+            self._json_response({"error": "spectrogram history is disabled"}, 404)
+            return
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            start = float(query["from"][0]) if "from" in query else None
+            end = float(query["to"][0]) if "to" in query else None
+            if "seconds" in query and start is None:
+                start = time.time() - float(query["seconds"][0])
+            decimate = min(max(int(query.get("decimate", ["1"])[0]), 1), history.rows)
+        except ValueError:
+            self._json_response({"error": "bad query"}, 400)
+            return
+        lo, hi = history.select(start, end)
+        chunks = history.read(lo, hi, decimate)
+        rows = sum(len(chunk) for chunk in chunks)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(rows * history.bins))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "X-Spectrogram-Bins, X-Spectrogram-Rows, "
+                         "X-Spectrogram-Decimate, X-Spectrogram-Start, X-Spectrogram-End")
+        self.send_header("X-Spectrogram-Bins", str(history.bins))
+        self.send_header("X-Spectrogram-Rows", str(rows))
+        self.send_header("X-Spectrogram-Decimate", str(decimate))
+        if rows:
+            self.send_header("X-Spectrogram-Start", repr(history.time_of(lo)))
+            self.send_header("X-Spectrogram-End", repr(history.time_of(hi - 1)))
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(memoryview(chunk).cast("B"))
+
     def do_GET(self):
         if self.path == "/history":
             try:
@@ -953,7 +980,23 @@ class TrackHandler(BaseHTTPRequestHandler):
             self._json_response(enriched)
 
         elif self.path == "/now-playing":
-            self._json_response({"media": media_info})
+            self._raw_json_response(now_playing.http_body())
+
+        elif self.path.split("?")[0] == "/stream/stats":
+            pipeline = self._pipeline()
+            if pipeline is not None:
+                self._json_response(_on_loop(lambda: {
+                    **pipeline.stats(), "channels": list(pipelines),
+                    "fingerprint": {**fingerprinter.stats(),
+                                    "scheduler": fingerprint_scheduler.stats()},
+                    "detection": detection_bus.stats()}))
+
+        elif self.path.split("?")[0] == "/stream/spectrogram":
+            self._spectrogram_response()
+
+        elif self.path == "/stream/clients":
+            clients = _on_loop(lambda: [s.stats() for s in _all_sessions()])
+            self._json_response({"clients": clients})
 
         elif self.path == "/library":
             tracks = media_cache.get_all_cached()
@@ -995,6 +1038,28 @@ class TrackHandler(BaseHTTPRequestHandler):
             state = player_state_store.load()
             self._json_response(state or {})
 
+        elif self.path.startswith("/media/albumart/"):
+            art = album_art_store.get(self.path[len("/media/albumart/"):])
+            if art:
+                etag = f'"{self.path.rsplit("/", 1)[1]}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                data, ct = art
+                self.send_response(200)
+                self.send_header("Content-Type", ct)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self.send_response(404)
+                self.end_headers()
+
         elif self.path.startswith("/media/"):
             relative = self.path[len("/media/"):]
             file_path = Path(__file__).parent / "data" / "media_cache" / relative
@@ -1041,19 +1106,14 @@ class TrackHandler(BaseHTTPRequestHandler):
             self.end_headers()
 
     def do_POST(self):
-        global _extension_track
         if self.path == "/track":
             body = self._read_body()
             artist = (body.get("artist") or "").strip()
             title = (body.get("title") or "").strip()
             album = (body.get("album") or "").strip()
             if artist and title:
-                # Preserve album from prior send if this one is empty (DOM poll has no album)
-                if not album and _extension_track and _extension_track.get("album"):
-                    prev = _extension_track
-                    if prev["artist"] == artist and prev["title"] == title:
-                        album = prev["album"]
-                _extension_track = {"artist": artist, "title": title, "album": album}
+                # Straight onto the loop; an album-less repeat (DOM poll) keeps the known album
+                detection_bus.publish(artist, title, album, None, "extension")
                 print(f"  [EXT] Received: {artist} - {title}")
             self.send_response(200)
             self.send_header("Access-Control-Allow-Origin", "*")
@@ -1186,55 +1246,247 @@ def start_http_server():
     server.serve_forever()
 
 
-async def extension_poll_loop():
-    """Check for track info from the Chrome extension."""
-    global _extension_track
-    while True:
-        track = _extension_track
-        if track:
-            _extension_track = None
-            await _handle_track_detected(
-                track["artist"], track["title"], track["album"], None, "extension"
-            )
-        await asyncio.sleep(EXTENSION_POLL_INTERVAL)
+def _make_history(args, path=None):
+    """SpectrogramHistory sized for --history-seconds, or None when it's off."""
+    if args.history_seconds <= 0:
+        return None
+    frame_rate = BROADCAST_FPS or SAMPLE_RATE / BLOCK_SIZE
+    if args.replay:
+        frame_rate *= args.replay_speed
+    return SpectrogramHistory(int(args.history_seconds * frame_rate), FFT_BINS, path)
 
 
-async def main():
-    global MAIN_LOOP
+async def main(args):
+    # Everything is built here, not at import: a spawned DSP child re-imports
+    # this module (as __mp_main__) and must not repeat any of it.
+    global MAIN_LOOP, KEEPALIVE_INTERVAL, BROADCAST_FPS, ANALYSIS_MODE, HOP_SIZE, STFT_WINDOW
+    global now_playing, main_pipeline
     MAIN_LOOP = asyncio.get_running_loop()
+    init_services(args.fingerprint_max_ber)
+    now_playing = NowPlayingState(NOW_PLAYING_FIELDS)
+    detection_bus.attach(MAIN_LOOP)
+    KEEPALIVE_INTERVAL = args.keepalive
+    BROADCAST_FPS = args.broadcast_fps
+    ANALYSIS_MODE, HOP_SIZE, STFT_WINDOW = args.analysis, args.hop, args.window
+
+    pipeline = main_pipeline = AudioPipeline(
+        DEFAULT_CHANNEL,
+        FrameAnalyzer(BLOCK_SIZE, WAVEFORM_POINTS, FFT_BINS, sample_rate=SAMPLE_RATE),
+        BeatTracker(SAMPLE_RATE / BLOCK_SIZE, BLOCK_SIZE // 2 + 1),
+        now_playing, FFT_BINS, WAVEFORM_POINTS, BROADCAST_FPS, KEEPALIVE_INTERVAL,
+        on_block=fingerprint_scheduler.feed,
+    )
+    if ANALYSIS_MODE == "stft":
+        stft = StftPlan(BLOCK_SIZE, HOP_SIZE, STFT_WINDOW,
+                        max_frames=2 * max(1, BLOCK_SIZE // HOP_SIZE))
+        pipeline.analyzer = FrameAnalyzer(BLOCK_SIZE, WAVEFORM_POINTS, FFT_BINS, stft=stft,
+                                          sample_rate=SAMPLE_RATE)
+        pipeline.beat_tracker = BeatTracker(SAMPLE_RATE / HOP_SIZE, stft.spectrum_size,
+                                            max_frames=stft.max_frames)
+    print(f"Sample rate: {SAMPLE_RATE}, Block size: {BLOCK_SIZE}")
+    if ANALYSIS_MODE == "stft":
+        print(f"STFT analysis: {STFT_WINDOW} window, hop {HOP_SIZE} "
+              f"({SAMPLE_RATE / HOP_SIZE:.1f} frames/s)")
+    if args.replay:
+        recording = FrameRecording(args.replay)
+        pipeline.analyzer = ReplayAnalyzer(recording)
+        print(f"Replaying {recording.path}: {len(recording)} frames, {recording.duration:.1f}s "
+              f"at {args.replay_speed:g}x, {len(recording.tracks)} track change(s)")
+        producer = pipeline.run_replay(recording, args.replay_speed, lambda track: detection_bus.publish(
+            track["artist"], track["title"], track["album"], None, "replay"))
+    elif args.dsp_process:
+        # Capture and FFT happen in the child; this analyzer only bins its spectra
+        dsp = DspProcess(args.source, SAMPLE_RATE, BLOCK_SIZE, ANALYSIS_MODE, HOP_SIZE, STFT_WINDOW)
+        pipeline.analyzer = FrameAnalyzer(BLOCK_SIZE, WAVEFORM_POINTS, FFT_BINS,
+                                          sample_rate=SAMPLE_RATE)
+        pipeline.beat_tracker = dsp.remote_beat
+        producer = pipeline.run_dsp_process(dsp)
+        print("Capture + analysis run in a child process")
+    else:
+        source = create_source(args.source, SAMPLE_RATE, BLOCK_SIZE)
+        if isinstance(source, NetworkSource):
+            ingest_sources[DEFAULT_CHANNEL] = pipeline.ingest = source
+        producer = pipeline.run_capture(source)
+    if args.record:
+        pipeline.recorder = FrameRecorder(args.record, FFT_BINS, WAVEFORM_POINTS, "minmax",
+                                          SAMPLE_RATE, BLOCK_SIZE)
+        print(f"Recording frames to {pipeline.recorder.path}")
+    pipeline.history = _make_history(args, args.history_file)
+    if pipeline.history is not None:
+        print(f"Spectrogram history: {args.history_seconds:g}s, {pipeline.history.rows} rows, "
+              f"{pipeline.history.nbytes / 1024:.0f} KiB{' (mmap)' if args.history_file else ''}")
+    pipelines[DEFAULT_CHANNEL] = pipeline
+    producers = [producer]
+
+    # Extra channels: one DSP child process each, so they use their own cores.
+    # Ingest channels are fed by the WebSocket server, so they capture in-process.
+    for name, spec in args.channel:
+        channel = AudioPipeline(
+            name, FrameAnalyzer(BLOCK_SIZE, WAVEFORM_POINTS, FFT_BINS, sample_rate=SAMPLE_RATE),
+            None, now_playing, FFT_BINS, WAVEFORM_POINTS, BROADCAST_FPS,
+            KEEPALIVE_INTERVAL, history=_make_history(args),
+        )
+        if _is_ingest(spec):
+            source = create_source(spec, SAMPLE_RATE, BLOCK_SIZE)
+            ingest_sources[name] = channel.ingest = source
+            channel.beat_tracker = BeatTracker(SAMPLE_RATE / BLOCK_SIZE, BLOCK_SIZE // 2 + 1)
+            producers.append(channel.run_capture(source))
+            print(f"Channel {name!r}: ingest (ws://{args.host}:8765/ingest?channel={name})")
+        else:
+            dsp = DspProcess(spec, SAMPLE_RATE, BLOCK_SIZE, ANALYSIS_MODE, HOP_SIZE, STFT_WINDOW)
+            channel.beat_tracker = dsp.remote_beat
+            producers.append(channel.run_dsp_process(dsp))
+            print(f"Channel {name!r}: {spec} (own DSP process, ws://localhost:8765/?channel={name})")
+        pipelines[name] = channel
+
     print("Starting VisualAudioScraper...")
     print("Frontend: http://localhost:5173  (Vite)")
-    print("WebSocket: ws://localhost:8765")
+    print(f"WebSocket: ws://{args.host}:8765")
+    if DEFAULT_CHANNEL in ingest_sources:
+        print(f"Audio ingest: ws://{args.host}:8765/ingest")
     if fingerprinter.enabled:
         print("Audio fingerprinting: enabled")
+        if fingerprinter.index is not None:
+            print(f"Local fingerprint index: {fingerprinter.index.count} fingerprints, "
+                  f"max BER {fingerprinter.index.max_ber:g}")
     else:
         print("Audio fingerprinting: disabled (no ACOUSTID_API_KEY)")
 
     # Start HTTP server in a background thread
     threading.Thread(target=start_http_server, daemon=True).start()
 
-    async with serve(handler, "localhost", 8765):
-        print("WebSocket ready — waiting for Vite...")
-        import webbrowser, socket
-        # Wait for Vite dev server to be listening before opening browser
-        for _ in range(60):
-            try:
-                with socket.create_connection(("localhost", 5173), timeout=0.5):
-                    break
-            except OSError:
-                await asyncio.sleep(0.5)
-        print("Opening browser at http://localhost:5173")
-        webbrowser.open("http://localhost:5173")
-
-        await asyncio.gather(
-            audio_capture_loop(),
-            broadcast_loop(),
-            media_poll_loop(),
-            extension_poll_loop(),
+    async with serve(handler, args.host, 8765):
+        if args.headless:
+            print("Headless mode — not waiting for Vite or opening a browser")
+        else:
+            print("WebSocket ready — waiting for Vite...")
+            import webbrowser, socket
+            # Wait for Vite dev server to be listening before opening browser
+            for _ in range(60):
+                try:
+                    with socket.create_connection(("localhost", 5173), timeout=0.5):
+                        break
+                except OSError:
+                    await asyncio.sleep(0.5)
+            print("Opening browser at http://localhost:5173")
+            webbrowser.open("http://localhost:5173")
+
+        loops = [
+            *producers,
+            *(p.broadcast() for p in pipelines.values()),
+            detection_bus.run(_handle_track_detected),
             fingerprint_poll_loop(),
-            asyncio.Future(),
-        )
+        ]
+        # WinRT media session + Chrome window titles only exist on Windows
+        if sys.platform == "win32":
+            loops.append(media_poll_loop())
+        await asyncio.gather(*loops, asyncio.Future())
+
+
+def _is_ingest(spec):
+    return spec.partition(":")[0] == "ingest"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="JamScrapper audio + media backend")
+    parser.add_argument(
+        "--source", default="loopback",
+        help="audio input: loopback | file:<path.wav|.npy> | "
+             "synthetic[:tones=440+880,amp=0.3,noise=0.05,seed=0] | "
+             "ingest[:latency=80,max=250] (PCM from agents on ws://...:8765/ingest) "
+             "(default: loopback)",
+    )
+    parser.add_argument(
+        "--host", default="localhost",
+        help="interface the WebSocket server (clients and /ingest agents) listens on; "
+             "0.0.0.0 to accept remote capture agents (default: localhost)",
+    )
+    parser.add_argument(
+        "--headless", action="store_true", default=sys.platform != "win32",
+        help="don't wait for Vite or open a browser (default off on Windows, on elsewhere)",
+    )
+    parser.add_argument(
+        "--keepalive", type=float, default=KEEPALIVE_INTERVAL,
+        help="seconds between re-sends of the last frame when no new audio arrives "
+             f"(default: {KEEPALIVE_INTERVAL})",
+    )
+    parser.add_argument(
+        "--analysis", choices=("block", "stft"), default=ANALYSIS_MODE,
+        help="block: one unwindowed FFT per captured block; stft: overlapping "
+             f"windowed frames every --hop samples (default: {ANALYSIS_MODE})",
+    )
+    parser.add_argument(
+        "--hop", type=int, default=HOP_SIZE,
+        help=f"STFT hop size in samples (default: {HOP_SIZE})",
+    )
+    parser.add_argument(
+        "--window", choices=sorted(WINDOWS), default=STFT_WINDOW,
+        help=f"STFT analysis window (default: {STFT_WINDOW})",
+    )
+    parser.add_argument(
+        "--broadcast-fps", type=float, default=BROADCAST_FPS,
+        help="cap on frames/s sent to clients, independent of the analysis rate "
+             "(default: 0 = one per captured block)",
+    )
+    parser.add_argument(
+        "--history-seconds", type=float, default=HISTORY_SECONDS,
+        help="seconds of spectrogram history served at /stream/spectrogram, 0 = off "
+             f"(default: {HISTORY_SECONDS:g})",
+    )
+    parser.add_argument(
+        "--history-file", metavar="PATH",
+        help="back the spectrogram history with a memory-mapped file instead of RAM",
+    )
+    parser.add_argument(
+        "--dsp-process", action="store_true",
+        help="run capture, FFT and beat tracking in a separate process, exchanging "
+             "frames through shared memory (isolates them from the event loop)",
+    )
+    parser.add_argument(
+        "--channel", action="append", default=[], metavar="NAME=SPEC",
+        help="extra named audio channel with its own source (same syntax as --source), "
+             "analysed in its own process; clients pick it with ws://...:8765/?channel=NAME. "
+             "Repeatable",
+    )
+    parser.add_argument(
+        "--fingerprint-max-ber", type=float, default=DEFAULT_MAX_BER,
+        help="bit error rate up to which a fingerprint matches a locally indexed one "
+             f"before AcoustID is asked; 0 = always ask AcoustID (default: {DEFAULT_MAX_BER:g})",
+    )
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument(
+        "--record", metavar="DIR",
+        help="append every analysis frame (and track changes) to a recording in DIR",
+    )
+    recording.add_argument(
+        "--replay", metavar="DIR",
+        help="stream a --record recording instead of capturing audio",
+    )
+    parser.add_argument(
+        "--replay-speed", type=float, default=1.0,
+        help="replay speed multiplier, e.g. 4 for a fast load test (default: 1.0)",
+    )
+    args = parser.parse_args(argv)
+    if not 0 <= args.fingerprint_max_ber < 0.5:
+        parser.error("--fingerprint-max-ber must be in [0, 0.5)")
+    if args.replay_speed <= 0:
+        parser.error("--replay-speed must be positive")
+    if args.history_file and args.history_seconds <= 0:
+        parser.error("--history-file needs --history-seconds")
+    if args.dsp_process and _is_ingest(args.source):
+        parser.error("--dsp-process can't capture an ingest source (agents connect to this process)")
+    channels = []
+    for item in args.channel:
+        name, sep, spec = item.partition("=")
+        if not sep or not name or not spec:
+            parser.error(f"--channel expects NAME=SPEC, got {item!r}")
+        if name == DEFAULT_CHANNEL or name in dict(channels):
+            parser.error(f"duplicate channel name: {name!r}")
+        channels.append((name, spec))
+    args.channel = channels
+    return args
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    multiprocessing.freeze_support()  # --dsp-process in PyInstaller builds
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,128 @@
+"""Rolling history of binned spectra for scrolling spectrograms and late joiners.
+
+A fixed (rows, bins) uint8 ring — in memory, or an np.memmap file to keep
+it out of the process heap — plus a float64 ring of row timestamps. The
+capture loop writes one row per broadcast frame; memory is rows * bins
+bytes (+8 bytes per row for the timestamp), set once at startup.
+
+Reads never copy the ring: read() hands back up to two contiguous row views
+(one either side of the wrap point), or, when decimating, max-pools groups
+of rows straight into a buffer the size of the response.
+
+The HTTP thread reads while the event loop writes. Reads skip the oldest
+GUARD_ROWS rows so a response in flight isn't overwritten under it unless
+the client is that many frames slow.
+"""
+
+import numpy as np
+
+GUARD_ROWS = 32  # ~1.5 s at 21.5 frames/s
+
+
+class SpectrogramHistory:
+    """Circular uint8 spectrogram: one row of `bins` values per frame."""
+
+    def __init__(self, rows, bins, path=None):
+        if rows <= GUARD_ROWS:
+            raise ValueError(f"history needs more than {GUARD_ROWS} rows, got {rows}")
+        self.rows = rows
+        self.bins = bins
+        self.path = path
+        if path is None:
+            self.ring = np.zeros((rows, bins), dtype=np.uint8)
+        else:
+            self.ring = np.memmap(path, dtype=np.uint8, mode="w+", shape=(rows, bins))
+        self.times = np.zeros(rows, dtype=np.float64)
+        self.written = 0  # rows ever written; the next row goes to written % rows
+        self._scratch = np.zeros(bins, dtype=np.float32)
+
+    @property
+    def nbytes(self):
+        return self.ring.nbytes + self.times.nbytes
+
+    def write(self, spectrum, timestamp):
+        """Append one normalized (0..1) spectrum row."""
+        row = self.written % self.rows
+        s = self._scratch
+        np.multiply(spectrum, 255, out=s)
+        np.clip(s, 0, 255, out=s)
+        np.rint(s, out=s)
+        self.ring[row] = s
+        self.times[row] = timestamp
+        self.written += 1
+
+    def available(self):
+        """Logical [first, end) row range that is safe to read."""
+        end = self.written
+        return max(0, end - self.rows + GUARD_ROWS), end
+
+    def _time(self, index):
+        return self.times[index % self.rows]
+
+    def _search(self, t, first, end):
+        """First logical index in [first, end) whose timestamp is >= t."""
+        lo, hi = first, end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._time(mid) < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def select(self, start=None, end=None):
+        """Logical [lo, hi) of rows with start <= timestamp <= end (None = open)."""
+        first, stop = self.available()
+        lo = first if start is None else self._search(start, first, stop)
+        hi = stop if end is None else self._search(np.nextafter(end, np.inf), first, stop)
+        return lo, max(lo, hi)
+
+    def _segments(self, lo, hi):
+        """Split logical [lo, hi) into (logical start, physical row slice) runs."""
+        while lo < hi:
+            phys = lo % self.rows
+            n = min(hi - lo, self.rows - phys)
+            yield lo, self.ring[phys:phys + n]
+            lo += n
+
+    def read(self, lo, hi, decimate=1):
+        """Rows [lo, hi) as a list of uint8 (n, bins) arrays, oldest first.
+
+        decimate=1 returns views into the ring. decimate=N returns one array
+        holding the max over each group of N rows (the last may be shorter).
+        """
+        if decimate <= 1:
+            return [view for _, view in self._segments(lo, hi)]
+        groups = -(-(hi - lo) // decimate)
+        out = np.empty((groups, self.bins), dtype=np.uint8)
+        filled = -1  # last group index written
+        for start, view in self._segments(lo, hi):
+            g0 = (start - lo) // decimate
+            g1 = (start + len(view) - 1 - lo) // decimate
+            edges = np.maximum(np.arange(g0, g1 + 1) * decimate + lo, start) - start
+            pooled = np.maximum.reduceat(view, edges, axis=0)
+            if g0 == filled:
+                # A group straddling the wrap point: merge both halves
+                np.maximum(out[g0], pooled[0], out=out[g0])
+                out[g0 + 1:g1 + 1] = pooled[1:]
+            else:
+                out[g0:g1 + 1] = pooled
+            filled = g1
+        return [out]
+
+    def time_of(self, index):
+        """Timestamp of logical row `index`."""
+        return float(self._time(index))
+
+    def stats(self):
+        first, end = self.available()
+        return {
+            "rows": self.rows,
+            "bins": self.bins,
+            "written": self.written,
+            "available": end - first,
+            "oldest": self.time_of(first) if end > first else None,
+            "newest": self.time_of(end - 1) if end > first else None,
+            "bytes": self.nbytes,
+            "mmap": self.path is not None,
+        }
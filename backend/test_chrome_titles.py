@@ -2,6 +2,8 @@
 import ctypes
 import ctypes.wintypes
 
+from title_parser import parse_tab_title
+
 def get_chrome_window_titles():
     titles = []
     EnumWindows = ctypes.windll.user32.EnumWindows
@@ -32,34 +34,6 @@ def get_chrome_window_titles():
     EnumWindows(EnumWindowsProc(callback), 0)
     return titles
 
-STREAMING_SUFFIXES = [
-    " - Pandora", " | Pandora", " – Pandora", " — Pandora",
-    " - YouTube Music", " - YouTube", " - SoundCloud",
-    " - Spotify", " | Spotify", " - Tidal", " - Deezer",
-    " - Amazon Music", " - Apple Music", " - Qobuz",
-]
-TITLE_SPLITTERS = [" - ", " – ", " — ", " | ", " · "]
-
-def parse_tab_title(title):
-    if not title:
-        return "", ""
-    clean = title.strip()
-    for suffix in sorted(STREAMING_SUFFIXES, key=len, reverse=True):
-        if clean.endswith(suffix):
-            clean = clean[: -len(suffix)].strip()
-            break
-    if not clean:
-        return "", ""
-    non_song = ["my collection", "stations", "browse", "search", "settings", "home", "library", "queue", "playlist"]
-    if any(ns in clean.lower() for ns in non_song):
-        return "", ""
-    for sep in TITLE_SPLITTERS:
-        if sep in clean:
-            parts = [p.strip() for p in clean.split(sep, 1)]
-            if len(parts) >= 2 and parts[0] and parts[1]:
-                return parts[1], parts[0]  # artist, title
-    return "", clean
-
 print("Chrome window titles found:")
 print("-" * 60)
 titles = get_chrome_window_titles()
@@ -67,7 +41,7 @@ if not titles:
     print("  (none found)")
 for t in titles:
     print(f"  Raw: '{t}'")
-    artist, song = parse_tab_title(t)
+    artist, song = parse_tab_title(t, require_service=True)
     if artist or song:
         print(f"    -> Artist: '{artist}', Song: '{song}'")
     else:
@@ -0,0 +1,128 @@
+"""Headless test: AudioFingerprinter.identify() end to end with a stand-in lookup.
+
+pyacoustid / libchromaprint are replaced by fakes with their real call
+signatures (acoustid.fingerprint reads pcmiter with next() and returns only
+the fingerprint), so this runs without either installed:
+
+    python test_fingerprinter.py      (or: python -m pytest test_fingerprinter.py)
+"""
+import sqlite3
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import fingerprinter
+from db import init_db
+from fingerprint_index import FingerprintIndex
+from fingerprinter import AudioFingerprinter
+
+
+class FakeAcoustID(types.SimpleNamespace):
+    """acoustid.fingerprint() as pyacoustid 1.3.1 has it."""
+
+    def __init__(self):
+        super().__init__(calls=[])
+
+    def fingerprint(self, samplerate, channels, pcmiter, maxlength=120):
+        pcm = bytes(next(pcmiter))
+        self.calls.append((samplerate, channels, len(pcm)))
+        return b"AQAAfake"
+
+
+class FakeChromaprint(types.SimpleNamespace):
+    """chromaprint.decode_fingerprint(): (signed sub-fingerprints, algorithm)."""
+
+    def __init__(self, items=160):
+        raw = np.random.default_rng(1).integers(0, 2**32, items, dtype=np.uint64)
+        super().__init__(raw=raw.astype(np.uint32).view(np.int32).tolist())
+
+    def decode_fingerprint(self, fingerprint):
+        return list(self.raw), 1
+
+
+class StandInLookup:
+    """lookup(fingerprint, duration) answering from a fixed list."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def __call__(self, fingerprint, duration):
+        self.calls.append((fingerprint, duration))
+        return self.answers
+
+
+def make_fingerprinter(lookup, index=None, seconds=5.0):
+    fp = AudioFingerprinter(api_key="test", sample_rate=44100, index=index, lookup=lookup)
+    fp.enabled = True  # pyacoustid itself is faked
+    rng = np.random.default_rng(0)
+    for _ in range(int(seconds * 44100 / 2048)):
+        fp.feed((rng.standard_normal(2048) * 0.1).astype(np.float32))
+    return fp
+
+
+class FakePyacoustidTestCase(unittest.TestCase):
+    """Runs with the fake pyacoustid and libchromaprint patched in."""
+
+    def setUp(self):
+        self.acoustid = FakeAcoustID()
+        self.chromaprint = FakeChromaprint()
+        patches = [mock.patch.object(fingerprinter, "acoustid", self.acoustid, create=True),
+                   mock.patch.object(fingerprinter, "chromaprint", self.chromaprint, create=True),
+                   mock.patch.object(fingerprinter, "CHROMAPRINT_AVAILABLE", True)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+
+class ChromaprintPathTest(FakePyacoustidTestCase):
+
+    def test_fingerprint_returns_duration_and_fingerprint(self):
+        fp = make_fingerprinter(StandInLookup([]))
+        audio = fp._get_buffer_snapshot()
+        duration, fingerprint = fp._fingerprint(audio)
+        self.assertEqual(fingerprint, b"AQAAfake")
+        self.assertAlmostEqual(duration, len(audio) / fp.rate)
+        self.assertEqual(self.acoustid.calls, [(fp.rate, 1, 2 * len(audio))])
+
+    def test_identify_remote_hit(self):
+        lookup = StandInLookup([(0.9, "rec-1", "Roygbiv", "Boards of Canada")])
+        fp = make_fingerprinter(lookup)
+        self.assertEqual(fp.identify(), ("Boards of Canada", "Roygbiv", "", "rec-1"))
+        self.assertEqual(len(lookup.calls), 1)
+        self.assertEqual(lookup.calls[0][0], b"AQAAfake")
+
+
+class LocalIndexTest(FakePyacoustidTestCase):
+
+    def make_index(self):
+        conn = sqlite3.connect(":memory:")
+        self.addCleanup(conn.close)
+        init_db(conn)
+        return FingerprintIndex(conn)
+
+    def test_repeat_is_answered_locally(self):
+        lookup = StandInLookup([(0.9, "rec-1", "Roygbiv", "Boards of Canada")])
+        fp = make_fingerprinter(lookup, self.make_index())
+        first = fp.identify()
+        self.assertEqual(first, ("Boards of Canada", "Roygbiv", "", "rec-1"))
+        self.assertEqual((fp.remote_lookups, fp.index.count), (1, 1))
+
+        self.assertEqual(fp.identify(), first)
+        self.assertEqual(len(lookup.calls), 1)
+        self.assertEqual(fp.local_hits, 1)
+        self.assertEqual(fp.index.last_ber, 0.0)
+
+    def test_remote_miss_is_not_indexed(self):
+        lookup = StandInLookup([(0.2, "rec-2", "Unsure", "Someone")])
+        fp = make_fingerprinter(lookup, self.make_index())
+        self.assertIsNone(fp.identify())
+        self.assertIsNone(fp.identify())
+        self.assertEqual(len(lookup.calls), 2)
+        self.assertEqual((fp.local_hits, fp.index.count), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
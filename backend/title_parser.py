@@ -0,0 +1,112 @@
+"""Artist / title from browser tab titles ("Song - Artist - Pandora").
+
+Runs on every Chrome window title each media poll (and on WinRT titles
+with no artist), so everything is compiled once at import:
+
+    _SUFFIX_RE   one alternation of every STREAMING_SUFFIXES entry, anchored
+                 at the end; the suffix it matched names the service
+    _NON_SONG_RE navigation pages (NON_SONG_KEYWORDS) in one search of
+                 the lowercased title
+    _SPLIT_RE    every TITLE_SPLITTERS entry; of those found, the earliest
+                 in the list splits (" - " over " · " wherever each one is)
+
+SERVICE_RULES give each service its part order and the junk its titles
+carry ("(Official Video)", a "(3) " notification count). Tabs sit on the
+same title for minutes, so results are cached by raw title.
+"""
+
+import re
+from functools import lru_cache
+
+# Known streaming services and their tab title suffixes
+# Most use "Song - Artist - Service" or "Artist - Song - Service"
+STREAMING_SUFFIXES = [
+    " - Pandora", " | Pandora", " – Pandora", " — Pandora",
+    " - YouTube Music", " - YouTube", " - SoundCloud",
+    " - Spotify", " | Spotify", " - Tidal", " - Deezer",
+    " - Amazon Music", " - Apple Music", " - Qobuz",
+]
+
+# Splitters: hyphen, en-dash, em-dash, pipe (Pandora/Chrome often use these)
+TITLE_SPLITTERS = [" - ", " – ", " — ", " | ", " · "]
+
+# Pages that aren't a song (navigation, settings, ...)
+NON_SONG_KEYWORDS = ["my collection", "stations", "browse", "search", "settings", "home",
+                     "library", "queue", "playlist"]
+
+# "title_artist": "Song - Artist" (the default), "artist_title": "Artist - Song".
+# junk: patterns removed from the title before it's split.
+_NOTIFICATION_COUNT = r"^\(\d+\+?\)\s+"
+_VIDEO_TAGS = (r"[(\[](?:official\s+)?(?:music\s+|lyric\s+)?(?:video|audio|visuali[sz]er|lyrics?)"
+               r"(?:\s+video)?[)\]]|[(\[](?:hd|hq|4k|remastered(?: \d{4})?)[)\]]")
+SERVICE_RULES = {
+    "YouTube": {"order": "artist_title", "junk": [_NOTIFICATION_COUNT, _VIDEO_TAGS]},
+    "YouTube Music": {"order": "title_artist", "junk": [_NOTIFICATION_COUNT]},
+}
+DEFAULT_RULE = {"order": "title_artist", "junk": []}
+
+TITLE_CACHE_SIZE = 512
+
+
+def _service_of(suffix):
+    return suffix.lstrip(" -|–—")
+
+
+def _compile_rule(rule):
+    junk = "|".join(f"(?:{pattern})" for pattern in rule["junk"])
+    return rule["order"] == "artist_title", re.compile(junk, re.IGNORECASE) if junk else None
+
+
+_SUFFIX_RE = re.compile(
+    "(?:" + "|".join(re.escape(s) for s in sorted(STREAMING_SUFFIXES, key=len, reverse=True))
+    + r")\s*\Z")
+_NON_SONG_RE = re.compile("|".join(re.escape(k) for k in NON_SONG_KEYWORDS))
+_SPLIT_RE = re.compile("|".join(re.escape(sep) for sep in TITLE_SPLITTERS))
+_SPLIT_PRIORITY = {sep: i for i, sep in enumerate(TITLE_SPLITTERS)}.__getitem__
+_RULES = {_service_of(s): _compile_rule(SERVICE_RULES.get(_service_of(s), DEFAULT_RULE))
+          for s in STREAMING_SUFFIXES}
+_DEFAULT_RULE = _compile_rule(DEFAULT_RULE)
+
+
+def split_track_parts(text):
+    """Split track string into at most 2 parts using common delimiters. Returns [part1, part2] or [part]."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    found = _SPLIT_RE.findall(text)
+    if found:
+        parts = [p.strip() for p in text.split(min(found, key=_SPLIT_PRIORITY), 1)]
+        if parts[0] and parts[1]:
+            return parts
+    return [text]
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def parse_tab_title(title, require_service=False):
+    """Try to extract artist/title from a browser tab title (e.g. Pandora, YT Music).
+    If require_service=True, only returns results if a known streaming suffix was found."""
+    if not title:
+        return "", ""
+
+    # Strip a known service suffix (the alternation tries longest first)
+    clean = title.strip()
+    match = _SUFFIX_RE.search(clean)
+    if match is not None:
+        artist_first, junk = _RULES[_service_of(match.group().strip())]
+        clean = clean[:match.start()].strip()
+    elif require_service:
+        # From the Chrome title scraper, only known streaming tabs count
+        return "", ""
+    else:
+        # Still try "Song - Artist" with no suffix
+        artist_first, junk = _DEFAULT_RULE
+
+    if junk is not None:
+        clean = junk.sub("", clean).strip()
+    if not clean or _NON_SONG_RE.search(clean.lower()):
+        return "", ""
+
+    parts = split_track_parts(clean)
+    if len(parts) == 2:
+        return (parts[0], parts[1]) if artist_first else (parts[1], parts[0])  # artist, title
+    return "", parts[0]
@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
 import ArtistSlideshow, { buildChoreographyPayload } from './ArtistSlideshow';
 
-import { API_BASE } from '../config';
+import { API_BASE, assetUrl } from '../config';
 
 export default function TrackInfo({ media, hasVideo }) {
   const [visible, setVisible] = useState(false);
@@ -58,7 +58,7 @@ export default function TrackInfo({ media, hasVideo }) {
 
   if (!media || (!media.artist && !media.title)) return null;
 
-  const albumArt = media.albumArt;
+  const albumArt = assetUrl(media.albumArt);
 
   const accentColor = media.dominantColors?.[0]
     ? `rgb(${media.dominantColors[0].join(',')})`
@@ -3,14 +3,24 @@
 const isDev = import.meta.env.DEV;
 
 export const API_BASE = isDev ? 'http://localhost:8766' : '';
-export const WS_URL = isDev
+// Audio channel to listen to (backend --channel NAME=SPEC), picked with ?channel=NAME
+export const AUDIO_CHANNEL = new URLSearchParams(window.location.search).get('channel') || '';
+const channelQuery = AUDIO_CHANNEL ? `/?channel=${encodeURIComponent(AUDIO_CHANNEL)}` : '';
+
+export const WS_URL = (isDev
   ? 'ws://localhost:8765'
-  : `ws://${window.location.hostname}:8765`;
+  : `ws://${window.location.hostname}:8765`) + channelQuery;
 
 export function mediaUrl(path) {
   return `${API_BASE}/media/${path}`;
 }
 
+// Resolve a backend-relative asset path (e.g. "/media/albumart/<hash>")
+export function assetUrl(path) {
+  if (path && path.startsWith('/')) return `${API_BASE}${path}`;
+  return path;
+}
+
 export function thumbnailUrl(videoId) {
   return `${API_BASE}/media/thumbnails/${videoId}.jpg`;
 }
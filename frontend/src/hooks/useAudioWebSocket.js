@@ -1,5 +1,6 @@
 import { useRef, useEffect, useState, useCallback } from 'react';
 import { WS_URL, API_BASE } from '../config';
+import { decodeFrame, HELLO, DEFAULT_SUBSCRIPTION } from '../utils/frameProtocol';
 
 export default function useAudioWebSocket(url = WS_URL) {
   const dataRef = useRef({ fft: [], waveform: [], peak: 0, media: null });
@@ -14,6 +15,11 @@ export default function useAudioWebSocket(url = WS_URL) {
   const lastHistoryVersion = useRef(0);
   const [historyVersion, setHistoryVersion] = useState(0);
   const rawThrottle = useRef(0);
+  const stateVersion = useRef(0);
+  // Frame sequence tracking: gaps are dropped frames, repeats are keepalives
+  const streamStats = useRef({ lastSeq: 0, received: 0, dropped: 0, duplicates: 0 });
+  const subscription = useRef(DEFAULT_SUBSCRIPTION);
+  const sendHello = (ws) => ws.send(JSON.stringify({ ...HELLO, ...subscription.current }));
 
   const applyMedia = useCallback((nextMedia, force = false) => {
     if (!nextMedia) return;
@@ -48,13 +54,60 @@ export default function useAudioWebSocket(url = WS_URL) {
     if (wsRef.current?.readyState === WebSocket.OPEN) return;
 
     const ws = new WebSocket(url);
+    ws.binaryType = 'arraybuffer';
 
     ws.onopen = () => {
       setConnected(true);
+      streamStats.current.lastSeq = 0;
+      sendHello(ws);
+    };
+
+    // Returns false for a keepalive re-send of a frame we already have
+    const trackSeq = (seq) => {
+      const stats = streamStats.current;
+      if (!seq) return true;
+      if (seq === stats.lastSeq) {
+        stats.duplicates += 1;
+        return false;
+      }
+      const step = subscription.current.fpsDivisor;
+      if (stats.lastSeq && seq > stats.lastSeq + step) stats.dropped += seq - stats.lastSeq - step;
+      stats.lastSeq = seq;
+      stats.received += 1;
+      return true;
     };
 
     ws.onmessage = (event) => {
+      if (typeof event.data !== 'string') {
+        // Binary audio frame — media arrives on the state channel
+        const frame = decodeFrame(event.data);
+        if (frame && trackSeq(frame.seq)) dataRef.current = { ...frame, media: dataRef.current.media };
+        return;
+      }
+
       const parsed = JSON.parse(event.data);
+      if (parsed.type === 'state' || parsed.type === 'delta') {
+        // Media state channel: full snapshot on connect, field deltas after
+        let nextMedia;
+        if (parsed.type === 'state') {
+          nextMedia = parsed.media;
+        } else if (parsed.base === stateVersion.current) {
+          nextMedia = { ...dataRef.current.media, ...parsed.changes };
+          (parsed.removed || []).forEach((k) => { delete nextMedia[k]; });
+        } else {
+          // Missed a version — ask for a fresh snapshot
+          sendHello(ws);
+          return;
+        }
+        stateVersion.current = parsed.version;
+        dataRef.current = { ...dataRef.current, media: nextMedia };
+        setRawMedia(nextMedia);
+        applyMedia(nextMedia);
+        return;
+      }
+
+      // JSON frame (legacy format, media embedded)
+      if (!trackSeq(parsed.seq) && !parsed.media) return;
       dataRef.current = parsed;
 
       // Throttle raw media updates to once per second for debug panel
@@ -79,6 +132,16 @@ export default function useAudioWebSocket(url = WS_URL) {
     wsRef.current = ws;
   }, [url, applyMedia]);
 
+  // Change what the server streams (frame rate, FFT resolution, fields).
+  // Kept across reconnects; only the keys given are changed.
+  const subscribe = useCallback((changes) => {
+    subscription.current = { ...subscription.current, ...changes };
+    const ws = wsRef.current;
+    if (ws?.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify({ type: 'subscribe', ...changes }));
+    }
+  }, []);
+
   useEffect(() => {
     connect();
     return () => {
@@ -107,5 +170,5 @@ export default function useAudioWebSocket(url = WS_URL) {
     };
   }, [applyMedia]);
 
-  return { dataRef, connected, media, rawMedia, historyVersion, refreshMedia };
+  return { dataRef, connected, media, rawMedia, historyVersion, refreshMedia, streamStats, subscribe };
 }
@@ -0,0 +1,70 @@
+// Decoder for the backend's binary audio frames (see backend/frame_protocol.py).
+//
+// Header (little-endian, 26 bytes):
+//   u8 version, u8 flags, u16 fftCount, u16 waveformCount, u16 bpm * 100,
+//   u32 seq, f64 timestamp, f32 peak, u16 beats
+// flags: bit 0 float16 arrays, bit 1 beat since the server's previous frame,
+// bits 2..7 beat confidence * 63. beats counts frames with a beat (mod 2^16):
+// a change since the last frame received means a beat, even across skipped frames.
+// followed by fftCount + waveformCount values, uint8 or float16 (FLAG_F16).
+
+export const FRAME_VERSION = 2;
+const FLAG_F16 = 0x01;
+const FLAG_BEAT = 0x02;
+const HEADER_SIZE = 26;
+
+export const HELLO = { type: 'hello', format: 'binary', encoding: 'u8' };
+
+// Subscription options a hello or {type: 'subscribe'} message may carry.
+// fpsDivisor: send every Nth frame; bins: 64 | 128 | 256 | 512;
+// bands: 'log' (log-spaced FFT buckets) | 'mel' | 'bark' (filterbank + per-band AGC);
+// points: waveform length (16..1024); waveformMode: 'minmax' (interleaved min, max
+// pairs — peak preserving) | 'rms' | 'sample' (evenly spaced samples);
+// fields: any of fft, waveform, peak, media, beat (omitting media stops state deltas;
+// beat adds the server's beat flag, beats count, bpm and beatConf to every frame).
+export const DEFAULT_SUBSCRIPTION = {
+  fpsDivisor: 1,
+  bins: 128,
+  bands: 'log',
+  points: 128,
+  waveformMode: 'minmax',
+  fields: ['fft', 'waveform', 'peak', 'media', 'beat'],
+};
+
+function float16ToFloat32(h) {
+  const sign = h & 0x8000 ? -1 : 1;
+  const exp = (h >> 10) & 0x1f;
+  const frac = h & 0x03ff;
+  if (exp === 0) return sign * frac * 2 ** -24;
+  if (exp === 0x1f) return frac ? NaN : sign * Infinity;
+  return sign * (1 + frac / 1024) * 2 ** (exp - 15);
+}
+
+export function decodeFrame(buffer) {
+  const view = new DataView(buffer);
+  const version = view.getUint8(0);
+  if (version !== FRAME_VERSION) return null;
+  const flags = view.getUint8(1);
+  const fftCount = view.getUint16(2, true);
+  const waveCount = view.getUint16(4, true);
+  const bpm = view.getUint16(6, true) / 100;
+  const seq = view.getUint32(8, true);
+  const timestamp = view.getFloat64(12, true);
+  const peak = view.getFloat32(20, true);
+  const beats = view.getUint16(24, true);
+
+  const fft = new Float32Array(fftCount);
+  const waveform = new Float32Array(waveCount);
+  if (flags & FLAG_F16) {
+    const values = new Uint16Array(buffer, HEADER_SIZE, fftCount + waveCount);
+    for (let i = 0; i < fftCount; i++) fft[i] = float16ToFloat32(values[i]);
+    for (let i = 0; i < waveCount; i++) waveform[i] = float16ToFloat32(values[fftCount + i]);
+  } else {
+    const values = new Uint8Array(buffer, HEADER_SIZE, fftCount + waveCount);
+    for (let i = 0; i < fftCount; i++) fft[i] = values[i] / 255;
+    for (let i = 0; i < waveCount; i++) waveform[i] = values[fftCount + i] / 127.5 - 1;
+  }
+  const beat = (flags & FLAG_BEAT) !== 0;
+  const beatConf = (flags >> 2) / 63;
+  return { seq, timestamp, peak, fft, waveform, beat, beats, bpm, beatConf };
+}
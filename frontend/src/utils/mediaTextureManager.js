@@ -1,4 +1,5 @@
 import * as THREE from 'three';
+import { assetUrl } from '../config';
 
 const MAX_IMAGES = 10;
 
@@ -47,9 +48,9 @@ export default class MediaTextureManager {
       this.artistTextures.push(tex);
     }));
 
-    // Load album art (base64 data URI — no CORS)
+    // Load album art (content-addressed /media/albumart URL on the backend)
     if (media.albumArt) {
-      this._loadImage(media.albumArt, (img, tex) => {
+      this._loadImage(assetUrl(media.albumArt), (img, tex) => {
         this.albumArtImage = img;
         this.albumArtTexture = tex;
       });